@@ -3,10 +3,22 @@ from .auth import router as auth_router
 from .designs import router as designs_router
 from .passes import router as passes_router
 from .stats import router as stats_router
+from .exports import router as exports_router
+from .imports import router as imports_router
+from .wallet import router as wallet_router
+from .admin import router as admin_router
+from .qr import router as qr_router
+from .webhooks import router as webhooks_router
 
 api_router = APIRouter()
 
 api_router.include_router(auth_router)
 api_router.include_router(designs_router)
 api_router.include_router(passes_router)
-api_router.include_router(stats_router) 
\ No newline at end of file
+api_router.include_router(stats_router)
+api_router.include_router(exports_router)
+api_router.include_router(imports_router)
+api_router.include_router(wallet_router)
+api_router.include_router(qr_router)
+api_router.include_router(webhooks_router)
+api_router.include_router(admin_router)
\ No newline at end of file
@@ -0,0 +1,35 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import FileResponse
+from typing import Any, Dict, List
+
+from ..utils.auth import get_current_admin
+from ..utils.profiler import profile_store
+
+router = APIRouter(prefix="/admin", tags=["Admin"])
+
+
+@router.get("/profiles", response_model=List[Dict[str, Any]])
+async def list_profiles(
+    admin_id: str = Depends(get_current_admin),
+):
+    """
+    List captured request profiles, newest first
+    """
+    return await profile_store.list()
+
+
+@router.get("/profiles/{profile_id}")
+async def download_profile(
+    profile_id: str,
+    admin_id: str = Depends(get_current_admin),
+):
+    """
+    Download a profile as collapsed stacks (flamegraph.pl / speedscope input)
+    """
+    path = profile_store.path(profile_id)
+    if not path:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found",
+        )
+    return FileResponse(path, media_type="text/plain", filename=f"{profile_id}.folded")
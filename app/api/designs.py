@@ -1,15 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Header, Response, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 import uuid
 import json
+from datetime import datetime
 from typing import Optional
 
-from ..models.base import get_db
-from ..models.models import Design
-from ..schemas.designs import DesignCreate, DesignResponse
+from ..models.base import get_db, get_read_db
+from ..models.models import Design, Pass, InventoryPool
+from ..schemas.designs import DesignCreate, DesignResponse, DesignListResponse
+from ..schemas.passes import PassListResponse
+from ..schemas.inventory import InventoryConfig, InventoryStatus
+from ..services.inventory import inventory_service
+from ..services.listings import list_designs, list_passes
+from ..services.previews import preview_service
 from ..utils.auth import get_current_org
 from ..utils.storage import storage
+from ..utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from ..utils.http_cache import (
+    compute_etag,
+    etag_matches,
+    cache_headers,
+    not_modified_response,
+    json_bytes,
+    response_cache,
+)
 
 router = APIRouter(prefix="/designs", tags=["Designs"])
 
@@ -36,6 +51,9 @@ async def create_design(
     await db.commit()
     await db.refresh(new_design)
     
+    # Render the preview in the background
+    preview_service.ensure(new_design)
+    
     # Return response
     return new_design
 
@@ -82,18 +100,46 @@ async def upload_design(
     await db.commit()
     await db.refresh(new_design)
     
+    # Render the preview in the background
+    preview_service.ensure(new_design)
+    
     # Return response
     return new_design
 
 
+@router.get("", response_model=DesignListResponse)
+async def list_org_designs(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    org_id: str = Depends(get_current_org),
+    db: AsyncSession = Depends(get_read_db("list_org_designs", 5.0)),
+):
+    """
+    List the org's pass designs, newest first
+    """
+    return await list_designs(
+        db,
+        org_id,
+        cursor=cursor,
+        limit=limit,
+        created_after=created_after,
+        created_before=created_before,
+    )
+
+
 @router.get("/{design_id}", response_model=DesignResponse)
 async def get_design(
     design_id: str,
     org_id: str = Depends(get_current_org),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db("get_design", 5.0)),
+    if_none_match: Optional[str] = Header(None),
 ):
     """
     Get a pass design
+    
+    Responds 304 when If-None-Match carries the current ETag.
     """
     # Get design from database
     stmt = select(Design).where(
@@ -110,5 +156,155 @@ async def get_design(
             detail="Design not found",
         )
     
+    # Render designs that predate server-side previews, once
+    preview_service.ensure(design)
+    
+    etag = compute_etag(
+        design.id,
+        design.created_at,
+        design.template_json,
+        design.preview_url,
+        design.rendered_preview_url,
+    )
+    if etag_matches(if_none_match, etag):
+        return not_modified_response(etag)
+    
+    body = response_cache.get(f"design:{design_id}", etag, org_id)
+    if body is None:
+        body = json_bytes(DesignResponse.model_validate(design))
+        response_cache.set(f"design:{design_id}", etag, org_id, body)
+    
     # Return response
-    return design 
\ No newline at end of file
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers=cache_headers(etag),
+    )
+
+
+@router.get("/{design_id}/passes", response_model=PassListResponse)
+async def list_design_passes(
+    design_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    platform: Optional[str] = Query(None, pattern="^(apple|google)$"),
+    expired: Optional[bool] = None,
+    issued_after: Optional[datetime] = None,
+    issued_before: Optional[datetime] = None,
+    org_id: str = Depends(get_current_org),
+    db: AsyncSession = Depends(get_read_db("list_design_passes", 5.0)),
+):
+    """
+    List passes issued from one of the org's designs, newest first
+    """
+    # Check the design belongs to the org
+    stmt = select(Design.id).where(
+        Design.id == uuid.UUID(design_id),
+        Design.org_id == uuid.UUID(org_id)
+    )
+    result = await db.execute(stmt)
+    if result.scalar() is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Design not found",
+        )
+    
+    return await list_passes(
+        db,
+        [Pass.design_id == uuid.UUID(design_id)],
+        cursor=cursor,
+        limit=limit,
+        platform=platform,
+        expired=expired,
+        issued_after=issued_after,
+        issued_before=issued_before,
+    )
+
+
+async def _get_org_design(db: AsyncSession, design_id: str, org_id: str) -> Design:
+    stmt = select(Design).where(
+        Design.id == uuid.UUID(design_id),
+        Design.org_id == uuid.UUID(org_id)
+    )
+    result = await db.execute(stmt)
+    design = result.scalars().first()
+    if not design:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Design not found",
+        )
+    return design
+
+
+@router.put("/{design_id}/inventory", response_model=InventoryStatus)
+async def configure_inventory(
+    design_id: str,
+    config: InventoryConfig,
+    org_id: str = Depends(get_current_org),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Keep a pool of pre-signed passes ready for a design
+    
+    Filling starts in the background; poll GET for progress.
+    """
+    design = await _get_org_design(db, design_id, org_id)
+    
+    pool = await inventory_service.configure(
+        db,
+        design,
+        size=config.size,
+        low_watermark=config.low_watermark,
+        ttl_seconds=config.ttl_hours * 3600,
+    )
+    counts = await inventory_service.status(db, design_id)
+    
+    return InventoryStatus(
+        design_id=design_id,
+        size=pool.target_size,
+        low_watermark=pool.low_watermark,
+        ttl_hours=pool.ttl_seconds // 3600,
+        available=counts["available"],
+    )
+
+
+@router.get("/{design_id}/inventory", response_model=InventoryStatus)
+async def get_inventory(
+    design_id: str,
+    org_id: str = Depends(get_current_org),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Get a design's inventory pool and how many passes are ready
+    """
+    await _get_org_design(db, design_id, org_id)
+    
+    pool = await db.get(InventoryPool, uuid.UUID(design_id))
+    if not pool:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="No inventory for this design",
+        )
+    counts = await inventory_service.status(db, design_id)
+    
+    return InventoryStatus(
+        design_id=design_id,
+        size=pool.target_size,
+        low_watermark=pool.low_watermark,
+        ttl_hours=pool.ttl_seconds // 3600,
+        available=counts["available"],
+    )
+
+
+@router.delete("/{design_id}/inventory", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_inventory(
+    design_id: str,
+    org_id: str = Depends(get_current_org),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Stop keeping passes ready for a design and drop the unclaimed ones
+    """
+    await _get_org_design(db, design_id, org_id)
+    await inventory_service.remove(db, design_id)
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
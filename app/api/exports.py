@@ -0,0 +1,172 @@
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from typing import AsyncIterator, Optional
+from datetime import datetime
+import csv
+import io
+import json
+import os
+import uuid
+import zlib
+
+from ..models.base import read_session_factory, READ_STALENESS
+from ..models.models import Pass, PassArtifact, Design
+from ..utils.auth import get_current_org
+from ..utils.pagination import encode_cursor, decode_cursor, keyset_after
+
+router = APIRouter(prefix="/exports", tags=["Exports"])
+
+# Rows fetched from the server-side cursor per round trip
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "2000"))
+# Seconds of replica lag an export tolerates
+EXPORT_MAX_STALENESS = 300.0
+
+EXPORT_COLUMNS = [
+    "pass_id",
+    "design_id",
+    "platform",
+    "serial",
+    "deep_link",
+    "issued_at",
+    "expires_at",
+    "cursor",
+]
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def _export_statement(org_id: str, cursor: Optional[str]):
+    """Build the export query, ordered to follow ix_passes_design_issued"""
+    sort_key = (Pass.design_id, Pass.issued_at, Pass.id, PassArtifact.platform)
+    stmt = select(
+        Pass.id,
+        Pass.design_id,
+        PassArtifact.platform,
+        PassArtifact.serial,
+        PassArtifact.deep_link,
+        Pass.issued_at,
+        Pass.expires_at,
+    ).join(
+        PassArtifact, PassArtifact.pass_id == Pass.id
+    ).where(
+        Pass.design_id.in_(select(Design.id).where(Design.org_id == uuid.UUID(org_id)))
+    )
+    if cursor:
+        values = decode_cursor(cursor, (uuid.UUID, datetime, uuid.UUID, str))
+        stmt = stmt.where(keyset_after(sort_key, values))
+    return stmt.order_by(*[column.desc() for column in sort_key])
+
+
+def _row_values(row) -> list:
+    return [
+        str(row.id),
+        str(row.design_id),
+        row.platform,
+        row.serial,
+        row.deep_link,
+        row.issued_at.isoformat() if row.issued_at else None,
+        row.expires_at.isoformat() if row.expires_at else None,
+        encode_cursor(row.design_id, row.issued_at, row.id, row.platform),
+    ]
+
+
+def _encode_csv(rows, header: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows(_row_values(row) for row in rows)
+    return buffer.getvalue()
+
+
+def _encode_ndjson(rows) -> str:
+    return "".join(
+        json.dumps(dict(zip(EXPORT_COLUMNS, _row_values(row))), separators=(",", ":")) + "\n"
+        for row in rows
+    )
+
+
+async def _encode_stream(
+    batches: AsyncIterator[list], export_format: str, header: bool, gzip: bool
+) -> AsyncIterator[bytes]:
+    """
+    Encode batches of rows as export chunks, gzipped as one member if asked.
+
+    Args:
+        batches: Row batches, in export order
+        export_format: "csv" or "ndjson"
+        header: Start a CSV export with its header row
+        gzip: Compress the whole stream
+
+    Yields:
+        Encoded chunks
+    """
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if gzip else None
+    async for rows in batches:
+        if export_format == "csv":
+            chunk = _encode_csv(rows, header).encode("utf-8")
+            header = False
+        else:
+            chunk = _encode_ndjson(rows).encode("utf-8")
+
+        if compressor:
+            chunk = compressor.compress(chunk)
+        if chunk:
+            yield chunk
+
+    if export_format == "csv" and header:
+        chunk = _encode_csv([], header=True).encode("utf-8")
+        yield compressor.compress(chunk) if compressor else chunk
+
+    if compressor:
+        yield compressor.flush()
+
+
+async def _stream_export(
+    org_id: str, export_format: str, cursor: Optional[str], gzip: bool
+) -> AsyncIterator[bytes]:
+    """
+    Stream export chunks straight from a server-side cursor.
+
+    Opens its own session: the request-scoped one from get_db is closed
+    before a StreamingResponse body is sent.
+    """
+    stmt = _export_statement(org_id, cursor).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+    # Exports tolerate lag; a resumed export picks up late rows via its cursor
+    maker = read_session_factory(READ_STALENESS.get("export_passes", EXPORT_MAX_STALENESS))
+    async with maker() as session:
+        result = await session.stream(stmt)
+        # A resumed CSV export is appended to the earlier file, so skip the header
+        async for chunk in _encode_stream(result.partitions(), export_format, not cursor, gzip):
+            yield chunk
+
+
+@router.get("/passes")
+async def export_passes(
+    export_format: str = Query("csv", alias="format", pattern="^(csv|ndjson)$"),
+    gzip: bool = False,
+    cursor: Optional[str] = None,
+    org_id: str = Depends(get_current_org),
+):
+    """
+    Export every pass issued from the org's designs
+
+    Rows are streamed while the query runs. Every row carries a `cursor`;
+    after a dropped connection, pass the last received one as ?cursor= to
+    resume right after it.
+    """
+    # Validate the cursor before the response starts
+    if cursor:
+        decode_cursor(cursor, (uuid.UUID, datetime, uuid.UUID, str))
+
+    filename = f"passes.{export_format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        _stream_export(org_id, export_format, cursor, gzip),
+        media_type="application/gzip" if gzip else MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -0,0 +1,92 @@
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, BackgroundTasks
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+import os
+import uuid
+
+from ..models.base import get_db
+from ..models.models import Design, ImportJob
+from ..schemas.imports import ImportJobResponse
+from ..services.importer import import_service, IMPORT_SPOOL_DIR
+from ..utils.auth import get_current_org
+
+router = APIRouter(prefix="/imports", tags=["Imports"])
+
+# Bytes read from the upload per step while spooling it to disk
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+@router.post("", response_model=ImportJobResponse, status_code=status.HTTP_202_ACCEPTED)
+async def create_import(
+    background_tasks: BackgroundTasks,
+    design_id: str = Form(...),
+    file: UploadFile = File(...),
+    org_id: str = Depends(get_current_org),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Import recipients from a CSV and issue a pass to each one
+
+    The CSV needs a `line_user_id` column; other columns become pass
+    metadata. Processing runs in the background; poll the returned job.
+    """
+    # Check the design belongs to the org
+    stmt = select(Design.id).where(
+        Design.id == uuid.UUID(design_id),
+        Design.org_id == uuid.UUID(org_id)
+    )
+    result = await db.execute(stmt)
+    if result.scalar() is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Design not found",
+        )
+    
+    # Create job
+    job = ImportJob(
+        id=uuid.uuid4(),
+        org_id=uuid.UUID(org_id),
+        design_id=uuid.UUID(design_id),
+    )
+    
+    # Spool the upload to local disk in chunks
+    os.makedirs(IMPORT_SPOOL_DIR, exist_ok=True)
+    path = os.path.join(IMPORT_SPOOL_DIR, f"{job.id}.csv")
+    with open(path, "wb") as spool:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            spool.write(chunk)
+    
+    # Save to database
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    
+    # Process after the response is sent
+    background_tasks.add_task(import_service.run, str(job.id), path)
+    
+    return job
+
+
+@router.get("/{job_id}", response_model=ImportJobResponse)
+async def get_import(
+    job_id: str,
+    org_id: str = Depends(get_current_org),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Get import job progress and per-row errors
+    """
+    stmt = select(ImportJob).where(
+        ImportJob.id == uuid.UUID(job_id),
+        ImportJob.org_id == uuid.UUID(org_id)
+    )
+    result = await db.execute(stmt)
+    job = result.scalars().first()
+    
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Import job not found",
+        )
+    
+    return job
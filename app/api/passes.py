@@ -1,15 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Response, Query
+from fastapi.responses import RedirectResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.orm import joinedload
 import uuid
-from typing import Dict, Any
+import asyncio
+from datetime import datetime
+from typing import Dict, Any, Optional
 
-from ..models.base import get_db
-from ..models.models import Pass
-from ..schemas.passes import CreatePassRequest, CreatePassResponse, PassUpdateRequest
+from ..models.base import get_db, get_read_db, async_session, current_shard, use_shard
+from ..models.models import Pass, PassArchive
+from ..schemas.passes import (
+    CreatePassRequest,
+    CreatePassResponse,
+    PassUpdateRequest,
+    PassListResponse,
+)
 from ..utils.auth import get_current_user, get_current_org
 from ..services.issuer import issuer_service
+from ..services.listings import list_passes, merge_pass_pages
+from ..services.shards import shard_router, moving_http_exception
+from ..services.admission import (
+    admission_controller,
+    user_rate_limit,
+    RateLimitExceeded,
+    rate_limit_http_exception,
+)
 from ..utils.qrcode import generate_qr_png_base64
+from ..utils.spool import upload_spool
+from ..utils.storage import storage
+from ..utils.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from ..utils.http_cache import (
+    compute_etag,
+    etag_matches,
+    cache_headers,
+    not_modified_response,
+    json_bytes,
+    response_cache,
+)
 
 router = APIRouter(prefix="/passes", tags=["Passes"])
 
@@ -17,23 +45,43 @@ router = APIRouter(prefix="/passes", tags=["Passes"])
 @router.post("", response_model=CreatePassResponse, status_code=status.HTTP_201_CREATED)
 async def create_pass(
     pass_request: CreatePassRequest,
-    current_user: tuple = Depends(get_current_user),
+    current_user: tuple = Depends(user_rate_limit("issue_pass")),
     db: AsyncSession = Depends(get_db),
 ):
     """
     Create a new pass from a design template
     """
     user_id, user_type = current_user
+    design_id = str(pass_request.design_id)
+    
+    # The pass goes on the design's database shard, which need not be the user's
+    shard, frozen = await shard_router.design_shard(design_id)
+    if shard is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Design not found: {design_id}",
+        )
+    if frozen:
+        raise moving_http_exception()
+    await shard_router.place_user(user_id, shard)
     
     try:
         # Issue pass
+        if shard is not current_shard():
+            with use_shard(shard):
+                async with async_session() as shard_db:
+                    return await issuer_service.issue_pass(
+                        shard_db, user_id, design_id, pass_request.metadata
+                    )
         response = await issuer_service.issue_pass(
             db,
             user_id,
-            str(pass_request.design_id),
+            design_id,
             pass_request.metadata
         )
         return response
+    except RateLimitExceeded as e:
+        raise rate_limit_http_exception(e)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -46,51 +94,163 @@ async def create_pass(
         )
 
 
+@router.get("", response_model=PassListResponse)
+async def list_my_passes(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    platform: Optional[str] = Query(None, pattern="^(apple|google)$"),
+    expired: Optional[bool] = None,
+    issued_after: Optional[datetime] = None,
+    issued_before: Optional[datetime] = None,
+    current_user: tuple = Depends(get_current_user),
+    db: AsyncSession = Depends(get_read_db("list_my_passes", 1.0)),
+):
+    """
+    List the current user's passes, newest first
+    """
+    user_id, user_type = current_user
+    
+    async def list_on(session: AsyncSession):
+        return await list_passes(
+            session,
+            [Pass.user_id == uuid.UUID(user_id)],
+            cursor=cursor,
+            limit=limit,
+            platform=platform,
+            expired=expired,
+            issued_after=issued_after,
+            issued_before=issued_before,
+        )
+    
+    user_shards = await shard_router.user_shards(user_id)
+    if len(user_shards) == 1:
+        return await list_on(db)
+    
+    # Passes from orgs on several database shards: page through each and merge
+    async def list_on_shard(shard):
+        if shard is current_shard():
+            return await list_on(db)
+        async with shard.session() as shard_db:
+            return await list_on(shard_db)
+    
+    pages = await asyncio.gather(*(list_on_shard(shard) for shard in user_shards))
+    return merge_pass_pages(pages, limit)
+
+
 @router.get("/{pass_id}", response_model=Dict[str, Any])
 async def get_pass(
     pass_id: str,
     current_user: tuple = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db("get_pass", 1.0)),
+    if_none_match: Optional[str] = Header(None),
 ):
     """
     Get pass details and QR code
+    
+    Responds 304 when If-None-Match carries the current ETag, before any
+    QR rendering or serialization happens.
     """
     user_id, user_type = current_user
     
-    # Get pass from database
-    stmt = select(Pass).where(
-        Pass.id == uuid.UUID(pass_id),
-        Pass.user_id == uuid.UUID(user_id)
-    )
-    result = await db.execute(stmt)
-    passes = result.scalars().all()
+    expires_at, artifacts = await _find_pass(db, pass_id, user_id)
+    if not artifacts:
+        # Users with passes from orgs on other database shards
+        for shard in await shard_router.user_shards(user_id):
+            if shard is current_shard():
+                continue
+            async with shard.session() as shard_db:
+                expires_at, artifacts = await _find_pass(shard_db, pass_id, user_id)
+            if artifacts:
+                break
     
     # Check if pass exists
-    if not passes:
+    if not artifacts:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Pass not found",
         )
     
-    # Organize by platform
-    platforms = {}
-    for p in passes:
-        platforms[p.platform] = {
-            "deep_link": p.deep_link,
-            "serial": p.serial
-        }
+    # Version the representation by every field it is built from
+    etag = compute_etag(expires_at, *artifacts)
+    if etag_matches(if_none_match, etag):
+        return not_modified_response(etag)
     
-    # Generate QR code with the first available deep link
-    first_pass = passes[0]
-    qr_png = generate_qr_png_base64(first_pass.deep_link)
+    body = response_cache.get(f"pass:{pass_id}", etag, user_id)
+    if body is None:
+        # Organize by platform
+        platforms = {
+            platform: {"deep_link": deep_link, "serial": serial}
+            for platform, serial, deep_link, _ in artifacts
+        }
+        
+        # Generate QR code with the first available deep link
+        qr_png = generate_qr_png_base64(artifacts[0][2])
+        
+        body = json_bytes({
+            "pass_id": str(uuid.UUID(pass_id)),
+            "platforms": platforms,
+            "qr_png": qr_png,
+            "expires_at": expires_at
+        })
+        response_cache.set(f"pass:{pass_id}", etag, user_id, body)
     
     # Return response
-    return {
-        "pass_id": str(first_pass.id),
-        "platforms": platforms,
-        "qr_png": qr_png,
-        "expires_at": first_pass.expires_at
-    }
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers=cache_headers(etag),
+    )
+
+
+async def _find_pass(db: AsyncSession, pass_id: str, user_id: str):
+    """Load a user's pass as (expires_at, [(platform, serial, deep_link, last_updated)])"""
+    # Get the pass and its artifacts in one indexed fetch
+    stmt = select(Pass).options(joinedload(Pass.artifacts)).where(
+        Pass.id == uuid.UUID(pass_id),
+        Pass.user_id == uuid.UUID(user_id)
+    )
+    result = await db.execute(stmt)
+    found = result.unique().scalars().first()
+    if found:
+        return found.expires_at, [
+            (a.platform, a.serial, a.deep_link, found.last_updated) for a in found.artifacts
+        ]
+    
+    # Fall back to the archive for long-expired passes
+    stmt = select(PassArchive).where(
+        PassArchive.id == uuid.UUID(pass_id),
+        PassArchive.user_id == uuid.UUID(user_id)
+    ).order_by(PassArchive.platform)
+    result = await db.execute(stmt)
+    archived = result.scalars().all()
+    expires_at = archived[0].expires_at if archived else None
+    return expires_at, [(a.platform, a.serial, a.deep_link, a.last_updated) for a in archived]
+
+
+@router.get("/{pass_id}/pkpass")
+async def download_pkpass(pass_id: uuid.UUID):
+    """
+    Download a pass's Apple Wallet file
+    
+    The deep link of passes issued with write-behind storage. Served from
+    the local spool until the upload finishes, then redirected to storage.
+    A request reaching a host other than the one that spooled the file gets
+    a 503 with Retry-After until the upload lands.
+    """
+    key = f"passes/apple/{pass_id}.pkpass"
+    content = await upload_spool.read(key)
+    if content is not None:
+        return Response(content=content, media_type="application/vnd.apple.pkpass")
+    
+    # Spooled on another host, or not issued at all
+    if upload_spool.enabled and not await storage.exists(key):
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Pass file is not available yet, retry shortly",
+            headers={"Retry-After": "5"},
+        )
+    
+    return RedirectResponse(storage.url(key), status_code=status.HTTP_307_TEMPORARY_REDIRECT)
 
 
 @router.post("/{pass_id}/update")
@@ -103,6 +263,11 @@ async def update_pass(
     """
     Update a pass
     """
+    try:
+        await admission_controller.check_org(db, org_id, "update_pass")
+    except RateLimitExceeded as e:
+        raise rate_limit_http_exception(e)
+    
     try:
         # Update pass
         success = await issuer_service.update_pass(
@@ -122,4 +287,28 @@ async def update_pass(
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to update pass: {str(e)}",
-        ) 
\ No newline at end of file
+        ) 
+
+
+@router.post("/{pass_id}/redeem")
+async def redeem_pass(
+    pass_id: uuid.UUID,
+    org_id: str = Depends(get_current_org),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Mark a pass redeemed; each pass can be redeemed once
+    """
+    try:
+        await admission_controller.check_org(db, org_id, "redeem_pass")
+    except RateLimitExceeded as e:
+        raise rate_limit_http_exception(e)
+    
+    redeemed_at = await issuer_service.redeem_pass(db, org_id, str(pass_id))
+    if redeemed_at is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Pass not found or already redeemed",
+        )
+    
+    return {"status": "redeemed", "redeemed_at": redeemed_at}
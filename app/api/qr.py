@@ -0,0 +1,77 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+import uuid
+
+from ..models.base import get_read_db
+from ..models.models import Design
+from ..schemas.qr import QRBatchRequest
+from ..services.qr_batch import qr_batch_renderer, count_design_passes, QR_BATCH_MAX_ITEMS
+from ..utils.auth import get_current_org
+
+router = APIRouter(prefix="/qr", tags=["QR Codes"])
+
+MEDIA_TYPES = {
+    "pdf": "application/pdf",
+    "zip": "application/zip",
+}
+
+
+@router.post("/batch")
+async def render_qr_batch(
+    batch: QRBatchRequest,
+    org_id: str = Depends(get_current_org),
+    db: AsyncSession = Depends(get_read_db("render_qr_batch", 30.0)),
+):
+    """
+    Render QR codes for a design's passes or a list of passes
+
+    Streams multi-page PDF print sheets, or a ZIP of PNG or SVG images
+    named by serial, while codes are being rendered.
+    """
+    if bool(batch.design_id) == bool(batch.pass_ids):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Provide either design_id or pass_ids",
+        )
+    
+    design_id = str(batch.design_id) if batch.design_id else None
+    if design_id:
+        # Check the design belongs to the org
+        stmt = select(Design.id).where(
+            Design.id == uuid.UUID(design_id),
+            Design.org_id == uuid.UUID(org_id)
+        )
+        result = await db.execute(stmt)
+        if result.scalar() is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Design not found",
+            )
+        total = await count_design_passes(db, design_id)
+    else:
+        total = len(batch.pass_ids)
+    
+    if total > QR_BATCH_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Batch exceeds {QR_BATCH_MAX_ITEMS} passes",
+        )
+    
+    # Passes outside the org are skipped while streaming
+    filename = f"qr-codes.{batch.output}"
+    return StreamingResponse(
+        qr_batch_renderer.render(
+            org_id,
+            design_id=design_id,
+            pass_ids=batch.pass_ids,
+            output=batch.output,
+            image_format=batch.image_format,
+            columns=batch.columns,
+            rows=batch.rows,
+            box_size=batch.box_size,
+        ),
+        media_type=MEDIA_TYPES[batch.output],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -1,22 +1,34 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, case
-from datetime import datetime
+from datetime import datetime, timedelta
+from typing import Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 import uuid
 
-from ..models.base import get_db
-from ..models.models import Pass
-from ..schemas.stats import OrgStatsResponse, PassStats
+from ..models.base import get_read_db
+from ..models.models import Pass, PassArtifact, Design, ArchivedPassCount
+from ..schemas.stats import OrgStatsResponse, PassStats, HistogramResponse, HistogramBucket
+from ..services.rollups import query_histogram
 from ..utils.auth import get_current_org
 
 router = APIRouter(prefix="/stats", tags=["Statistics"])
 
+# Upper bound on buckets returned by one histogram query
+MAX_HISTOGRAM_BUCKETS = 5000
+
+BUCKET_WIDTHS = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+    "week": timedelta(weeks=1),
+}
+
 
 @router.get("/org/{org_id}", response_model=OrgStatsResponse)
 async def get_org_stats(
     org_id: str,
     current_org: str = Depends(get_current_org),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db("get_org_stats", 30.0)),
 ):
     """
     Get organization stats
@@ -28,7 +40,8 @@ async def get_org_stats(
             detail="Not authorized to access stats for this organization",
         )
     
-    # Query pass statistics
+    # Query pass statistics; each platform a pass was issued to counts once,
+    # matching the archived counters and the rollups
     stmt = select(
         func.count().label("total_issued"),
         func.sum(case(
@@ -39,6 +52,8 @@ async def get_org_stats(
             (Pass.expires_at <= datetime.utcnow(), 1),
             else_=0
         )).label("expired")
+    ).join(
+        Pass.artifacts
     ).join(
         Pass.design
     ).filter(
@@ -50,19 +65,39 @@ async def get_org_stats(
     
     # Query platform distribution
     platform_stmt = select(
-        Pass.platform,
+        PassArtifact.platform,
         func.count().label("count")
+    ).join(
+        Pass.artifacts
     ).join(
         Pass.design
     ).filter(
         Pass.design.has(org_id=uuid.UUID(org_id))
     ).group_by(
-        Pass.platform
+        PassArtifact.platform
     )
     
     platform_result = await db.execute(platform_stmt)
     platform_stats = {row.platform: row.count for row in platform_result}
     
+    # Add passes moved to the archive (all expired) from their counters
+    archived_stmt = select(
+        ArchivedPassCount.platform,
+        func.sum(ArchivedPassCount.count).label("count")
+    ).join(
+        Design, Design.id == ArchivedPassCount.design_id
+    ).filter(
+        Design.org_id == uuid.UUID(org_id)
+    ).group_by(
+        ArchivedPassCount.platform
+    )
+    
+    archived_result = await db.execute(archived_stmt)
+    archived = 0
+    for row in archived_result:
+        archived += row.count
+        platform_stats[row.platform] = platform_stats.get(row.platform, 0) + row.count
+    
     # Query recent activity (simplified version)
     activity_stmt = select(
         Pass.issued_at
@@ -78,9 +113,9 @@ async def get_org_stats(
     recent_activity = [{"timestamp": row.issued_at} for row in activity_result]
     
     # Calculate total from active and expired in case of NULL values
-    total_issued = stats_row.total_issued or 0
+    total_issued = (stats_row.total_issued or 0) + archived
     active = stats_row.active or 0
-    expired = stats_row.expired or 0
+    expired = (stats_row.expired or 0) + archived
     
     # Build response
     return OrgStatsResponse(
@@ -93,4 +128,69 @@ async def get_org_stats(
         ),
         recent_activity=recent_activity,
         updated_at=datetime.utcnow()
-    ) 
\ No newline at end of file
+    )
+
+
+@router.get("/org/{org_id}/histogram", response_model=HistogramResponse)
+async def get_org_histogram(
+    org_id: str,
+    start: datetime,
+    end: datetime,
+    granularity: str = Query("day", pattern="^(hour|day|week)$"),
+    tz: str = "UTC",
+    design_id: Optional[str] = None,
+    platform: Optional[str] = Query(None, pattern="^(apple|google)$"),
+    group_by: Optional[str] = Query(None, pattern="^(design|platform)$"),
+    current_org: str = Depends(get_current_org),
+    db: AsyncSession = Depends(get_read_db("get_org_histogram", 60.0)),
+):
+    """
+    Get issuance and expiry histograms over a time range
+    
+    Answered from the hourly rollups, never by scanning passes.
+    """
+    # Ensure the current org is requesting their own stats
+    if current_org != org_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access stats for this organization",
+        )
+    
+    # Validate range
+    if end <= start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end must be after start",
+        )
+    if (end - start) / BUCKET_WIDTHS[granularity] > MAX_HISTOGRAM_BUCKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Range spans more than {MAX_HISTOGRAM_BUCKETS} buckets; use a coarser granularity",
+        )
+    try:
+        ZoneInfo(tz)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Unknown time zone",
+        )
+    
+    rows = await query_histogram(
+        db,
+        org_id,
+        start,
+        end,
+        granularity=granularity,
+        tz=tz,
+        design_id=design_id,
+        platform=platform,
+        group_by=group_by,
+    )
+    
+    return HistogramResponse(
+        org_id=org_id,
+        granularity=granularity,
+        start=start,
+        end=end,
+        buckets=[HistogramBucket(**row) for row in rows],
+    )
@@ -0,0 +1,198 @@
+import logging
+from fastapi import APIRouter, Depends, HTTPException, status, Header, Body, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, literal_column
+from sqlalchemy.dialects.postgresql import insert
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+from ..models.base import get_db, current_shard, shards
+from ..models.models import Pass, PassArtifact, DeviceRegistration
+from ..utils.auth import verify_pass_authentication
+from ..services.shards import shard_router
+from ..utils.storage import storage
+from ..utils.spool import upload_spool
+
+logger = logging.getLogger(__name__)
+
+# Apple Wallet web service (webServiceURL in pass.json points at /api/)
+router = APIRouter(prefix="/v1", tags=["Apple Wallet"])
+
+
+@router.post("/devices/{device_id}/registrations/{pass_type_id}/{serial}")
+async def register_device(
+    device_id: str,
+    pass_type_id: str,
+    serial: str,
+    body: Dict[str, Any] = Body(...),
+    authorization: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Register a device to receive push updates for a pass
+    """
+    verify_pass_authentication(serial, authorization)
+
+    push_token = body.get("pushToken")
+    if not push_token:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="pushToken is required",
+        )
+
+    # Check the pass exists
+    stmt = select(PassArtifact.pass_id).where(
+        PassArtifact.serial == serial, PassArtifact.platform == "apple"
+    )
+    result = await db.execute(stmt)
+    if result.scalar() is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Pass not found",
+        )
+
+    # Upsert registration; a device may re-register with a new push token
+    stmt = insert(DeviceRegistration).values(
+        device_library_id=device_id,
+        pass_type_id=pass_type_id,
+        serial=serial,
+        push_token=push_token,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["device_library_id", "pass_type_id", "serial"],
+        set_={"push_token": stmt.excluded.push_token},
+    ).returning(literal_column("(xmax = 0)").label("inserted"))
+    result = await db.execute(stmt)
+    inserted = result.scalar()
+    await db.commit()
+
+    # 201 for a new registration, 200 if it already existed
+    return Response(status_code=status.HTTP_201_CREATED if inserted else status.HTTP_200_OK)
+
+
+@router.delete("/devices/{device_id}/registrations/{pass_type_id}/{serial}")
+async def unregister_device(
+    device_id: str,
+    pass_type_id: str,
+    serial: str,
+    authorization: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Stop sending push updates for a pass to a device
+    """
+    verify_pass_authentication(serial, authorization)
+
+    await db.execute(
+        delete(DeviceRegistration).where(
+            DeviceRegistration.device_library_id == device_id,
+            DeviceRegistration.pass_type_id == pass_type_id,
+            DeviceRegistration.serial == serial,
+        )
+    )
+    await db.commit()
+
+    return Response(status_code=status.HTTP_200_OK)
+
+
+@router.get("/devices/{device_id}/registrations/{pass_type_id}")
+async def get_updated_serials(
+    device_id: str,
+    pass_type_id: str,
+    passesUpdatedSince: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    List serials of a device's passes updated since the given tag
+    """
+    stmt = select(PassArtifact.serial, Pass.last_updated).join(
+        Pass, Pass.id == PassArtifact.pass_id
+    ).join(
+        DeviceRegistration, DeviceRegistration.serial == PassArtifact.serial
+    ).where(
+        DeviceRegistration.device_library_id == device_id,
+        DeviceRegistration.pass_type_id == pass_type_id,
+    )
+    if passesUpdatedSince:
+        try:
+            since = datetime.fromtimestamp(float(passesUpdatedSince), tz=timezone.utc)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid passesUpdatedSince",
+            )
+        stmt = stmt.where(Pass.last_updated > since)
+
+    result = await db.execute(stmt)
+    rows = result.all()
+    if shard_router.enabled:
+        # A device can hold passes of orgs on every database shard
+        for shard in shards.values():
+            if shard is not current_shard():
+                async with shard.session() as shard_db:
+                    rows += (await shard_db.execute(stmt)).all()
+    if not rows:
+        return Response(status_code=status.HTTP_204_NO_CONTENT)
+
+    last_updated = max(row.last_updated for row in rows)
+    return {
+        # An org mid-move has its passes on two shards
+        "serialNumbers": list(dict.fromkeys(row.serial for row in rows)),
+        "lastUpdated": str(last_updated.timestamp()),
+    }
+
+
+@router.get("/passes/{pass_type_id}/{serial}")
+async def get_latest_pass(
+    pass_type_id: str,
+    serial: str,
+    authorization: Optional[str] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Get the latest version of a pass
+    """
+    verify_pass_authentication(serial, authorization)
+
+    stmt = select(Pass.id, Pass.last_updated).join(
+        PassArtifact, PassArtifact.pass_id == Pass.id
+    ).where(PassArtifact.serial == serial, PassArtifact.platform == "apple")
+    result = await db.execute(stmt)
+    apple_pass = result.first()
+    if not apple_pass:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Pass not found",
+        )
+
+    # Not uploaded yet when issued moments ago with write-behind storage
+    key = f"passes/apple/{apple_pass.id}.pkpass"
+    content = await upload_spool.read(key)
+    if content is None:
+        # Spooled on another host; Wallet retries after Retry-After
+        if upload_spool.enabled and not await storage.exists(key):
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Pass file is not available yet, retry shortly",
+                headers={"Retry-After": "5"},
+            )
+        content = (await storage.get_file(key)).getvalue()
+    return Response(
+        content=content,
+        media_type="application/vnd.apple.pkpass",
+        headers={
+            "Last-Modified": apple_pass.last_updated.astimezone(timezone.utc).strftime(
+                "%a, %d %b %Y %H:%M:%S GMT"
+            ),
+        },
+    )
+
+
+@router.post("/log")
+async def log_messages(body: Dict[str, Any] = Body(...)):
+    """
+    Receive error logs from Wallet
+    """
+    for message in body.get("logs", []):
+        logger.info("Wallet log: %s", message)
+    return Response(status_code=status.HTTP_200_OK)
@@ -0,0 +1,93 @@
+from fastapi import APIRouter, Depends, HTTPException, status, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select, delete, func
+from typing import List
+import uuid
+import secrets
+
+from ..models.base import get_db
+from ..models.models import WebhookSubscription, WebhookOutbox
+from ..schemas.webhooks import WebhookCreate, WebhookResponse, WebhookCreated
+from ..services.webhooks import check_url_host, note_subscription
+from ..utils.auth import get_current_org
+
+router = APIRouter(prefix="/webhooks", tags=["Webhooks"])
+
+
+@router.post("", response_model=WebhookCreated, status_code=status.HTTP_201_CREATED)
+async def create_webhook(
+    webhook: WebhookCreate,
+    org_id: str = Depends(get_current_org),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Subscribe an endpoint to pass events; the secret is only returned here
+    """
+    try:
+        await check_url_host(webhook.url)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e))
+
+    subscription = WebhookSubscription(
+        id=uuid.uuid4(),
+        org_id=uuid.UUID(org_id),
+        url=webhook.url,
+        secret=secrets.token_hex(32),
+        events=webhook.events,
+    )
+    db.add(subscription)
+    await db.commit()
+    await db.refresh(subscription)
+    note_subscription(org_id)
+    
+    return subscription
+
+
+@router.get("", response_model=List[WebhookResponse])
+async def list_webhooks(
+    org_id: str = Depends(get_current_org),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    List the org's webhooks with their delivery state
+    """
+    pending = (
+        select(func.count())
+        .where(WebhookOutbox.subscription_id == WebhookSubscription.id)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        select(WebhookSubscription, pending)
+        .where(WebhookSubscription.org_id == uuid.UUID(org_id))
+        .order_by(WebhookSubscription.created_at)
+    )
+    
+    return [
+        WebhookResponse.model_validate(subscription).model_copy(update={"pending": count})
+        for subscription, count in result.all()
+    ]
+
+
+@router.delete("/{webhook_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_webhook(
+    webhook_id: uuid.UUID,
+    org_id: str = Depends(get_current_org),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Remove a webhook and drop its undelivered events
+    """
+    result = await db.execute(
+        delete(WebhookSubscription).where(
+            WebhookSubscription.id == webhook_id,
+            WebhookSubscription.org_id == uuid.UUID(org_id),
+        )
+    )
+    if not result.rowcount:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Webhook not found",
+        )
+    await db.commit()
+    
+    return Response(status_code=status.HTTP_204_NO_CONTENT)
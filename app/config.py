@@ -0,0 +1,14 @@
+"""
+Environment loading shared by every module.
+
+Modules read their settings with os.getenv at import; `.env` is parsed once
+per process, by whichever of them is imported first.
+"""
+from functools import lru_cache
+from dotenv import load_dotenv
+
+
+@lru_cache(maxsize=None)
+def load_env() -> None:
+    """Load `.env` into os.environ, once"""
+    load_dotenv()
@@ -1,3 +1,11 @@
+import time
+
+# Imports are the first startup phase
+_imports_started = time.perf_counter()
+
+import asyncio
+from contextlib import asynccontextmanager
+from sqlalchemy import text
 from fastapi import FastAPI, Request, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
@@ -5,12 +13,66 @@ from fastapi.exceptions import RequestValidationError
 
 from .api import api_router
 from .schemas.auth import ErrorResponse
+from .services.apns import apns_dispatcher
+from .services.apple_pass import apple_pass_signer
+from .services.google_wallet import google_wallet_service
+from .services.serials import serial_allocator
+from .services.qr_batch import qr_batch_renderer
+from .services.shards import ShardRoutingMiddleware, shard_router
+from .models.base import engine, replica_set, dispose_shards, WriteMarkerMiddleware
+from .utils.storage import storage
+from .utils.spool import upload_spool
+from .utils.qrcode import warm_qrcode
+from .utils.startup import startup_report
+from .utils.profiler import ProfilingMiddleware, profiling_enabled
+from .utils.query_stats import QueryStatsMiddleware, query_stats_enabled
+from .utils.log import RequestIdMiddleware, configure_logging, stop_logging
+
+startup_report.started_at = _imports_started
+startup_report.record("imports", time.perf_counter() - _imports_started)
+
+
+async def _open_database_pool():
+    async with engine.connect() as conn:
+        await conn.execute(text("SELECT 1"))
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_logging()
+
+    # Build and warm services before the worker takes traffic; the steps
+    # are independent, so they run concurrently
+    await asyncio.gather(
+        startup_report.run("database", _open_database_pool()),
+        startup_report.run("replicas", replica_set.check_all()),
+        startup_report.run("serials", serial_allocator.warm()),
+        startup_report.run("storage", storage.warm()),
+        startup_report.run("spool", upload_spool.recover()),
+        startup_report.run("apple_pass", asyncio.to_thread(apple_pass_signer.warm)),
+        startup_report.run("google_wallet", asyncio.to_thread(google_wallet_service.warm)),
+        startup_report.run("qrcode", asyncio.to_thread(warm_qrcode)),
+    )
+    startup_report.log()
+
+    yield
+
+    await upload_spool.close()
+    await apns_dispatcher.close()
+    await serial_allocator.close()
+    await apple_pass_signer.close()
+    await replica_set.dispose()
+    await dispose_shards()
+    qr_batch_renderer.close()
+    stop_logging()
+
 
 # Create FastAPI app
 app = FastAPI(
     title="PassMint API",
     description="API for PassMint, a service to issue and manage mobile wallet passes",
     version="0.1.0",
+    lifespan=lifespan,
 )
 
 # Add CORS middleware
@@ -22,6 +84,25 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Request profiling; not installed at all when disabled
+if profiling_enabled():
+    app.add_middleware(ProfilingMiddleware)
+
+# Per-request query counts, as a debug header or log
+if query_stats_enabled():
+    app.add_middleware(QueryStatsMiddleware)
+
+# Read-your-writes markers; only needed when reads can go to replicas
+if replica_set.replicas:
+    app.add_middleware(WriteMarkerMiddleware)
+
+# Database shard per org; not installed with a single database
+if shard_router.enabled:
+    app.add_middleware(ShardRoutingMiddleware)
+
+# Outermost, so every log record of a request carries its ID
+app.add_middleware(RequestIdMiddleware)
+
 # Include API routes
 app.include_router(api_router, prefix="/api")
 
@@ -53,4 +134,10 @@ async def root():
 # Health check endpoint
 @app.get("/health")
 async def health():
-    return {"status": "healthy"} 
\ No newline at end of file
+    return {"status": "healthy"} 
+
+
+# Startup timing, broken down by phase
+@app.get("/health/startup")
+async def startup_health():
+    return startup_report.as_dict()
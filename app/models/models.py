@@ -1,10 +1,11 @@
-from sqlalchemy import Column, String, Text, ForeignKey, CheckConstraint, TIMESTAMP, JSONB
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.sql import func
+from sqlalchemy import Column, String, Text, Float, Integer, SmallInteger, BigInteger, Boolean, Identity, ForeignKey, CheckConstraint, Index, TIMESTAMP
+from sqlalchemy.dialects.postgresql import UUID, JSONB, ARRAY
+from sqlalchemy.sql import func, text
 from sqlalchemy.orm import relationship
 import uuid
 
 from .base import Base
+from ..utils.ids import uuid7
 
 class Org(Base):
     __tablename__ = "orgs"
@@ -34,8 +35,18 @@ class Design(Base):
     id = Column(UUID, primary_key=True, default=uuid.uuid4)
     org_id = Column(UUID, ForeignKey("orgs.id", ondelete="CASCADE"))
     template_json = Column(JSONB, nullable=False)
-    preview_url = Column(Text)
+    preview_url = Column(Text)  # As supplied by the uploader
+    rendered_preview_url = Column(Text)  # Rendered server-side from template_json
+    preview_hash = Column(String(64))  # template_json version the preview was rendered from
+    preview_claim = Column(String(64))  # template_json version being rendered
+    preview_claimed_at = Column(TIMESTAMP(timezone=True))  # The claim lapses PREVIEW_CLAIM_TTL after this
     created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    # Indexes backing keyset pagination
+    __table_args__ = (
+        Index("ix_designs_org_created", "org_id", created_at.desc(), id.desc()),
+    )
 
     # Relationships
     org = relationship("Org", back_populates="designs")
@@ -43,26 +54,258 @@ class Design(Base):
 
 
 class Pass(Base):
+    """One issued pass; what each wallet platform received is in PassArtifact"""
     __tablename__ = "passes"
 
-    id = Column(UUID, primary_key=True, default=uuid.uuid4)
+    # Time-ordered, so inserts append to the primary key index
+    id = Column(UUID, primary_key=True, default=uuid7)
     user_id = Column(UUID, ForeignKey("users.id", ondelete="CASCADE"))
     design_id = Column(UUID, ForeignKey("designs.id", ondelete="SET NULL"))
-    platform = Column(String(10))
-    serial = Column(String(32), unique=True, nullable=False)
-    deep_link = Column(Text, nullable=False)
     expires_at = Column(TIMESTAMP(timezone=True))
     issued_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
     last_updated = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    redeemed_at = Column(TIMESTAMP(timezone=True))
+
+    __table_args__ = (
+        # Indexes backing keyset pagination
+        Index("ix_passes_user_issued", "user_id", issued_at.desc(), id.desc()),
+        Index("ix_passes_design_issued", "design_id", issued_at.desc(), id.desc()),
+        # Lets the archiver find long-expired passes without a full scan
+        Index("ix_passes_expires_at", "expires_at"),
+    )
+
+    # Relationships
+    user = relationship("User", back_populates="passes")
+    design = relationship("Design", back_populates="passes")
+    artifacts = relationship(
+        "PassArtifact",
+        back_populates="pass_",
+        cascade="all, delete-orphan",
+        order_by="PassArtifact.platform",
+    )
+
+
+class PassArtifact(Base):
+    """A pass as issued to one wallet platform"""
+    __tablename__ = "pass_artifacts"
+
+    pass_id = Column(UUID, ForeignKey("passes.id", ondelete="CASCADE"), primary_key=True)
+    platform = Column(String(10), primary_key=True)
+    serial = Column(String(32), unique=True, nullable=False)
+    deep_link = Column(Text, nullable=False)
 
     # Constraints
     __table_args__ = (
         CheckConstraint(
             "platform IN ('apple', 'google')",
-            name="platform_type_check"
+            name="pass_artifacts_platform_check"
         ),
     )
 
     # Relationships
-    user = relationship("User", back_populates="passes")
-    design = relationship("Design", back_populates="passes") 
\ No newline at end of file
+    pass_ = relationship("Pass", back_populates="artifacts")
+
+
+class PassArchive(Base):
+    """
+    Cold storage for long-expired passes, moved out of `passes` by the archiver.
+
+    Range-partitioned by expiry month (passes_archive_YYYYMM); partitions are
+    created by the archiver as needed.
+    """
+    __tablename__ = "passes_archive"
+
+    id = Column(UUID, primary_key=True)
+    user_id = Column(UUID, ForeignKey("users.id", ondelete="CASCADE"))
+    design_id = Column(UUID, ForeignKey("designs.id", ondelete="SET NULL"))
+    platform = Column(String(10), primary_key=True)
+    serial = Column(String(32), nullable=False)
+    deep_link = Column(Text, nullable=False)
+    expires_at = Column(TIMESTAMP(timezone=True), primary_key=True)
+    issued_at = Column(TIMESTAMP(timezone=True))
+    last_updated = Column(TIMESTAMP(timezone=True))
+    archived_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_passes_archive_id", "id"),
+        {"postgresql_partition_by": "RANGE (expires_at)"},
+    )
+
+
+class ArchivedPassCount(Base):
+    """Per-design count of archived passes, so stats never scan the archive"""
+    __tablename__ = "archived_pass_counts"
+
+    design_id = Column(UUID, ForeignKey("designs.id", ondelete="CASCADE"), primary_key=True)
+    platform = Column(String(10), primary_key=True)
+    count = Column(Integer, nullable=False, server_default="0")
+
+
+class OrgRateLimit(Base):
+    __tablename__ = "org_rate_limits"
+
+    org_id = Column(UUID, ForeignKey("orgs.id", ondelete="CASCADE"), primary_key=True)
+    endpoint = Column(String(32), primary_key=True)  # "*" applies to every endpoint
+    rate = Column(Float, nullable=False)  # Tokens refilled per second
+    burst = Column(Float, nullable=False)  # Bucket capacity
+    weight = Column(Float, nullable=False, server_default="1")  # Fair-queuing share
+
+
+class RateLimitBucket(Base):
+    __tablename__ = "rate_limit_buckets"
+
+    key = Column(String(128), primary_key=True)
+    tokens = Column(Float, nullable=False)
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+
+
+class ImportJob(Base):
+    __tablename__ = "import_jobs"
+
+    id = Column(UUID, primary_key=True, default=uuid.uuid4)
+    org_id = Column(UUID, ForeignKey("orgs.id", ondelete="CASCADE"), nullable=False)
+    design_id = Column(UUID, ForeignKey("designs.id", ondelete="SET NULL"))
+    status = Column(String(16), nullable=False, server_default="pending")
+    total_rows = Column(Integer, nullable=False, server_default="0")
+    processed_rows = Column(Integer, nullable=False, server_default="0")
+    succeeded_rows = Column(Integer, nullable=False, server_default="0")
+    failed_rows = Column(Integer, nullable=False, server_default="0")
+    errors = Column(JSONB, nullable=False, server_default="[]")  # [{"row": n, "error": "..."}]
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+    finished_at = Column(TIMESTAMP(timezone=True))
+
+    # Constraints
+    __table_args__ = (
+        CheckConstraint(
+            "status IN ('pending', 'running', 'completed', 'failed')",
+            name="import_status_check"
+        ),
+    )
+
+
+class DeviceRegistration(Base):
+    """Apple Wallet device registered for push updates of a pass"""
+    __tablename__ = "device_registrations"
+
+    device_library_id = Column(String(64), primary_key=True)
+    pass_type_id = Column(String(128), primary_key=True)
+    serial = Column(String(32), primary_key=True)
+    push_token = Column(String(128), nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_device_registrations_serial", "serial"),
+        Index("ix_device_registrations_push_token", "push_token"),
+    )
+
+
+class IssuanceRollup(Base):
+    """
+    Hourly issuance and expiry counts per org, design and platform.
+
+    Each bucket is split over a few shards so concurrent issuance does not
+    serialize on one counter row; readers sum the shards.
+    """
+    __tablename__ = "issuance_rollups"
+
+    org_id = Column(UUID, primary_key=True)
+    bucket_start = Column(TIMESTAMP(timezone=True), primary_key=True)  # Start of the hour
+    design_id = Column(UUID, primary_key=True)
+    platform = Column(String(10), primary_key=True)
+    shard = Column(SmallInteger, primary_key=True)
+    issued = Column(Integer, nullable=False, server_default="0")  # Passes issued in the hour
+    expiring = Column(Integer, nullable=False, server_default="0")  # Passes expiring in the hour
+
+
+class InventoryPool(Base):
+    """An org's request to keep pre-signed passes ready for a design"""
+    __tablename__ = "inventory_pools"
+
+    design_id = Column(UUID, ForeignKey("designs.id", ondelete="CASCADE"), primary_key=True)
+    org_id = Column(UUID, ForeignKey("orgs.id", ondelete="CASCADE"), nullable=False)
+    target_size = Column(Integer, nullable=False)  # Passes kept ready
+    low_watermark = Column(Integer, nullable=False)  # Refill when fewer remain
+    ttl_seconds = Column(Integer, nullable=False)  # Unclaimed passes are dropped after this
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+
+class PassInventory(Base):
+    """A signed, uploaded pass not yet bound to a user"""
+    __tablename__ = "pass_inventory"
+
+    id = Column(UUID, primary_key=True, default=uuid7)  # Becomes the pass ID
+    design_id = Column(UUID, ForeignKey("designs.id", ondelete="CASCADE"), nullable=False)
+    artifacts = Column(JSONB, nullable=False)  # [{"platform", "serial", "deep_link"}]
+    qr_png = Column(Text, nullable=False)
+    pass_expires_at = Column(TIMESTAMP(timezone=True))
+    expires_at = Column(TIMESTAMP(timezone=True), nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Claims take the oldest item of a design
+        Index("ix_pass_inventory_design", "design_id", "id"),
+        Index("ix_pass_inventory_expires_at", "expires_at"),
+    )
+
+
+class WebhookSubscription(Base):
+    """An org endpoint receiving pass lifecycle events"""
+    __tablename__ = "webhook_subscriptions"
+
+    id = Column(UUID, primary_key=True, default=uuid.uuid4)
+    org_id = Column(UUID, ForeignKey("orgs.id", ondelete="CASCADE"), nullable=False)
+    url = Column(Text, nullable=False)
+    secret = Column(String(64), nullable=False)  # HMAC key for payload signatures
+    events = Column(ARRAY(Text), nullable=False)  # Event types delivered
+    active = Column(Boolean, nullable=False, server_default="true")
+    failures = Column(Integer, nullable=False, server_default="0")  # Consecutive failed deliveries
+    last_error = Column(Text)
+    # Backoff after a failure, or a dispatcher's lease while delivering
+    next_attempt_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+    # Passes expiring up to here have had pass.expired emitted
+    expired_through = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        Index("ix_webhook_subscriptions_org", "org_id"),
+    )
+
+
+class WebhookOutbox(Base):
+    """An event waiting to be delivered to one subscription, written with the change it describes"""
+    __tablename__ = "webhook_outbox"
+
+    id = Column(BigInteger, Identity(), primary_key=True)  # Order within a transaction
+    subscription_id = Column(
+        UUID, ForeignKey("webhook_subscriptions.id", ondelete="CASCADE"), nullable=False
+    )
+    event_type = Column(String(32), nullable=False)
+    payload = Column(JSONB, nullable=False)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+    # Transaction that wrote the event; delivery order, once it has settled
+    xact_id = Column(
+        BigInteger, server_default=text("pg_current_xact_id()::text::bigint"), nullable=False
+    )
+
+    __table_args__ = (
+        Index("ix_webhook_outbox_delivery", "subscription_id", "xact_id", "id"),
+    )
+
+
+class OrgShard(Base):
+    """Database shard holding an org's data; kept on the default shard"""
+    __tablename__ = "org_shards"
+
+    org_id = Column(UUID, primary_key=True)
+    shard = Column(String(64), nullable=False)
+    frozen = Column(Boolean, nullable=False, server_default="false")  # Writes refused while it moves
+    updated_at = Column(TIMESTAMP(timezone=True), server_default=func.now(), nullable=False)
+
+
+class UserShard(Base):
+    """A database shard holding passes of a user; kept on the default shard"""
+    __tablename__ = "user_shards"
+
+    user_id = Column(UUID, primary_key=True)
+    shard = Column(String(64), primary_key=True)
+    created_at = Column(TIMESTAMP(timezone=True), server_default=func.now())
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field, UUID4
-from typing import Optional
+from typing import Optional, List
+from datetime import datetime
 
 
 class DesignCreate(BaseModel):
@@ -12,6 +13,13 @@ class DesignResponse(BaseModel):
     org_id: UUID4
     template_json: dict
     preview_url: Optional[str] = None
+    rendered_preview_url: Optional[str] = None  # Null until the first render finishes
+    created_at: Optional[datetime] = None
 
     class Config:
-        from_attributes = True 
\ No newline at end of file
+        from_attributes = True
+
+
+class DesignListResponse(BaseModel):
+    items: List[DesignResponse]
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= for the next page
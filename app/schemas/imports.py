@@ -0,0 +1,19 @@
+from pydantic import BaseModel, UUID4
+from typing import Optional, List, Dict, Any
+from datetime import datetime
+
+
+class ImportJobResponse(BaseModel):
+    id: UUID4
+    design_id: Optional[UUID4] = None
+    status: str  # "pending", "running", "completed" or "failed"
+    total_rows: int
+    processed_rows: int
+    succeeded_rows: int
+    failed_rows: int
+    errors: List[Dict[str, Any]]  # [{"row": 12, "error": "..."}], first errors only
+    created_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
@@ -0,0 +1,24 @@
+from pydantic import BaseModel, Field, model_validator
+from typing import Optional
+
+
+class InventoryConfig(BaseModel):
+    size: int = Field(..., ge=1, le=100000, description="Pre-signed passes to keep ready")
+    low_watermark: Optional[int] = Field(None, ge=0, description="Refill when fewer remain; default a fifth of size")
+    ttl_hours: int = Field(72, ge=1, le=24 * 90, description="Unclaimed passes are dropped after this")
+
+    @model_validator(mode="after")
+    def check_watermark(self):
+        if self.low_watermark is None:
+            self.low_watermark = self.size // 5
+        if self.low_watermark >= self.size:
+            raise ValueError("low_watermark must be below size")
+        return self
+
+
+class InventoryStatus(BaseModel):
+    design_id: str
+    size: int
+    low_watermark: int
+    ttl_hours: int
+    available: int  # Unexpired passes ready to claim
@@ -1,5 +1,6 @@
 from pydantic import BaseModel, Field, UUID4
-from typing import Optional, Dict, Any
+from uuid import UUID
+from typing import Optional, Dict, Any, List
 from datetime import datetime
 
 
@@ -21,7 +22,7 @@ class Platforms(BaseModel):
 
 
 class CreatePassResponse(BaseModel):
-    pass_id: UUID4
+    pass_id: UUID  # Pass IDs are UUIDv7
     platforms: Platforms
     qr_png: str
     expires_at: Optional[datetime] = None
@@ -30,4 +31,17 @@ class CreatePassResponse(BaseModel):
 class PassUpdateRequest(BaseModel):
     fields: Dict[str, Any] = Field(
         ..., description="Fields to update on the pass"
-    ) 
\ No newline at end of file
+    )
+
+
+class PassListItem(BaseModel):
+    id: UUID
+    design_id: Optional[UUID4] = None
+    platforms: Platforms
+    expires_at: Optional[datetime] = None
+    issued_at: datetime
+
+
+class PassListResponse(BaseModel):
+    items: List[PassListItem]
+    next_cursor: Optional[str] = None  # Pass back as ?cursor= for the next page
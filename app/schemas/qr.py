@@ -0,0 +1,13 @@
+from pydantic import BaseModel, Field, UUID4
+from uuid import UUID
+from typing import Optional, List
+
+
+class QRBatchRequest(BaseModel):
+    design_id: Optional[UUID4] = Field(None, description="Render every pass of this design")
+    pass_ids: Optional[List[UUID]] = Field(None, description="Render these passes")
+    output: str = Field("pdf", pattern="^(pdf|zip)$")  # Print sheets, or a ZIP of images
+    image_format: str = Field("png", pattern="^(png|svg)$")  # Image type inside a ZIP
+    columns: int = Field(3, ge=1, le=10)  # Codes per row on a PDF page
+    rows: int = Field(4, ge=1, le=15)  # Rows per PDF page
+    box_size: int = Field(10, ge=1, le=40)  # Pixels per QR module in PNG/SVG
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, UUID4
-from typing import Dict, List
+from typing import Dict, List, Optional
 from datetime import datetime
 
 
@@ -14,4 +14,20 @@ class OrgStatsResponse(BaseModel):
     org_id: UUID4
     passes: PassStats
     recent_activity: List[Dict[str, datetime]]  # Recent pass creation timestamps
-    updated_at: datetime 
\ No newline at end of file
+    updated_at: datetime
+
+
+class HistogramBucket(BaseModel):
+    bucket_start: datetime
+    design_id: Optional[UUID4] = None  # Set when grouped by design
+    platform: Optional[str] = None  # Set when grouped by platform
+    issued: int  # Passes issued in the bucket
+    expiring: int  # Passes whose expiry falls in the bucket
+
+
+class HistogramResponse(BaseModel):
+    org_id: UUID4
+    granularity: str  # "hour", "day" or "week"
+    start: datetime
+    end: datetime
+    buckets: List[HistogramBucket]
@@ -0,0 +1,42 @@
+from pydantic import BaseModel, Field, field_validator
+from datetime import datetime
+from typing import List, Optional
+from uuid import UUID
+
+from ..services.webhooks import EVENT_TYPES, check_url
+
+
+class WebhookCreate(BaseModel):
+    url: str = Field(..., max_length=2048, description="HTTPS endpoint receiving event batches, on a public address")
+    events: List[str] = Field(default_factory=lambda: list(EVENT_TYPES), description="Event types to deliver")
+
+    @field_validator("url")
+    @classmethod
+    def check_url_scheme(cls, url: str) -> str:
+        return check_url(url)
+
+    @field_validator("events")
+    @classmethod
+    def check_events(cls, events: List[str]) -> List[str]:
+        unknown = set(events) - set(EVENT_TYPES)
+        if unknown or not events:
+            raise ValueError(f"events must be some of {', '.join(EVENT_TYPES)}")
+        return sorted(set(events))
+
+
+class WebhookResponse(BaseModel):
+    id: UUID
+    url: str
+    events: List[str]
+    active: bool
+    failures: int  # Consecutive failed deliveries
+    last_error: Optional[str] = None
+    next_attempt_at: datetime
+    pending: int = 0  # Events waiting to be delivered
+
+    class Config:
+        from_attributes = True
+
+
+class WebhookCreated(WebhookResponse):
+    secret: str  # Shown once; verifies X-PassMint-Signature
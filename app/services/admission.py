@@ -0,0 +1,347 @@
+import os
+import math
+import time
+import heapq
+import asyncio
+import itertools
+import threading
+import uuid
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Dict, Tuple
+from ..config import load_env
+from fastapi import Depends, HTTPException, status
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.base import engine
+from ..models.models import OrgRateLimit
+from ..utils.auth import get_current_user
+
+load_env()
+
+# "postgres" shares buckets across every worker; "memory" keeps them per process
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "postgres")
+
+# Defaults used when an org has no row in org_rate_limits
+DEFAULT_ORG_RATE = float(os.getenv("RATE_LIMIT_ORG_RATE", "50"))
+DEFAULT_ORG_BURST = float(os.getenv("RATE_LIMIT_ORG_BURST", "100"))
+DEFAULT_USER_RATE = float(os.getenv("RATE_LIMIT_USER_RATE", "1"))
+DEFAULT_USER_BURST = float(os.getenv("RATE_LIMIT_USER_BURST", "5"))
+
+# How long per-org limits are cached before re-reading org_rate_limits
+RATE_LIMIT_CONFIG_TTL = float(os.getenv("RATE_LIMIT_CONFIG_TTL", "30"))
+
+# Issuance work admitted concurrently per worker, and queued per org
+ISSUANCE_CONCURRENCY = int(os.getenv("ISSUANCE_CONCURRENCY", "8"))
+ISSUANCE_MAX_QUEUE_PER_ORG = int(os.getenv("ISSUANCE_MAX_QUEUE_PER_ORG", "32"))
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a request is rejected by admission control"""
+
+    def __init__(self, scope: str, retry_after: float):
+        super().__init__(f"Rate limit exceeded for {scope}")
+        self.scope = scope
+        self.retry_after = retry_after
+
+
+def rate_limit_http_exception(exc: RateLimitExceeded) -> HTTPException:
+    """Convert a RateLimitExceeded into a 429 response with Retry-After"""
+    return HTTPException(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        detail=str(exc),
+        headers={"Retry-After": str(max(1, math.ceil(exc.retry_after)))},
+    )
+
+
+def _retry_after(tokens: float, rate: float, cost: float) -> float:
+    """Seconds until a bucket holds `cost` tokens"""
+    if rate <= 0:
+        # The bucket never refills; ask again once the limits may have changed
+        return RATE_LIMIT_CONFIG_TTL
+    return max(0.0, (cost - tokens) / rate)
+
+
+@dataclass(frozen=True)
+class LimitConfig:
+    rate: float
+    burst: float
+    weight: float = 1.0
+
+
+class MemoryBucketStore:
+    """
+    Process-local token buckets.
+
+    Stand-in for the Postgres store in tests and single-worker deployments;
+    each gunicorn worker gets its own buckets.
+    """
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        """
+        Take tokens from a bucket.
+
+        Args:
+            key: Bucket key
+            rate: Tokens refilled per second
+            burst: Bucket capacity
+            cost: Tokens to take
+
+        Returns:
+            0 if granted, otherwise seconds until enough tokens are available;
+            a bucket with rate 0 is retried after RATE_LIMIT_CONFIG_TTL
+        """
+        with self._lock:
+            now = self._clock()
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= cost:
+                self._buckets[key] = (tokens - cost, now)
+                return 0.0
+            self._buckets[key] = (tokens, now)
+            return _retry_after(tokens, rate, cost)
+
+
+class PostgresBucketStore:
+    """
+    Token buckets stored in the rate_limit_buckets table.
+
+    Refill and take happen in a single upsert, so concurrent workers never
+    double-spend a token. A dedicated connection is used so the bucket row
+    lock is not held for the caller's whole transaction.
+    """
+
+    _TAKE_SQL = text(
+        """
+        INSERT INTO rate_limit_buckets (key, tokens, updated_at)
+        VALUES (:key, CAST(:burst AS double precision) - :cost, now())
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = LEAST(
+                CAST(:burst AS double precision),
+                rate_limit_buckets.tokens + CAST(:rate AS double precision)
+                    * EXTRACT(EPOCH FROM now() - rate_limit_buckets.updated_at)
+            ) - :cost,
+            updated_at = now()
+        WHERE LEAST(
+            CAST(:burst AS double precision),
+            rate_limit_buckets.tokens + CAST(:rate AS double precision)
+                * EXTRACT(EPOCH FROM now() - rate_limit_buckets.updated_at)
+        ) >= :cost
+        RETURNING tokens
+        """
+    )
+
+    _PEEK_SQL = text(
+        """
+        SELECT LEAST(
+            CAST(:burst AS double precision),
+            tokens + CAST(:rate AS double precision)
+                * EXTRACT(EPOCH FROM now() - updated_at)
+        ) AS tokens
+        FROM rate_limit_buckets
+        WHERE key = :key
+        """
+    )
+
+    async def take(self, key: str, rate: float, burst: float, cost: float = 1.0) -> float:
+        """
+        Take tokens from a bucket.
+
+        Args:
+            key: Bucket key
+            rate: Tokens refilled per second
+            burst: Bucket capacity
+            cost: Tokens to take
+
+        Returns:
+            0 if granted, otherwise seconds until enough tokens are available;
+            a bucket with rate 0 is retried after RATE_LIMIT_CONFIG_TTL
+        """
+        params = {"key": key, "rate": rate, "burst": burst, "cost": cost}
+        async with engine.begin() as conn:
+            result = await conn.execute(self._TAKE_SQL, params)
+            if result.first() is not None:
+                return 0.0
+            tokens = (await conn.execute(self._PEEK_SQL, params)).scalar() or 0.0
+        return _retry_after(float(tokens), rate, cost)
+
+
+class FairScheduler:
+    """
+    Weighted fair queuing of issuance work across orgs.
+
+    At most `concurrency` jobs run at once. When all slots are busy, waiting
+    jobs are ordered by a virtual finish tag (start + 1 / weight), so an org
+    with a deep backlog cannot starve orgs that submit occasionally.
+    Scheduling is per worker; cross-worker limits come from the token buckets.
+    """
+
+    def __init__(self, concurrency: int, max_queue_per_org: int):
+        self.concurrency = concurrency
+        self.max_queue_per_org = max_queue_per_org
+        self._active = 0
+        self._heap: list = []
+        self._seq = itertools.count()
+        self._vtime = 0.0
+        self._finish: Dict[str, float] = {}
+        self._queued: Dict[str, int] = {}
+        self._avg_service = 0.5  # seconds, EMA used for Retry-After estimates
+
+    def _tag(self, org_id: str, weight: float) -> Tuple[float, float]:
+        start = max(self._vtime, self._finish.get(org_id, 0.0))
+        finish = start + 1.0 / max(weight, 1e-6)
+        self._finish[org_id] = finish
+        return start, finish
+
+    async def _acquire(self, org_id: str, weight: float) -> None:
+        if self._active < self.concurrency and not self._heap:
+            self._active += 1
+            start, _ = self._tag(org_id, weight)
+            self._vtime = start
+            return
+
+        queued = self._queued.get(org_id, 0)
+        if queued >= self.max_queue_per_org:
+            retry_after = (queued + 1) * self._avg_service / self.concurrency
+            raise RateLimitExceeded(f"org {org_id} issuance queue", retry_after)
+
+        start, finish = self._tag(org_id, weight)
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._heap, (finish, next(self._seq), start, org_id, future))
+        self._queued[org_id] = queued + 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            # The slot may have been handed over just before cancellation
+            if future.done() and not future.cancelled():
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        while self._heap:
+            _, _, start, org_id, future = heapq.heappop(self._heap)
+            self._queued[org_id] -= 1
+            if not self._queued[org_id]:
+                del self._queued[org_id]
+            if future.cancelled():
+                continue
+            # Hand the slot straight to the next job
+            self._vtime = start
+            future.set_result(None)
+            return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self, org_id: str, weight: float = 1.0):
+        """
+        Hold an issuance slot for the duration of the block.
+
+        Raises:
+            RateLimitExceeded: If the org's queue is already full
+        """
+        await self._acquire(org_id, weight)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            self._avg_service = 0.9 * self._avg_service + 0.1 * elapsed
+            self._release()
+
+
+class AdmissionController:
+    def __init__(self, store, scheduler: FairScheduler):
+        self.store = store
+        self.scheduler = scheduler
+        self._config_cache: Dict[str, Tuple[float, Dict[str, LimitConfig]]] = {}
+
+    async def get_limits(self, session: AsyncSession, org_id: str, endpoint: str) -> LimitConfig:
+        """
+        Get the limits for an org and endpoint.
+
+        An exact endpoint row wins over the org's "*" row, which wins over
+        the environment defaults.
+        """
+        cached = self._config_cache.get(org_id)
+        if cached is None or cached[0] < time.monotonic():
+            stmt = select(OrgRateLimit).where(OrgRateLimit.org_id == uuid.UUID(org_id))
+            result = await session.execute(stmt)
+            rows = {
+                row.endpoint: LimitConfig(row.rate, row.burst, row.weight)
+                for row in result.scalars()
+            }
+            cached = (time.monotonic() + RATE_LIMIT_CONFIG_TTL, rows)
+            self._config_cache[org_id] = cached
+
+        rows = cached[1]
+        return rows.get(endpoint) or rows.get("*") or LimitConfig(DEFAULT_ORG_RATE, DEFAULT_ORG_BURST)
+
+    async def check_org(self, session: AsyncSession, org_id: str, endpoint: str) -> LimitConfig:
+        """
+        Take a token from the org's bucket for an endpoint.
+
+        Returns:
+            The org's limits, for use with the fair scheduler
+
+        Raises:
+            RateLimitExceeded: If the bucket is empty
+        """
+        limits = await self.get_limits(session, org_id, endpoint)
+        retry_after = await self.store.take(f"org:{org_id}:{endpoint}", limits.rate, limits.burst)
+        if retry_after:
+            raise RateLimitExceeded(f"org {org_id} on {endpoint}", retry_after)
+        return limits
+
+    async def check_user(self, user_id: str, endpoint: str) -> None:
+        """
+        Take a token from the user's bucket for an endpoint.
+
+        Raises:
+            RateLimitExceeded: If the bucket is empty
+        """
+        retry_after = await self.store.take(
+            f"user:{user_id}:{endpoint}", DEFAULT_USER_RATE, DEFAULT_USER_BURST
+        )
+        if retry_after:
+            raise RateLimitExceeded(f"user on {endpoint}", retry_after)
+
+
+def user_rate_limit(endpoint: str):
+    """
+    Build a dependency enforcing the per-user limit for an endpoint.
+
+    Args:
+        endpoint: Endpoint name used in the bucket key
+
+    Returns:
+        FastAPI dependency returning the current user tuple
+    """
+    async def dependency(
+        current_user: Tuple[str, str] = Depends(get_current_user)
+    ) -> Tuple[str, str]:
+        try:
+            await admission_controller.check_user(current_user[0], endpoint)
+        except RateLimitExceeded as e:
+            raise rate_limit_http_exception(e)
+        return current_user
+
+    return dependency
+
+
+def _build_store():
+    if RATE_LIMIT_BACKEND == "memory":
+        return MemoryBucketStore()
+    return PostgresBucketStore()
+
+
+# Create a singleton instance
+admission_controller = AdmissionController(
+    _build_store(),
+    FairScheduler(ISSUANCE_CONCURRENCY, ISSUANCE_MAX_QUEUE_PER_ORG),
+)
@@ -0,0 +1,272 @@
+import os
+import logging
+import time
+import base64
+import asyncio
+import jwt
+import httpx
+from typing import Dict, Iterable, List, Optional, Set
+from ..config import load_env
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.base import shards
+from ..models.models import DeviceRegistration
+from .apple_pass import PASS_TYPE_IDENTIFIER
+
+load_env()
+
+logger = logging.getLogger(__name__)
+
+# APNs endpoint; point at scripts/apns_standin.py for offline runs
+APNS_URL = os.getenv("APNS_URL", "https://api.push.apple.com")
+
+# Token-based auth: base64-encoded .p8 signing key, its key ID and the team ID
+APNS_AUTH_KEY = os.getenv("APNS_AUTH_KEY", "")
+APNS_KEY_ID = os.getenv("APNS_KEY_ID", "")
+APNS_TEAM_ID = os.getenv("APNS_TEAM_ID", "")
+
+# Concurrent in-flight pushes; HTTP/2 multiplexes them over a few connections
+APNS_CONCURRENCY = int(os.getenv("APNS_CONCURRENCY", "1000"))
+APNS_MAX_CONNECTIONS = int(os.getenv("APNS_MAX_CONNECTIONS", "4"))
+
+# Pushes to the same device within this window are coalesced into one
+APNS_DEBOUNCE_SECONDS = float(os.getenv("APNS_DEBOUNCE_SECONDS", "2"))
+APNS_MAX_RETRIES = int(os.getenv("APNS_MAX_RETRIES", "3"))
+
+# Apple rejects provider tokens older than an hour and throttles refreshes
+# more frequent than every 20 minutes
+PROVIDER_TOKEN_TTL = 50 * 60
+
+# Reasons meaning the device token will never work again
+INVALID_TOKEN_REASONS = {"BadDeviceToken", "Unregistered", "DeviceTokenNotForTopic"}
+
+
+class APNsProviderToken:
+    """Signed ES256 provider token, cached and reused across pushes"""
+
+    def __init__(self, key_pem: bytes, key_id: str, team_id: str, ttl: int = PROVIDER_TOKEN_TTL):
+        self.key_pem = key_pem
+        self.key_id = key_id
+        self.team_id = team_id
+        self.ttl = ttl
+        self._token: Optional[str] = None
+        self._issued_at = 0.0
+
+    def get(self) -> str:
+        now = time.time()
+        if self._token is None or now - self._issued_at > self.ttl:
+            self._token = jwt.encode(
+                {"iss": self.team_id, "iat": int(now)},
+                self.key_pem,
+                algorithm="ES256",
+                headers={"kid": self.key_id},
+            )
+            self._issued_at = now
+        return self._token
+
+    def invalidate(self) -> None:
+        self._token = None
+
+
+class APNsDispatcher:
+    """
+    Fans pass-update pushes out to registered Wallet devices.
+
+    Pushes are queued per device token and flushed after a short debounce
+    window, so a pass changing several times in quick succession produces a
+    single push per device. Sends share one pooled HTTP/2 client with
+    thousands of concurrent streams; transient failures are retried with
+    backoff and tokens APNs reports as dead are deleted.
+    """
+
+    def __init__(
+        self,
+        base_url: str,
+        topic: str,
+        provider_token: Optional[APNsProviderToken],
+        concurrency: int = APNS_CONCURRENCY,
+        max_connections: int = APNS_MAX_CONNECTIONS,
+        debounce: float = APNS_DEBOUNCE_SECONDS,
+        max_retries: int = APNS_MAX_RETRIES,
+        http2: bool = True,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.topic = topic
+        self.provider_token = provider_token
+        self.concurrency = concurrency
+        self.max_connections = max_connections
+        self.debounce = debounce
+        self.max_retries = max_retries
+        self.http2 = http2
+        self.transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._pending: Set[str] = set()
+        self._flush_task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.provider_token is not None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                ),
+                timeout=httpx.Timeout(10.0, pool=None),
+                transport=self.transport,
+            )
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        return self._client
+
+    def enqueue(self, push_tokens: Iterable[str]) -> None:
+        """
+        Queue a push to each device, coalescing with pushes already waiting.
+
+        Args:
+            push_tokens: APNs device tokens
+        """
+        if not self.enabled:
+            return
+        self._pending.update(push_tokens)
+        if self._pending and self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.debounce)
+        tokens, self._pending = self._pending, set()
+        self._flush_task = None
+        try:
+            await self.send_many(tokens)
+        except Exception:
+            logger.exception("Error dispatching APNs pushes", extra={"tokens": len(tokens)})
+
+    async def send_many(self, push_tokens: Iterable[str]) -> Dict[str, int]:
+        """
+        Push to many devices concurrently.
+
+        Args:
+            push_tokens: APNs device tokens
+
+        Returns:
+            Count of outcomes: {"sent": n, "invalid": n, "failed": n}
+        """
+        tokens = list(push_tokens)
+        outcomes = await asyncio.gather(*[self.send(token) for token in tokens])
+
+        invalid = [token for token, outcome in zip(tokens, outcomes) if outcome == "invalid"]
+        if invalid:
+            await self._remove_registrations(invalid)
+
+        counts = {"sent": 0, "invalid": 0, "failed": 0}
+        for outcome in outcomes:
+            counts[outcome] += 1
+        return counts
+
+    async def send(self, push_token: str) -> str:
+        """
+        Send one pass-update push, retrying transient failures.
+
+        Args:
+            push_token: APNs device token
+
+        Returns:
+            "sent", "invalid" (token should be forgotten) or "failed"
+        """
+        client = self._get_client()
+        url = f"{self.base_url}/3/device/{push_token}"
+
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                await asyncio.sleep(min(2 ** attempt * 0.1, 5.0))
+
+            headers = {"apns-topic": self.topic, "apns-push-type": "background"}
+            if self.provider_token:
+                headers["authorization"] = f"bearer {self.provider_token.get()}"
+
+            try:
+                async with self._semaphore:
+                    response = await client.post(url, content=b"{}", headers=headers)
+            except httpx.TransportError:
+                continue
+
+            if response.status_code == 200:
+                return "sent"
+
+            reason = _reason(response)
+            if response.status_code == 410 or reason in INVALID_TOKEN_REASONS:
+                return "invalid"
+            if response.status_code == 403 and reason == "ExpiredProviderToken":
+                self.provider_token.invalidate()
+                continue
+            if response.status_code == 429 or response.status_code >= 500:
+                continue
+            return "failed"
+
+        return "failed"
+
+    async def _remove_registrations(self, push_tokens: List[str]) -> None:
+        # A flush mixes devices of passes on every database shard
+        for shard in shards.values():
+            async with shard.session() as session:
+                await session.execute(
+                    delete(DeviceRegistration).where(DeviceRegistration.push_token.in_(push_tokens))
+                )
+                await session.commit()
+
+    async def close(self) -> None:
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def notify_serials(self, session: AsyncSession, serials: Iterable[str]) -> None:
+        """
+        Queue pushes to every device registered for the given pass serials.
+
+        Args:
+            session: Database session
+            serials: Serial numbers of passes that changed
+        """
+        serials = list(serials)
+        if not self.enabled or not serials:
+            return
+        stmt = select(DeviceRegistration.push_token).where(
+            DeviceRegistration.serial.in_(serials)
+        ).distinct()
+        result = await session.execute(stmt)
+        self.enqueue(result.scalars().all())
+
+
+def _reason(response: httpx.Response) -> Optional[str]:
+    try:
+        return response.json().get("reason")
+    except ValueError:
+        return None
+
+
+def _build_dispatcher() -> APNsDispatcher:
+    provider_token = None
+    if APNS_AUTH_KEY:
+        provider_token = APNsProviderToken(
+            base64.b64decode(APNS_AUTH_KEY), APNS_KEY_ID, APNS_TEAM_ID
+        )
+    else:
+        logger.warning("APNs auth key not provided, pass update pushes disabled")
+    return APNsDispatcher(
+        APNS_URL,
+        PASS_TYPE_IDENTIFIER,
+        provider_token,
+        http2=APNS_URL.startswith("https://"),
+    )
+
+
+# Create a singleton instance
+apns_dispatcher = _build_dispatcher()
@@ -1,18 +1,24 @@
 import os
+import logging
 import json
 import base64
 import uuid
-import passpy
+from collections import OrderedDict
 from datetime import datetime
 from io import BytesIO
 from typing import Dict, Any, Optional
 import random
 import string
-from dotenv import load_dotenv
+import threading
+from ..config import load_env
 
 from ..utils.storage import storage
+from ..utils.spool import upload_spool
+from ..utils.auth import pass_authentication_token
 
-load_dotenv()
+load_env()
+
+logger = logging.getLogger(__name__)
 
 # Get Apple Pass certificate from env
 APPLE_PASS_CERT_P12 = os.getenv("APPLE_PASS_CERT_P12", "")
@@ -24,19 +30,83 @@ TEAM_IDENTIFIER = "ABCD12345"  # Replace with your Apple Developer Team ID
 ORGANIZATION_NAME = "PassMint"
 WEBSERVICE_URL = "https://passmint.example.com/api/"
 
+IMAGE_TYPES = ("icon", "logo", "thumbnail")
+
+# Designs whose compressed static files are kept for reuse
+PKPASS_TEMPLATE_CACHE_SIZE = 256
+
 
 class ApplePassSigner:
     def __init__(self):
+        # The certificate is decoded and parsed by warm(), which the app
+        # lifespan calls at startup, or on first use otherwise
+        self.cert_data = None
+        self.cert_password = APPLE_PASS_CERT_PASSWORD
+        self.backend = None
+        self._templates = OrderedDict()
+        self._warmed = False
+        self._warm_lock = threading.Lock()
+
+    def warm(self) -> None:
+        """Decode and parse the signing certificate, or point at the signing daemon"""
+        if self._warmed:
+            return
+        # Startup warms on a worker thread while requests may already call this;
+        # the flag is set only once the backend is in place, so a failure is retried
+        with self._warm_lock:
+            if self._warmed:
+                return
+            self._load_backend()
+            self._warmed = True
+
+    def _load_backend(self) -> None:
+        from .signing import SIGNER_URL, signer_backend
+        if SIGNER_URL:
+            # The daemon holds the key; this worker never loads it
+            self.backend = signer_backend(None, "", SIGNER_URL)
+            return
+
         # Decode base64 cert to binary
         if not APPLE_PASS_CERT_P12:
-            print("WARNING: Apple Pass certificate not provided")
-            self.cert_data = None
-        else:
-            self.cert_data = base64.b64decode(APPLE_PASS_CERT_P12)
-        self.cert_password = APPLE_PASS_CERT_PASSWORD
+            logger.warning("Apple Pass certificate not provided")
+            return
+        self.cert_data = base64.b64decode(APPLE_PASS_CERT_P12)
+
+        # Fail at startup rather than on the first pass if the cert is unusable
+        try:
+            self.backend = signer_backend(self.cert_data, self.cert_password, "")
+        except ValueError as e:
+            logger.warning("Apple Pass certificate could not be parsed: %s", e)
+
+    def _template(self, design_json: Dict[str, Any]):
+        """The design's static files as reusable ZIP entries"""
+        from ..utils.pkpass import PKPassTemplate
+
+        key = json.dumps({img_type: design_json.get(img_type) for img_type in IMAGE_TYPES}, sort_keys=True)
+        template = self._templates.get(key)
+        if template is not None:
+            self._templates.move_to_end(key)
+            return template
+
+        assets = {}
+        for img_type in IMAGE_TYPES:
+            if img_type in design_json and design_json[img_type]:
+                # In a real implementation, would download the image from the URL
+                # For now, we'll just assume it's a placeholder
+                assets[f"{img_type}.png"] = b"placeholder"
+        template = PKPassTemplate(assets)
+
+        self._templates[key] = template
+        if len(self._templates) > PKPASS_TEMPLATE_CACHE_SIZE:
+            self._templates.popitem(last=False)
+        return template
 
     async def generate_pass(
-        self, design_json: Dict[str, Any], pass_id: str, metadata: Optional[Dict[str, Any]] = None
+        self,
+        design_json: Dict[str, Any],
+        pass_id: str,
+        serial_number: str,
+        metadata: Optional[Dict[str, Any]] = None,
     ) -> tuple:
         """
         Generate an Apple Wallet .pkpass file
@@ -44,17 +114,16 @@ class ApplePassSigner:
         Args:
             design_json: Pass design JSON template
             pass_id: UUID of the pass
+            serial_number: Serial from the serial allocator
             metadata: Optional metadata to include
             
         Returns:
             tuple of (serial_number, deep_link, pass_content)
         """
-        if not self.cert_data:
+        self.warm()
+        if not self.backend:
             raise ValueError("Apple Pass certificate not configured")
 
-        # Generate a random serial number
-        serial_number = f"PM-{uuid.uuid4().hex[:8].upper()}"
-        
         # Build pass.json
         pass_json = {
             "formatVersion": 1,
@@ -67,7 +136,7 @@ class ApplePassSigner:
             "foregroundColor": design_json.get("foregroundColor", "rgb(255, 255, 255)"),
             "backgroundColor": design_json.get("backgroundColor", "rgb(60, 90, 150)"),
             "webServiceURL": WEBSERVICE_URL,
-            "authenticationToken": uuid.uuid4().hex,
+            "authenticationToken": pass_authentication_token(serial_number),
         }
         
         # Set expiration if provided
@@ -103,35 +172,36 @@ class ApplePassSigner:
                     "value": str(value)
                 })
         
-        # Create the pass using passpy
-        pkpass = passpy.Pass(pass_json)
-        
-        # Add images from design if provided
-        for img_type in ["icon", "logo", "thumbnail"]:
-            if img_type in design_json and design_json[img_type]:
-                # In a real implementation, would download the image from the URL
-                # For now, we'll just assume it's a placeholder
-                pkpass.addFile(f"{img_type}.png", BytesIO(b"placeholder"))
-                
-        # Set the certificates from environment variables
-        pkpass.setCertificate(self.cert_data, self.cert_password)
-        
-        # Generate the .pkpass file
-        pkpass_data = pkpass.create()
+        # Sign and zip the pass around the design's pre-compressed images
+        template = self._template(design_json)
+        pass_entry, manifest = template.prepare(pass_json)
+        signature = await self.backend.sign(manifest)
+        pkpass_data = template.assemble(pass_entry, manifest, signature)
         
         # Generate a key for storage
         storage_key = f"passes/apple/{pass_id}.pkpass"
         
-        # Upload to S3
-        file_obj = BytesIO(pkpass_data)
-        deep_link = await storage.upload_file(
-            file_obj, 
-            storage_key, 
-            content_type="application/vnd.apple.pkpass"
-        )
+        if upload_spool.enabled:
+            # Respond once the file is durable locally; the spool uploads it
+            await upload_spool.put(
+                storage_key, bytes(pkpass_data), content_type="application/vnd.apple.pkpass"
+            )
+            deep_link = f"{WEBSERVICE_URL}passes/{pass_id}/pkpass"
+        else:
+            # Upload to S3
+            file_obj = BytesIO(pkpass_data)
+            deep_link = await storage.upload_file(
+                file_obj, 
+                storage_key, 
+                content_type="application/vnd.apple.pkpass"
+            )
         
         return serial_number, deep_link, pkpass_data
 
+    async def close(self) -> None:
+        if self.backend is not None:
+            await self.backend.close()
+
 
 # Create a singleton instance
 apple_pass_signer = ApplePassSigner() 
\ No newline at end of file
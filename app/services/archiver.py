@@ -0,0 +1,166 @@
+"""
+Moves long-expired passes from `passes` into the partitioned `passes_archive`.
+
+Run it from cron (or any scheduler) on a single host; it works through
+every database shard in turn:
+
+    python -m app.services.archiver --retention-days 90
+
+or keep it running with --interval SECONDS.
+"""
+import os
+import asyncio
+import argparse
+from datetime import datetime, timedelta, timezone
+from ..config import load_env
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.base import async_session, shards, use_shard
+
+load_env()
+
+# Passes expired longer than this are moved to the archive
+ARCHIVE_RETENTION_DAYS = int(os.getenv("ARCHIVE_RETENTION_DAYS", "90"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("ARCHIVE_BATCH_SIZE", "5000"))
+
+ARCHIVE_COLUMNS = "id, user_id, design_id, platform, serial, deep_link, expires_at, issued_at, last_updated"
+
+# Move one batch and bump the per-design archived counters in one statement.
+# The archive keeps one row per artifact; deleting a pass cascades to its
+# artifacts, which the statement's snapshot still sees for the copy.
+MOVE_BATCH_SQL = text(f"""
+    WITH moved AS (
+        DELETE FROM passes
+        WHERE id IN (
+            SELECT id FROM passes
+            WHERE expires_at < :cutoff
+            ORDER BY expires_at
+            LIMIT :batch_size
+            FOR UPDATE SKIP LOCKED
+        )
+        RETURNING id, user_id, design_id, expires_at, issued_at, last_updated
+    ),
+    archived AS (
+        INSERT INTO passes_archive ({ARCHIVE_COLUMNS})
+        SELECT m.id, m.user_id, m.design_id, a.platform, a.serial, a.deep_link,
+               m.expires_at, m.issued_at, m.last_updated
+        FROM moved m JOIN pass_artifacts a ON a.pass_id = m.id
+        RETURNING design_id, platform
+    ),
+    counted AS (
+        INSERT INTO archived_pass_counts (design_id, platform, count)
+        SELECT design_id, platform, count(*) FROM archived
+        WHERE design_id IS NOT NULL
+        GROUP BY design_id, platform
+        ON CONFLICT (design_id, platform)
+        DO UPDATE SET count = archived_pass_counts.count + EXCLUDED.count
+    )
+    SELECT count(*) FROM moved
+""")
+
+
+def _month_start(value: datetime) -> datetime:
+    return value.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def _next_month(value: datetime) -> datetime:
+    return (value.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+async def ensure_archive_partitions(session: AsyncSession, cutoff: datetime) -> None:
+    """
+    Create the monthly archive partitions needed to receive passes expiring before cutoff.
+
+    Args:
+        session: Database session
+        cutoff: Latest expiry that will be archived
+    """
+    result = await session.execute(
+        text("SELECT min(expires_at) FROM passes WHERE expires_at < :cutoff"),
+        {"cutoff": cutoff},
+    )
+    oldest = result.scalar()
+    if oldest is None:
+        return
+    await create_archive_partitions(session, oldest, cutoff)
+
+
+async def create_archive_partitions(session: AsyncSession, oldest: datetime, newest: datetime) -> None:
+    """
+    Create the monthly archive partitions covering oldest through newest.
+
+    Args:
+        session: Database session
+        oldest: Earliest expiry to cover
+        newest: Latest expiry to cover
+    """
+    month = _month_start(oldest.astimezone(timezone.utc))
+    while month <= newest:
+        upper = _next_month(month)
+        await session.execute(text(
+            f"CREATE TABLE IF NOT EXISTS passes_archive_{month:%Y%m} "
+            f"PARTITION OF passes_archive "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+        ))
+        month = upper
+    await session.commit()
+
+
+async def archive_expired_passes(
+    retention: timedelta = timedelta(days=ARCHIVE_RETENTION_DAYS),
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+) -> int:
+    """
+    Move passes that expired more than `retention` ago into the archive.
+
+    Each batch commits on its own, so locks are short and an interrupted
+    run simply resumes on the next invocation.
+
+    Args:
+        retention: How long expired passes stay in the hot table
+        batch_size: Rows moved per transaction
+
+    Returns:
+        Number of passes archived
+    """
+    cutoff = datetime.now(timezone.utc) - retention
+    total = 0
+
+    async with async_session() as session:
+        await ensure_archive_partitions(session, cutoff)
+
+        while True:
+            result = await session.execute(
+                MOVE_BATCH_SQL, {"cutoff": cutoff, "batch_size": batch_size}
+            )
+            moved = result.scalar() or 0
+            await session.commit()
+            total += moved
+            if moved < batch_size:
+                break
+
+    return total
+
+
+async def _main(retention_days: int, batch_size: int, interval: int) -> None:
+    while True:
+        for shard in shards.values():
+            with use_shard(shard):
+                moved = await archive_expired_passes(timedelta(days=retention_days), batch_size)
+            print(f"Archived {moved} passes on shard {shard.name}")
+        if not interval:
+            return
+        await asyncio.sleep(interval)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive long-expired passes")
+    parser.add_argument("--retention-days", type=int, default=ARCHIVE_RETENTION_DAYS)
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE)
+    parser.add_argument(
+        "--interval", type=int, default=0,
+        help="Keep running, archiving every INTERVAL seconds",
+    )
+    args = parser.parse_args()
+    asyncio.run(_main(args.retention_days, args.batch_size, args.interval))
@@ -1,11 +1,15 @@
 import os
+import logging
 import json
 import uuid
-from typing import Dict, Any, Optional
+import threading
+from typing import Dict, Any, List, Optional
 from datetime import datetime
-from dotenv import load_dotenv
+from ..config import load_env
 
-load_dotenv()
+load_env()
+
+logger = logging.getLogger(__name__)
 
 # Google Wallet credentials from env
 GOOGLE_WALLET_CREDENTIALS = os.getenv("GOOGLE_WALLET_CREDENTIALS", "{}")
@@ -17,13 +21,27 @@ GOOGLE_PAY_ORIGIN = "https://pay.google.com"
 
 class GoogleWalletService:
     def __init__(self):
-        try:
-            self.credentials = json.loads(GOOGLE_WALLET_CREDENTIALS)
-            if not self.credentials:
-                print("WARNING: Google Wallet credentials not provided")
-        except json.JSONDecodeError:
-            print("WARNING: Invalid Google Wallet credentials JSON")
-            self.credentials = None
+        # Credentials are parsed by warm(), at startup or on first use
+        self.credentials = None
+        self._warmed = False
+        self._warm_lock = threading.Lock()
+
+    def warm(self) -> None:
+        """Parse the service account credentials"""
+        if self._warmed:
+            return
+        # Set only after the credentials are assigned, so a concurrent first use waits for them
+        with self._warm_lock:
+            if self._warmed:
+                return
+            try:
+                self.credentials = json.loads(GOOGLE_WALLET_CREDENTIALS)
+                if not self.credentials:
+                    logger.warning("Google Wallet credentials not provided")
+            except json.JSONDecodeError:
+                logger.warning("Invalid Google Wallet credentials JSON")
+                self.credentials = None
+            self._warmed = True
 
     async def create_generic_pass(
         self, design_json: Dict[str, Any], pass_id: str, metadata: Optional[Dict[str, Any]] = None
@@ -42,6 +60,7 @@ class GoogleWalletService:
         Returns:
             Deep link URL to add the pass to Google Wallet
         """
+        self.warm()
         if not self.credentials:
             raise ValueError("Google Wallet credentials not configured")
             
@@ -63,6 +82,24 @@ class GoogleWalletService:
         deep_link = f"{GOOGLE_PAY_ORIGIN}/gp/v/save/{jwt_token}"
         
         return deep_link
+
+    async def expire_generic_passes(self, pass_ids: List[str]) -> None:
+        """
+        Expire the Google Wallet objects of passes that will never be saved
+        
+        Objects can't be deleted through the Google Wallet API; a full
+        implementation would patch each object's state to EXPIRED. This MVP
+        creates no objects, so there is nothing to expire.
+        
+        Args:
+            pass_ids: UUIDs of the passes
+        """
+        self.warm()
+        if not self.credentials:
+            raise ValueError("Google Wallet credentials not configured")
+        
+        object_ids = [f"PASS_{pass_id}" for pass_id in pass_ids]
+        logger.info("Expired Google Wallet objects", extra={"count": len(object_ids)})
         
 
 # Create a singleton instance
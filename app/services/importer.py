@@ -0,0 +1,201 @@
+import os
+import csv
+import asyncio
+import tempfile
+import uuid
+from datetime import datetime, timezone
+from itertools import islice
+from typing import Any, Dict, List, Tuple
+from ..config import load_env
+from sqlalchemy import update, text
+
+from ..models.base import async_session
+from ..models.models import ImportJob
+from .issuer import issuer_service
+from .admission import RateLimitExceeded
+
+load_env()
+
+IMPORT_SPOOL_DIR = os.getenv(
+    "IMPORT_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "passmint-imports")
+)
+IMPORT_CHUNK_SIZE = int(os.getenv("IMPORT_CHUNK_SIZE", "1000"))
+IMPORT_ISSUE_CONCURRENCY = int(os.getenv("IMPORT_ISSUE_CONCURRENCY", "8"))
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "1000"))
+
+LINE_USER_ID_COLUMN = "line_user_id"
+
+
+class ImportService:
+    """
+    Bulk onboarding of recipients from a CSV file.
+
+    The CSV needs a `line_user_id` column; every other column becomes pass
+    metadata for that row. Rows are processed in chunks: users are upserted
+    with COPY into a temporary staging table followed by a single merge,
+    then passes are issued for the chunk's users with bounded concurrency.
+    """
+
+    async def run(self, job_id: str, path: str) -> None:
+        """
+        Process an uploaded CSV for an import job.
+
+        Args:
+            job_id: Import job ID
+            path: Path of the spooled upload; removed when done
+        """
+        try:
+            async with async_session() as session:
+                job = await session.get(ImportJob, uuid.UUID(job_id))
+                design_id = str(job.design_id)
+            total_rows = await asyncio.to_thread(_count_rows, path)
+            await self._update(job_id, status="running", total_rows=total_rows)
+
+            with open(path, newline="", encoding="utf-8-sig") as f:
+                reader = csv.DictReader(f)
+                if not reader.fieldnames or LINE_USER_ID_COLUMN not in reader.fieldnames:
+                    raise ValueError(f"CSV must have a {LINE_USER_ID_COLUMN} column")
+
+                row_num = 1  # Header is row 1
+                while True:
+                    rows = await asyncio.to_thread(list, islice(reader, IMPORT_CHUNK_SIZE))
+                    if not rows:
+                        break
+                    numbered = list(enumerate(rows, start=row_num + 1))
+                    row_num += len(rows)
+                    await self._process_chunk(job_id, design_id, numbered)
+
+            await self._update(job_id, status="completed", finished_at=datetime.now(timezone.utc))
+        except Exception as e:
+            await self._fail(job_id, str(e))
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    async def _process_chunk(
+        self, job_id: str, design_id: str, rows: List[Tuple[int, Dict[str, Any]]]
+    ) -> None:
+        errors = []
+        valid = []
+        for row_num, row in rows:
+            line_user_id = (row.pop(LINE_USER_ID_COLUMN, None) or "").strip()
+            if not line_user_id:
+                errors.append({"row": row_num, "error": "Missing line_user_id"})
+            elif len(line_user_id) > 64:
+                errors.append({"row": row_num, "error": "line_user_id longer than 64 characters"})
+            else:
+                metadata = {k: v for k, v in row.items() if k and v not in (None, "")}
+                valid.append((row_num, line_user_id, metadata))
+
+        user_ids = await self._upsert_users([(row_num, line_user_id) for row_num, line_user_id, _ in valid])
+
+        semaphore = asyncio.Semaphore(IMPORT_ISSUE_CONCURRENCY)
+
+        async def issue(row_num: int, metadata: Dict[str, Any]):
+            async with semaphore:
+                try:
+                    await self._issue_with_backoff(user_ids[row_num], design_id, metadata or None)
+                    return None
+                except Exception as e:
+                    return {"row": row_num, "error": str(e)}
+
+        results = await asyncio.gather(
+            *[issue(row_num, metadata) for row_num, _, metadata in valid]
+        )
+        errors.extend(result for result in results if result)
+        errors.sort(key=lambda error: error["row"])
+
+        await self._record_progress(job_id, len(rows), len(rows) - len(errors), errors)
+
+    async def _upsert_users(self, rows: List[Tuple[int, str]]) -> Dict[int, str]:
+        """
+        Upsert users for a chunk with COPY + merge.
+
+        Args:
+            rows: (row number, LINE user ID) pairs
+
+        Returns:
+            Mapping of row number to user ID
+        """
+        if not rows:
+            return {}
+
+        async with async_session() as session:
+            conn = await session.connection()
+            await conn.execute(text(
+                "CREATE TEMP TABLE import_staging "
+                "(row_num integer NOT NULL, line_user_id varchar(64) NOT NULL) "
+                "ON COMMIT DROP"
+            ))
+
+            raw = await conn.get_raw_connection()
+            await raw.driver_connection.copy_records_to_table(
+                "import_staging",
+                records=rows,
+                columns=["row_num", "line_user_id"],
+            )
+
+            await conn.execute(text(
+                "INSERT INTO users (id, line_user_id) "
+                "SELECT gen_random_uuid(), line_user_id "
+                "FROM (SELECT DISTINCT line_user_id FROM import_staging) s "
+                "ON CONFLICT (line_user_id) DO NOTHING"
+            ))
+            result = await conn.execute(text(
+                "SELECT s.row_num, u.id "
+                "FROM import_staging s JOIN users u ON u.line_user_id = s.line_user_id"
+            ))
+            user_ids = {row.row_num: str(row.id) for row in result}
+            await session.commit()
+
+        return user_ids
+
+    async def _issue_with_backoff(self, user_id: str, design_id: str, metadata) -> None:
+        """Issue a pass, waiting out the org's rate limit instead of failing the row"""
+        while True:
+            try:
+                async with async_session() as session:
+                    await issuer_service.issue_pass(session, user_id, design_id, metadata)
+                return
+            except RateLimitExceeded as e:
+                await asyncio.sleep(e.retry_after)
+
+    async def _record_progress(
+        self, job_id: str, processed: int, succeeded: int, errors: List[Dict[str, Any]]
+    ) -> None:
+        async with async_session() as session:
+            job = await session.get(ImportJob, uuid.UUID(job_id))
+            job.processed_rows += processed
+            job.succeeded_rows += succeeded
+            job.failed_rows += len(errors)
+            room = IMPORT_MAX_ERRORS - len(job.errors)
+            if room > 0 and errors:
+                job.errors = job.errors + errors[:room]
+            await session.commit()
+
+    async def _fail(self, job_id: str, message: str) -> None:
+        async with async_session() as session:
+            job = await session.get(ImportJob, uuid.UUID(job_id))
+            job.status = "failed"
+            job.finished_at = datetime.now(timezone.utc)
+            job.errors = job.errors + [{"row": None, "error": message}]
+            await session.commit()
+
+    async def _update(self, job_id: str, **values) -> None:
+        async with async_session() as session:
+            await session.execute(
+                update(ImportJob).where(ImportJob.id == uuid.UUID(job_id)).values(**values)
+            )
+            await session.commit()
+
+
+def _count_rows(path: str) -> int:
+    """Count data rows in a CSV file the way run() reads them, skipping blank lines"""
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        return sum(1 for _ in csv.DictReader(f))
+
+
+# Create a singleton instance
+import_service = ImportService()
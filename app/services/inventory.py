@@ -0,0 +1,402 @@
+"""
+Pre-signed pass inventory for campaign launches.
+
+An org asks for a pool of passes for a design ahead of time; they are
+signed and uploaded in the background and wait in `pass_inventory` with no
+user attached. Issuance without per-user metadata then claims one with a
+single statement (SKIP LOCKED, so concurrent claims never wait on each
+other) instead of signing on the request path. Pools are refilled when they
+drop below their low watermark, and unclaimed passes expire after the
+pool's TTL. Expired and discarded passes have their uploaded .pkpass files
+deleted and their Google Wallet objects expired once their rows are gone.
+
+Refill every pool and drop expired inventory from cron with:
+
+    python -m app.services.inventory
+"""
+import os
+import logging
+import time
+import uuid
+import asyncio
+import argparse
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Set
+from sqlalchemy import select, delete, func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import load_env
+from ..models.base import async_session, current_shard, shards, use_shard
+from ..models.models import Design, InventoryPool, PassInventory
+from ..schemas.passes import CreatePassResponse, Platforms, PlatformInfo
+from ..utils.ids import uuid7
+from ..utils.qrcode import generate_qr_png_base64
+from ..utils.storage import storage
+from .google_wallet import google_wallet_service
+from .rollups import record_issuance
+from .webhooks import record_event
+
+load_env()
+
+logger = logging.getLogger(__name__)
+
+# Passes signed concurrently while filling a pool
+INVENTORY_FILL_CONCURRENCY = int(os.getenv("INVENTORY_FILL_CONCURRENCY", "8"))
+
+# Rows inserted per transaction while filling
+INVENTORY_INSERT_BATCH = 100
+
+# After a claim, check a design's pool level at most this often per worker
+INVENTORY_CHECK_INTERVAL = float(os.getenv("INVENTORY_CHECK_INTERVAL", "5"))
+
+# Take the oldest unexpired item, bind it to the user as a pass with its
+# artifacts, and return what the response needs, all in one statement
+CLAIM_SQL = text("""
+    WITH item AS (
+        SELECT id FROM pass_inventory
+        WHERE design_id = CAST(:design_id AS uuid) AND expires_at > now()
+        ORDER BY id
+        LIMIT 1
+        FOR UPDATE SKIP LOCKED
+    ),
+    claimed AS (
+        DELETE FROM pass_inventory i USING item
+        WHERE i.id = item.id
+        RETURNING i.id, i.design_id, i.artifacts, i.qr_png, i.pass_expires_at
+    ),
+    new_pass AS (
+        INSERT INTO passes (id, user_id, design_id, expires_at)
+        SELECT id, CAST(:user_id AS uuid), design_id, pass_expires_at FROM claimed
+        RETURNING id
+    ),
+    new_artifacts AS (
+        INSERT INTO pass_artifacts (pass_id, platform, serial, deep_link)
+        SELECT c.id, a.platform, a.serial, a.deep_link
+        FROM claimed c,
+             jsonb_to_recordset(c.artifacts) AS a(platform text, serial text, deep_link text)
+    )
+    SELECT id, artifacts, qr_png, pass_expires_at FROM claimed
+""")
+
+
+def _delete_items(*where):
+    """Delete inventory rows, returning what their artifacts need to be removed"""
+    return delete(PassInventory).where(*where).returning(PassInventory.id, PassInventory.artifacts)
+
+
+async def _remove_artifacts(rows) -> None:
+    """
+    Remove the stored files and wallet objects of deleted inventory.
+
+    Called after the delete commits, so a claimed pass never loses its file;
+    a failure leaves orphaned files behind and is logged.
+    """
+    platforms = {
+        platform: [str(row.id) for row in rows if any(a["platform"] == platform for a in row.artifacts)]
+        for platform in ("apple", "google")
+    }
+    try:
+        await storage.delete_files([f"passes/apple/{pass_id}.pkpass" for pass_id in platforms["apple"]])
+        if platforms["google"]:
+            await google_wallet_service.expire_generic_passes(platforms["google"])
+    except Exception:
+        logger.exception("Error removing discarded inventory", extra={"count": len(rows)})
+
+
+class InventoryService:
+    def __init__(self):
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._last_checked: Dict[str, float] = {}
+        self._pooled: Set[str] = set()
+        self._pools_loaded_at: Dict[str, float] = {}  # Per database shard
+
+    async def _has_pool(self, session: AsyncSession, design_id: str) -> bool:
+        # Designs with pools, refreshed like the rate limit config
+        shard = current_shard().name
+        if time.monotonic() - self._pools_loaded_at.get(shard, 0.0) > INVENTORY_CHECK_INTERVAL:
+            result = await session.execute(select(InventoryPool.design_id))
+            self._pooled.update(str(row) for row in result.scalars())
+            self._pools_loaded_at[shard] = time.monotonic()
+        return design_id in self._pooled
+
+    async def claim(
+        self, session: AsyncSession, user_id: str, design: Design
+    ) -> Optional[CreatePassResponse]:
+        """
+        Issue a pass from the design's inventory, if it has any.
+
+        Args:
+            session: Database session
+            user_id: User the pass is bound to
+            design: Design being issued
+
+        Returns:
+            CreatePassResponse, or None when there is no inventory to claim
+        """
+        design_id = str(design.id)
+        if not await self._has_pool(session, design_id):
+            return None
+
+        result = await session.execute(CLAIM_SQL, {
+            "design_id": design.id,
+            "user_id": uuid.UUID(user_id),
+        })
+        row = result.first()
+        if row is None:
+            # Nothing was written; the caller's transaction carries on as it was
+            self.schedule_fill(design_id)
+            return None
+
+        await record_issuance(
+            session,
+            str(design.org_id),
+            design_id,
+            [artifact["platform"] for artifact in row.artifacts],
+            design.template_json.get("expires_at"),
+        )
+        await record_event(session, str(design.org_id), "pass.issued", {
+            "pass_id": row.id,
+            "design_id": design_id,
+            "user_id": user_id,
+            "platforms": [artifact["platform"] for artifact in row.artifacts],
+            "expires_at": row.pass_expires_at,
+        })
+        await session.commit()
+        self.schedule_fill(design_id)
+
+        platforms = Platforms(**{
+            artifact["platform"]: PlatformInfo(
+                deep_link=artifact["deep_link"],
+                serial=artifact["serial"] if artifact["platform"] == "apple" else None,
+            )
+            for artifact in row.artifacts
+        })
+        return CreatePassResponse(
+            pass_id=row.id,
+            platforms=platforms,
+            qr_png=row.qr_png,
+            expires_at=row.pass_expires_at,
+        )
+
+    async def configure(
+        self,
+        session: AsyncSession,
+        design: Design,
+        size: int,
+        low_watermark: int,
+        ttl_seconds: int,
+    ) -> InventoryPool:
+        """
+        Create or resize a design's pool and start filling it.
+
+        Args:
+            session: Database session
+            design: Design to keep passes ready for
+            size: Passes to keep ready
+            low_watermark: Refill when fewer remain
+            ttl_seconds: Lifetime of an unclaimed pass
+
+        Returns:
+            The pool
+        """
+        stmt = insert(InventoryPool).values(
+            design_id=design.id,
+            org_id=design.org_id,
+            target_size=size,
+            low_watermark=low_watermark,
+            ttl_seconds=ttl_seconds,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["design_id"],
+            set_={
+                "target_size": stmt.excluded.target_size,
+                "low_watermark": stmt.excluded.low_watermark,
+                "ttl_seconds": stmt.excluded.ttl_seconds,
+            },
+        ).returning(InventoryPool)
+        result = await session.execute(stmt)
+        pool = result.scalars().one()
+        await session.commit()
+
+        self._pooled.add(str(design.id))
+        self.schedule_fill(str(design.id), force=True)
+        return pool
+
+    async def remove(self, session: AsyncSession, design_id: str) -> None:
+        """Drop a design's pool and its unclaimed passes"""
+        result = await session.execute(_delete_items(PassInventory.design_id == uuid.UUID(design_id)))
+        discarded = result.all()
+        await session.execute(delete(InventoryPool).where(InventoryPool.design_id == uuid.UUID(design_id)))
+        await session.commit()
+        self._pooled.discard(design_id)
+        await _remove_artifacts(discarded)
+
+    def schedule_fill(self, design_id: str, force: bool = False) -> None:
+        """
+        Check the pool level in the background, refilling it if low.
+
+        Args:
+            design_id: Design ID
+            force: Fill to the target even above the low watermark
+        """
+        now = time.monotonic()
+        if not force and now - self._last_checked.get(design_id, 0) < INVENTORY_CHECK_INTERVAL:
+            return
+        task = self._tasks.get(design_id)
+        if task is not None and not task.done():
+            return
+        self._last_checked[design_id] = now
+        self._tasks[design_id] = asyncio.create_task(self._fill_logged(design_id, force))
+
+    async def _fill_logged(self, design_id: str, force: bool) -> None:
+        try:
+            await self.fill(design_id, force)
+        except Exception:
+            logger.exception("Error filling inventory", extra={"design_id": design_id})
+
+    async def fill(self, design_id: str, force: bool = False) -> int:
+        """
+        Drop expired inventory and top the pool back up to its target.
+
+        Only one worker fills a given design at a time.
+
+        Args:
+            design_id: Design ID
+            force: Fill even if the pool is above its low watermark
+
+        Returns:
+            Number of passes added
+        """
+        # Imported here: the issuer claims from this module
+        from .issuer import issuer_service
+
+        async with current_shard().engine.connect() as lock_conn:
+            # Session-level lock on an autocommit connection, so the lock
+            # holder does not sit idle in a transaction while passes are signed
+            lock_conn = await lock_conn.execution_options(isolation_level="AUTOCOMMIT")
+            result = await lock_conn.execute(
+                text("SELECT pg_try_advisory_lock(hashtext(:key))"),
+                {"key": f"inventory:{design_id}"},
+            )
+            if not result.scalar():
+                return 0
+            try:
+                async with async_session() as session:
+                    pool = await session.get(InventoryPool, uuid.UUID(design_id))
+                    design = await session.get(Design, uuid.UUID(design_id))
+                    if pool is None or design is None:
+                        return 0
+
+                    result = await session.execute(_delete_items(
+                        PassInventory.design_id == design.id,
+                        PassInventory.expires_at <= func.now(),
+                    ))
+                    expired = result.all()
+                    result = await session.execute(
+                        select(func.count()).select_from(PassInventory).where(
+                            PassInventory.design_id == design.id
+                        )
+                    )
+                    available = result.scalar() or 0
+                    await session.commit()
+                    await _remove_artifacts(expired)
+
+                    if available >= pool.target_size or (
+                        not force and available >= pool.low_watermark
+                    ):
+                        return 0
+
+                    return await self._add_items(
+                        session, issuer_service, design, pool, pool.target_size - available
+                    )
+            finally:
+                await lock_conn.execute(
+                    text("SELECT pg_advisory_unlock(hashtext(:key))"),
+                    {"key": f"inventory:{design_id}"},
+                )
+
+    async def _add_items(self, session, issuer_service, design, pool, count: int) -> int:
+        semaphore = asyncio.Semaphore(INVENTORY_FILL_CONCURRENCY)
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=pool.ttl_seconds)
+
+        async def make_item() -> Optional[PassInventory]:
+            async with semaphore:
+                pass_id = uuid7()
+                artifacts, _ = await issuer_service.sign_artifacts(design, str(pass_id))
+                if not artifacts:
+                    return None
+                qr_png = await asyncio.to_thread(generate_qr_png_base64, artifacts[0].deep_link)
+                return PassInventory(
+                    id=pass_id,
+                    design_id=design.id,
+                    artifacts=[
+                        {"platform": a.platform, "serial": a.serial, "deep_link": a.deep_link}
+                        for a in artifacts
+                    ],
+                    qr_png=qr_png,
+                    pass_expires_at=design.template_json.get("expires_at"),
+                    expires_at=expires_at,
+                )
+
+        added = 0
+        for start in range(0, count, INVENTORY_INSERT_BATCH):
+            batch = min(INVENTORY_INSERT_BATCH, count - start)
+            items = [item for item in await asyncio.gather(*[make_item() for _ in range(batch)]) if item]
+            if not items:
+                # Signing is failing for every platform; don't spin
+                break
+            session.add_all(items)
+            await session.commit()
+            added += len(items)
+        return added
+
+    async def status(self, session: AsyncSession, design_id: str) -> Dict[str, int]:
+        """Count unexpired inventory for a design"""
+        result = await session.execute(
+            select(func.count()).select_from(PassInventory).where(
+                PassInventory.design_id == uuid.UUID(design_id),
+                PassInventory.expires_at > func.now(),
+            )
+        )
+        return {"available": result.scalar() or 0}
+
+    async def refill_all(self) -> int:
+        """Expire and refill every pool on every shard; for cron"""
+        added = 0
+        for shard in shards.values():
+            with use_shard(shard):
+                async with async_session() as session:
+                    result = await session.execute(select(InventoryPool.design_id))
+                    design_ids = [str(row) for row in result.scalars()]
+                    result = await session.execute(_delete_items(PassInventory.expires_at <= func.now()))
+                    expired = result.all()
+                    await session.commit()
+                await _remove_artifacts(expired)
+
+                for design_id in design_ids:
+                    added += await self.fill(design_id)
+        return added
+
+
+# Create a singleton instance
+inventory_service = InventoryService()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Refill pass inventory pools")
+    parser.add_argument(
+        "--interval", type=int, default=0,
+        help="Keep running, refilling every INTERVAL seconds",
+    )
+    args = parser.parse_args()
+
+    async def _main() -> None:
+        while True:
+            added = await inventory_service.refill_all()
+            print(f"Added {added} passes to inventory")
+            if not args.interval:
+                return
+            await asyncio.sleep(args.interval)
+
+    asyncio.run(_main())
@@ -1,15 +1,30 @@
+import logging
+import json
 import uuid
 from typing import Dict, Any, Optional, Tuple, List
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
+from sqlalchemy import select, update, func
 from sqlalchemy.future import select
 
-from ..models.models import Pass, Design
+from ..models.models import Pass, PassArtifact, Design
 from ..utils.qrcode import generate_qr_png_base64
+from ..utils.ids import uuid7
+from ..utils.shared_cache import shared_cache
 from ..schemas.passes import CreatePassResponse, Platforms, PlatformInfo
 from .apple_pass import apple_pass_signer
 from .google_wallet import google_wallet_service
+from .admission import admission_controller
+from .apns import apns_dispatcher
+from .rollups import record_issuance
+from .serials import serial_allocator
+from .inventory import inventory_service
+from .webhooks import record_event
+
+logger = logging.getLogger(__name__)
+
+# Bump when the cached fields change, to drop designs cached by every worker
+DESIGN_CACHE_VERSION = "1"
 
 
 class IssuerService:
@@ -31,43 +46,72 @@ class IssuerService:
             
         Returns:
             CreatePassResponse with pass details
+            
+        Raises:
+            ValueError: If the design does not exist
+            RateLimitExceeded: If the org is over its issuance limits
         """
         # Get design details
         design = await self._get_design(session, design_id)
         if not design:
             raise ValueError(f"Design not found: {design_id}")
             
-        # Generate pass ID
-        pass_id = str(uuid.uuid4())
+        # Admission control: per-org token bucket, then a fair issuance slot
+        org_id = str(design.org_id)
+        limits = await admission_controller.check_org(session, org_id, "issue_pass")
+        
+        # Passes without per-user fields come from pre-signed inventory when stocked
+        if not metadata:
+            claimed = await inventory_service.claim(session, user_id, design)
+            if claimed:
+                return claimed
+        
+        async with admission_controller.scheduler.slot(org_id, limits.weight):
+            return await self._issue_for_design(session, user_id, design, metadata)
+
+    async def sign_artifacts(
+        self,
+        design: Design,
+        pass_id: str,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> Tuple[List[PassArtifact], Platforms]:
+        """
+        Sign and upload a pass for each platform, without touching the database
+        
+        Args:
+            design: Design to issue from
+            pass_id: ID the pass will be stored under
+            metadata: Optional metadata
+            
+        Returns:
+            Tuple of (artifacts for the platforms that succeeded, response platforms)
+        """
+        # Serials come from this worker's reserved block, without a DB round trip
+        serials = await serial_allocator.next_serials()
         
         # Platforms dict to store results
         platforms = Platforms()
+        artifacts = []
         
         # Try to generate Apple Wallet pass
         try:
             serial, deep_link, _ = await apple_pass_signer.generate_pass(
-                design.template_json, pass_id, metadata
+                design.template_json, pass_id, serials["apple"], metadata
             )
             
-            # Save to database
-            apple_pass = Pass(
-                id=uuid.UUID(pass_id),
-                user_id=uuid.UUID(user_id),
-                design_id=uuid.UUID(design_id),
+            artifacts.append(PassArtifact(
                 platform="apple",
                 serial=serial,
-                deep_link=deep_link,
-                expires_at=design.template_json.get("expires_at")
-            )
-            session.add(apple_pass)
+                deep_link=deep_link
+            ))
             
             # Add to response
             platforms.apple = PlatformInfo(
                 deep_link=deep_link,
                 serial=serial
             )
-        except Exception as e:
-            print(f"Error generating Apple Pass: {e}")
+        except Exception:
+            logger.exception("Error generating Apple Pass", extra={"pass_id": pass_id})
             # Continue with Google Wallet
             
         # Try to generate Google Wallet pass
@@ -76,32 +120,71 @@ class IssuerService:
                 design.template_json, pass_id, metadata
             )
             
-            # Save to database
-            google_pass = Pass(
-                id=uuid.UUID(pass_id),
-                user_id=uuid.UUID(user_id),
-                design_id=uuid.UUID(design_id),
+            artifacts.append(PassArtifact(
                 platform="google",
-                serial=f"GP-{uuid.uuid4().hex[:8].upper()}",
-                deep_link=deep_link,
-                expires_at=design.template_json.get("expires_at")
-            )
-            session.add(google_pass)
+                serial=serials["google"],
+                deep_link=deep_link
+            ))
             
             # Add to response
             platforms.google = PlatformInfo(
                 deep_link=deep_link
             )
-        except Exception as e:
-            print(f"Error generating Google Wallet pass: {e}")
-            
-        # Commit to save both passes
-        await session.commit()
+        except Exception:
+            logger.exception("Error generating Google Wallet pass", extra={"pass_id": pass_id})
+        
+        return artifacts, platforms
+
+    async def _issue_for_design(
+        self,
+        session: AsyncSession,
+        user_id: str,
+        design: Design,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> CreatePassResponse:
+        """Sign, upload and store passes for a design already admitted"""
+        design_id = str(design.id)
+        
+        # Generate pass ID; time-ordered so inserts stay on the index's right edge
+        pass_id = str(uuid7())
+        
+        artifacts, platforms = await self.sign_artifacts(design, pass_id, metadata)
         
         # If no passes were created, raise error
-        if not platforms.apple and not platforms.google:
+        if not artifacts:
             raise ValueError("Failed to create passes for all platforms")
-            
+        
+        # One pass row with an artifact per platform that succeeded
+        new_pass = Pass(
+            id=uuid.UUID(pass_id),
+            user_id=uuid.UUID(user_id),
+            design_id=uuid.UUID(design_id),
+            expires_at=design.template_json.get("expires_at"),
+            artifacts=artifacts
+        )
+        session.add(new_pass)
+        
+        # Count the issuance in the analytics rollups, in the same transaction
+        await record_issuance(
+            session,
+            str(design.org_id),
+            design_id,
+            [artifact.platform for artifact in artifacts],
+            design.template_json.get("expires_at"),
+        )
+        
+        # Queue webhooks; they exist only if the pass commits
+        await record_event(session, str(design.org_id), "pass.issued", {
+            "pass_id": pass_id,
+            "design_id": design_id,
+            "user_id": user_id,
+            "platforms": [artifact.platform for artifact in artifacts],
+            "expires_at": design.template_json.get("expires_at"),
+        })
+        
+        # Commit the pass and its artifacts together
+        await session.commit()
+        
         # Generate QR code with the first available deep link
         deep_link = (platforms.apple.deep_link if platforms.apple else
                     platforms.google.deep_link if platforms.google else None)
@@ -144,20 +227,103 @@ class IssuerService:
         # 3. Update the database record
         
         # For now, we'll just update the last_updated timestamp
+        apple_serial = select(PassArtifact.serial).where(
+            PassArtifact.pass_id == Pass.id,
+            PassArtifact.platform == "apple"
+        ).scalar_subquery()
+        org_id = select(Design.org_id).where(Design.id == Pass.design_id).scalar_subquery()
         stmt = update(Pass).where(Pass.id == uuid.UUID(pass_id)).values(
             last_updated=datetime.utcnow()
-        )
+        ).returning(apple_serial, org_id, Pass.design_id, Pass.user_id, Pass.last_updated)
         
         result = await session.execute(stmt)
+        updated = result.all()
+        for _, org, design_id, user_id, last_updated in updated:
+            if org:
+                await record_event(session, str(org), "pass.updated", {
+                    "pass_id": pass_id,
+                    "design_id": design_id,
+                    "user_id": user_id,
+                    "fields": fields,
+                    "updated_at": last_updated,
+                })
         await session.commit()
         
-        return result.rowcount > 0
+        # Tell registered Wallet devices to fetch the new version
+        await apns_dispatcher.notify_serials(
+            session, [row[0] for row in updated if row[0]]
+        )
+        
+        return len(updated) > 0
+    
+    async def redeem_pass(
+        self,
+        session: AsyncSession,
+        org_id: str,
+        pass_id: str
+    ) -> Optional[datetime]:
+        """
+        Mark one of the org's passes redeemed, once
+        
+        Args:
+            session: Database session
+            org_id: Org redeeming; the pass must be of one of its designs
+            pass_id: Pass ID to redeem
+            
+        Returns:
+            When it was redeemed, or None if it was not found or already redeemed
+        """
+        org_designs = select(Design.id).where(Design.org_id == uuid.UUID(org_id))
+        stmt = update(Pass).where(
+            Pass.id == uuid.UUID(pass_id),
+            Pass.redeemed_at.is_(None),
+            Pass.design_id.in_(org_designs),
+        ).values(redeemed_at=func.now()).returning(Pass.design_id, Pass.user_id, Pass.redeemed_at)
+        
+        row = (await session.execute(stmt)).first()
+        if row is None:
+            await session.rollback()
+            return None
+        
+        await record_event(session, org_id, "pass.redeemed", {
+            "pass_id": pass_id,
+            "design_id": row.design_id,
+            "user_id": row.user_id,
+            "redeemed_at": row.redeemed_at,
+        })
+        await session.commit()
+        return row.redeemed_at
     
     async def _get_design(self, session: AsyncSession, design_id: str) -> Optional[Design]:
-        """Get design from database"""
+        """Get design from the host's shared cache, or the database"""
+        # Entries are versioned by the design's updated_at, so an edit is seen
+        # by every worker at once; only the timestamp is read on a hit
+        stmt = select(Design.updated_at).where(Design.id == uuid.UUID(design_id))
+        updated_at = (await session.execute(stmt)).scalar()
+        if updated_at is None:
+            return None
+        key = f"design:{design_id}"
+        version = f"{DESIGN_CACHE_VERSION}:{updated_at.isoformat()}"
+        cached = await shared_cache.get(key, version)
+        if cached is not None:
+            # Issuance only reads these fields; the object is never attached to a session
+            fields = json.loads(cached)
+            return Design(
+                id=uuid.UUID(fields["id"]),
+                org_id=uuid.UUID(fields["org_id"]),
+                template_json=fields["template_json"],
+            )
+        
         stmt = select(Design).where(Design.id == uuid.UUID(design_id))
         result = await session.execute(stmt)
-        return result.scalars().first()
+        design = result.scalars().first()
+        if design:
+            shared_cache.set(key, json.dumps({
+                "id": str(design.id),
+                "org_id": str(design.org_id),
+                "template_json": design.template_json,
+            }).encode("utf-8"), f"{DESIGN_CACHE_VERSION}:{design.updated_at.isoformat()}")
+        return design
         
 
 # Create a singleton instance
@@ -0,0 +1,164 @@
+import uuid
+from datetime import datetime
+from typing import Any, List, Optional
+from sqlalchemy import select, or_
+from sqlalchemy.orm import selectinload
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.models import Pass, PassArtifact, Design
+from ..schemas.passes import PassListItem, PassListResponse, Platforms, PlatformInfo
+from ..schemas.designs import DesignResponse, DesignListResponse
+from ..utils.pagination import encode_cursor, decode_cursor, keyset_after
+
+
+async def list_passes(
+    session: AsyncSession,
+    filters: List[Any],
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    platform: Optional[str] = None,
+    expired: Optional[bool] = None,
+    issued_after: Optional[datetime] = None,
+    issued_before: Optional[datetime] = None,
+) -> PassListResponse:
+    """
+    List passes newest first with keyset pagination.
+
+    Pages are ordered by (issued_at, id) descending, so each page is an index
+    seek on (user_id | design_id, issued_at, id) no matter how deep the client
+    has paged. Artifacts for the page are loaded in one more query.
+
+    Args:
+        session: Database session
+        filters: Scope clauses, e.g. Pass.user_id == ...
+        cursor: Cursor from the previous page
+        limit: Page size
+        platform: Only passes for this platform
+        expired: True for expired passes only, False for active passes only
+        issued_after: Only passes issued at or after this time
+        issued_before: Only passes issued before this time
+
+    Returns:
+        PassListResponse with the page and the cursor for the next one
+    """
+    sort_key = (Pass.issued_at, Pass.id)
+    stmt = select(Pass).options(selectinload(Pass.artifacts)).where(*filters)
+
+    if platform:
+        stmt = stmt.where(Pass.artifacts.any(PassArtifact.platform == platform))
+    if expired is True:
+        stmt = stmt.where(Pass.expires_at <= datetime.utcnow())
+    elif expired is False:
+        stmt = stmt.where(or_(Pass.expires_at.is_(None), Pass.expires_at > datetime.utcnow()))
+    if issued_after:
+        stmt = stmt.where(Pass.issued_at >= issued_after)
+    if issued_before:
+        stmt = stmt.where(Pass.issued_at < issued_before)
+    if cursor:
+        stmt = stmt.where(keyset_after(sort_key, decode_cursor(cursor, (datetime, uuid.UUID))))
+
+    # Fetch one extra row to learn whether another page exists
+    stmt = stmt.order_by(*[column.desc() for column in sort_key]).limit(limit + 1)
+    result = await session.execute(stmt)
+    rows = result.scalars().all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.issued_at, last.id)
+
+    return PassListResponse(
+        items=[_pass_list_item(row) for row in rows],
+        next_cursor=next_cursor,
+    )
+
+
+def merge_pass_pages(pages: List[PassListResponse], limit: int) -> PassListResponse:
+    """
+    Merge pages listed with the same cursor from several database shards.
+
+    Each page holds that shard's first `limit` passes after the cursor, so
+    the first `limit` of their union is the page across all shards.
+
+    Args:
+        pages: One page per shard
+        limit: Page size
+
+    Returns:
+        PassListResponse with the merged page and the cursor for the next one
+    """
+    items = sorted(
+        (item for page in pages for item in page.items),
+        key=lambda item: (item.issued_at, item.id),
+        reverse=True,
+    )
+    more = len(items) > limit or any(page.next_cursor for page in pages)
+    items = items[:limit]
+
+    next_cursor = None
+    if more and items:
+        next_cursor = encode_cursor(items[-1].issued_at, items[-1].id)
+
+    return PassListResponse(items=items, next_cursor=next_cursor)
+
+
+def _pass_list_item(row: Pass) -> PassListItem:
+    return PassListItem(
+        id=row.id,
+        design_id=row.design_id,
+        platforms=Platforms(**{
+            artifact.platform: PlatformInfo(deep_link=artifact.deep_link, serial=artifact.serial)
+            for artifact in row.artifacts
+        }),
+        expires_at=row.expires_at,
+        issued_at=row.issued_at,
+    )
+
+
+async def list_designs(
+    session: AsyncSession,
+    org_id: str,
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+) -> DesignListResponse:
+    """
+    List an org's designs newest first with keyset pagination on (created_at, id).
+
+    Args:
+        session: Database session
+        org_id: Org ID
+        cursor: Cursor from the previous page
+        limit: Page size
+        created_after: Only designs created at or after this time
+        created_before: Only designs created before this time
+
+    Returns:
+        DesignListResponse with the page and the cursor for the next one
+    """
+    sort_key = (Design.created_at, Design.id)
+    stmt = select(Design).where(Design.org_id == uuid.UUID(org_id))
+
+    if created_after:
+        stmt = stmt.where(Design.created_at >= created_after)
+    if created_before:
+        stmt = stmt.where(Design.created_at < created_before)
+    if cursor:
+        stmt = stmt.where(keyset_after(sort_key, decode_cursor(cursor, (datetime, uuid.UUID))))
+
+    stmt = stmt.order_by(*[column.desc() for column in sort_key]).limit(limit + 1)
+    result = await session.execute(stmt)
+    rows = result.scalars().all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+
+    return DesignListResponse(
+        items=[DesignResponse.model_validate(row) for row in rows],
+        next_cursor=next_cursor,
+    )
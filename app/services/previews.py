@@ -0,0 +1,123 @@
+import os
+import logging
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+from io import BytesIO
+from typing import Optional, Set
+from sqlalchemy import update, or_, func
+from ..config import load_env
+
+from ..models.base import async_session
+from ..models.models import Design
+from ..utils.pass_preview import render_pass_preview, template_hash
+from ..utils.storage import storage
+
+load_env()
+
+logger = logging.getLogger(__name__)
+
+# Seconds a render claim is held; a worker that dies mid-render loses it after this
+PREVIEW_CLAIM_TTL = float(os.getenv("PREVIEW_CLAIM_TTL", "120"))
+
+
+class PreviewService:
+    """
+    Renders design previews server-side, once per template version.
+
+    A render is claimed by setting designs.preview_claim to the template's
+    hash with a conditional UPDATE, so across all workers only the one that
+    wins the claim renders. The claim is a lease: if its worker crashes or
+    the render is cancelled, another worker may take it over once it is
+    PREVIEW_CLAIM_TTL seconds old. A failed render keeps its claim too, so a
+    template that can't be rendered is retried once per lease, not on every
+    read. The PNG is drawn in a worker thread,
+    stored under a key that includes the hash, and its URL saved on the
+    design together with preview_hash.
+    """
+
+    def __init__(self):
+        self._tasks: Set[asyncio.Task] = set()
+
+    def needs_render(self, design: Design) -> bool:
+        version = template_hash(design.template_json)
+        if design.preview_hash == version:
+            return False
+        # Leave a live claim for this version to the worker holding it
+        return not (
+            design.preview_claim == version
+            and design.preview_claimed_at is not None
+            and datetime.now(timezone.utc) - design.preview_claimed_at < timedelta(seconds=PREVIEW_CLAIM_TTL)
+        )
+
+    def ensure(self, design: Design) -> None:
+        """
+        Start rendering in the background if the design's preview is stale.
+
+        Args:
+            design: Design as just read or written
+        """
+        if not self.needs_render(design):
+            return
+        task = asyncio.create_task(self.render(str(design.id), design.template_json))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def render(self, design_id: str, template_json: dict) -> Optional[str]:
+        """
+        Render, store and record a design's preview unless another worker has.
+
+        Args:
+            design_id: Design ID
+            template_json: Template to render
+
+        Returns:
+            URL of the rendered preview, or None if not rendered here
+        """
+        version = template_hash(template_json)
+        claimed_by_us = (Design.id == uuid.UUID(design_id), Design.preview_claim == version)
+
+        async with async_session() as session:
+            result = await session.execute(
+                update(Design).where(
+                    Design.id == uuid.UUID(design_id),
+                    or_(Design.preview_hash.is_(None), Design.preview_hash != version),
+                    or_(
+                        Design.preview_claim.is_(None),
+                        Design.preview_claim != version,
+                        Design.preview_claimed_at < func.now() - timedelta(seconds=PREVIEW_CLAIM_TTL),
+                    ),
+                ).values(preview_claim=version, preview_claimed_at=func.now()).returning(Design.id)
+            )
+            claimed = result.scalar() is not None
+            await session.commit()
+            if not claimed:
+                return None
+
+            try:
+                png = await asyncio.to_thread(render_pass_preview, template_json)
+                url = await storage.upload_file(
+                    BytesIO(png),
+                    f"previews/{design_id}/{version}.png",
+                    content_type="image/png",
+                )
+            except Exception:
+                # The claim is kept until it lapses, which spaces out retries
+                logger.exception("Error rendering preview", extra={"design_id": design_id})
+                return None
+
+            # Skipped if the template changed meanwhile and a newer render claimed it
+            await session.execute(
+                update(Design).where(*claimed_by_us).values(
+                    rendered_preview_url=url,
+                    preview_hash=version,
+                    preview_claim=None,
+                    preview_claimed_at=None,
+                )
+            )
+            await session.commit()
+            return url
+
+
+# Create a singleton instance
+preview_service = PreviewService()
@@ -0,0 +1,149 @@
+import os
+import uuid
+import asyncio
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, List, Optional, Tuple
+from sqlalchemy import select, func
+
+from ..config import load_env
+from ..models.base import read_session_factory
+from ..models.models import Pass, PassArtifact, Design
+from ..utils.qr_sheets import render_chunk, sheet_writer
+
+load_env()
+
+# Worker processes rendering QR codes
+QR_WORKERS = int(os.getenv("QR_WORKERS", str(os.cpu_count() or 2)))
+
+# Codes per task sent to a worker; amortises pickling and IPC
+QR_CHUNK_SIZE = int(os.getenv("QR_CHUNK_SIZE", "64"))
+
+QR_BATCH_MAX_ITEMS = int(os.getenv("QR_BATCH_MAX_ITEMS", "50000"))
+
+# Seconds of replica lag a batch tolerates
+QR_BATCH_MAX_STALENESS = 30.0
+
+
+def _batch_statement(org_id: str, design_id: Optional[str], pass_ids: Optional[List[uuid.UUID]]):
+    """One (serial, deep link) per pass, preferring the Apple artifact like GET /passes/{id}"""
+    stmt = select(Pass.id, PassArtifact.serial, PassArtifact.deep_link).join(
+        PassArtifact, PassArtifact.pass_id == Pass.id
+    ).join(
+        Design, Design.id == Pass.design_id
+    ).where(
+        Design.org_id == uuid.UUID(org_id)
+    )
+    if design_id:
+        stmt = stmt.where(Pass.design_id == uuid.UUID(design_id))
+    if pass_ids:
+        stmt = stmt.where(Pass.id.in_(pass_ids))
+    return stmt.distinct(Pass.id).order_by(Pass.id, PassArtifact.platform)
+
+
+async def count_design_passes(session, design_id: str) -> int:
+    result = await session.execute(
+        select(func.count()).select_from(Pass).where(Pass.design_id == uuid.UUID(design_id))
+    )
+    return result.scalar() or 0
+
+
+class QRBatchRenderer:
+    """
+    Renders QR codes for many passes across a process pool.
+
+    Codes are rendered in chunks, several in flight per worker, and written
+    to the output in pass order as each chunk comes back, so the first bytes
+    go out long before the batch is finished.
+    """
+
+    def __init__(self, workers: int = QR_WORKERS, chunk_size: int = QR_CHUNK_SIZE):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self._pool: Optional[ProcessPoolExecutor] = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        # Spawned, not forked: the parent runs an event loop and threads
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return self._pool
+
+    async def _items(
+        self, org_id: str, design_id: Optional[str], pass_ids: Optional[List[uuid.UUID]]
+    ) -> AsyncIterator[List[Tuple[str, str]]]:
+        """Stream (label, deep link) chunks from the database"""
+        stmt = _batch_statement(org_id, design_id, pass_ids).execution_options(
+            yield_per=self.chunk_size
+        )
+        maker = read_session_factory(QR_BATCH_MAX_STALENESS)
+        async with maker() as session:
+            result = await session.stream(stmt)
+            async for rows in result.partitions():
+                yield [(row.serial, row.deep_link) for row in rows]
+
+    async def render(
+        self,
+        org_id: str,
+        design_id: Optional[str] = None,
+        pass_ids: Optional[List[uuid.UUID]] = None,
+        output: str = "pdf",
+        image_format: str = "png",
+        columns: int = 3,
+        rows: int = 4,
+        box_size: int = 10,
+    ) -> AsyncIterator[bytes]:
+        """
+        Stream a PDF of print sheets or a ZIP of images for the org's passes.
+
+        Args:
+            org_id: Org the passes must belong to
+            design_id: Render every pass of this design
+            pass_ids: Render these passes
+            output: "pdf" or "zip"
+            image_format: "png" or "svg", for ZIP output
+            columns: Codes per row on a PDF page
+            rows: Rows per PDF page
+            box_size: Pixels per module in PNG/SVG output
+
+        Yields:
+            Output bytes as they are produced
+        """
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        writer = sheet_writer(output, image_format, columns, rows)
+        render_format = "raw" if output == "pdf" else image_format
+        max_in_flight = self.workers * 2
+        in_flight = deque()
+
+        try:
+            yield writer.open()
+            async for chunk in self._items(org_id, design_id, pass_ids):
+                in_flight.append(
+                    loop.run_in_executor(pool, render_chunk, chunk, render_format, box_size)
+                )
+                if len(in_flight) >= max_in_flight:
+                    data = writer.add(await in_flight.popleft())
+                    if data:
+                        yield data
+            while in_flight:
+                data = writer.add(await in_flight.popleft())
+                if data:
+                    yield data
+            yield writer.close()
+        finally:
+            # Client went away: don't render the rest
+            for future in in_flight:
+                future.cancel()
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+# Create a singleton instance
+qr_batch_renderer = QRBatchRenderer()
@@ -0,0 +1,145 @@
+"""
+Pass serial numbers handed out from blocks of a Postgres sequence.
+
+Each worker reserves a block of numbers with one nextval() on
+pass_serial_seq, whose INCREMENT BY is the block size, and serves serials
+from memory. The next block is fetched in the background once half of the
+current one is used, so issuance doesn't wait on the database for a serial.
+Numbers only grow, so serials are roughly ordered by issue time. The
+sequence is always the default shard's, so serials stay unique across
+database shards and orgs moving between them.
+"""
+import asyncio
+from typing import List, Optional, Tuple
+from sqlalchemy import text
+
+from ..models.base import engine
+
+SERIAL_SEQUENCE = "pass_serial_seq"
+
+# Crockford base32: no I, L, O or U, so alt text is easy to read back
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+SERIAL_DIGITS = 10  # 32^10 ≈ 10^15 serials
+
+PLATFORM_PREFIXES = {"apple": "PM-", "google": "GP-"}
+
+NEXT_BLOCK_SQL = text(f"""
+    SELECT nextval('{SERIAL_SEQUENCE}'),
+           (SELECT increment_by FROM pg_sequences WHERE sequencename = '{SERIAL_SEQUENCE}')
+""")
+
+
+def encode_serial(number: int, prefix: str = "PM-") -> str:
+    """
+    Format a serial number as prefix plus fixed-width base32.
+
+    Fixed width keeps serials sorting in numeric order.
+
+    Args:
+        number: Non-negative serial number
+        prefix: Platform prefix
+
+    Returns:
+        Serial string, e.g. "PM-000000001Z"
+    """
+    digits = []
+    for _ in range(SERIAL_DIGITS):
+        number, remainder = divmod(number, 32)
+        digits.append(ALPHABET[remainder])
+    if number:
+        raise ValueError("Serial number out of range")
+    return prefix + "".join(reversed(digits))
+
+
+class SerialAllocator:
+    """Serves serial numbers from sequence blocks reserved by this worker"""
+
+    def __init__(self, fetch_block=None):
+        self._fetch_block = fetch_block or _fetch_block_from_sequence
+        self._blocks: List[Tuple[int, int]] = []  # (next, end) pairs
+        self._block_size = 0
+        self._refill: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    def _remaining(self) -> int:
+        return sum(end - start for start, end in self._blocks)
+
+    async def _add_block(self) -> None:
+        start, size = await self._fetch_block()
+        self._block_size = size
+        self._blocks.append((start, start + size))
+
+    def _prefetch(self) -> None:
+        if self._refill is None or self._refill.done():
+            self._refill = asyncio.create_task(self._add_block())
+
+    async def next_number(self) -> int:
+        """
+        Reserve the next serial number.
+
+        Returns:
+            A number no other worker will ever receive
+        """
+        if not self._blocks:
+            # Cold start or prefetch fell behind: wait for a block
+            async with self._lock:
+                if self._refill is not None and not self._refill.done():
+                    await self._refill
+                if not self._blocks:
+                    await self._add_block()
+
+        start, end = self._blocks[0]
+        if start + 1 < end:
+            self._blocks[0] = (start + 1, end)
+        else:
+            self._blocks.pop(0)
+
+        # Fetch the next block ahead of need once the last one is half used
+        if self._remaining() < self._block_size // 2:
+            self._prefetch()
+        return start
+
+    async def next_serials(self) -> dict:
+        """
+        Reserve serials for one pass.
+
+        Both platforms share the number and differ in prefix.
+
+        Returns:
+            Mapping of platform to serial
+        """
+        number = await self.next_number()
+        return {
+            platform: encode_serial(number, prefix)
+            for platform, prefix in PLATFORM_PREFIXES.items()
+        }
+
+    async def warm(self) -> None:
+        """Reserve the first block before taking traffic"""
+        if not self._blocks:
+            async with self._lock:
+                if not self._blocks:
+                    await self._add_block()
+
+    async def close(self) -> None:
+        """Stop a background prefetch; the numbers it would have reserved are skipped"""
+        if self._refill is not None and not self._refill.done():
+            self._refill.cancel()
+            try:
+                await self._refill
+            except asyncio.CancelledError:
+                pass
+        self._refill = None
+
+
+async def _fetch_block_from_sequence() -> Tuple[int, int]:
+    # nextval is not transactional, so autocommit avoids holding a transaction
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        result = await conn.execute(NEXT_BLOCK_SQL)
+        start, size = result.one()
+    return int(start), int(size)
+
+
+# Create a singleton instance
+serial_allocator = SerialAllocator()
@@ -0,0 +1,379 @@
+"""
+Moves an org's data to another database shard while the org keeps working.
+
+    python -m app.services.shard_mover ORG_ID TARGET_SHARD
+
+1. Copy: every row of the org is upserted into the target in keyset-ordered
+   batches, then once more for rows changed meanwhile, while the org reads
+   and writes on its source shard as usual.
+2. Freeze: `org_shards` marks the org frozen. After SHARD_MAP_TTL plus a
+   grace period for requests already running, no worker writes to it any
+   more; its writes get 503 with Retry-After, its reads keep working.
+3. Catch up: rows changed since the last copy are upserted again, rows
+   deleted meanwhile are deleted from the target, queued webhook events are
+   moved, and its users are recorded as having passes on the target.
+4. Flip: `org_shards` points at the target, unfrozen.
+5. Clean up: once every worker has seen the flip, the org's rows are deleted
+   from the source. User rows stay; users sign in on the default shard.
+
+Each step is idempotent: rerunning after a failure copies again from the
+start, and an org frozen by a failed run stays frozen until then.
+"""
+import asyncio
+import argparse
+import logging
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+from sqlalchemy import Table, and_, delete, func, literal, or_, select, tuple_, union
+from sqlalchemy.dialects.postgresql import insert
+
+from ..config import load_env
+from ..models.base import Shard, shards
+from ..models.models import (
+    Org, User, Design, Pass, PassArtifact, PassArchive, ArchivedPassCount, OrgRateLimit,
+    ImportJob, DeviceRegistration, IssuanceRollup, InventoryPool, PassInventory,
+    WebhookSubscription, WebhookOutbox, OrgShard, UserShard,
+)
+from .archiver import create_archive_partitions
+from .shards import SHARD_MAP_TTL, ShardRouter, shard_router
+
+load_env()
+
+logger = logging.getLogger(__name__)
+
+# Rows read and upserted per statement
+SHARD_MOVE_BATCH_SIZE = 500
+
+
+def _org_designs(org_id: uuid.UUID):
+    return select(Design.id).where(Design.org_id == org_id)
+
+
+def _org_passes(org_id: uuid.UUID):
+    return select(Pass.id).where(Pass.design_id.in_(_org_designs(org_id)))
+
+
+def _org_users(org_id: uuid.UUID):
+    return User.id.in_(union(
+        select(Pass.user_id).where(Pass.design_id.in_(_org_designs(org_id))),
+        select(PassArchive.user_id).where(PassArchive.design_id.in_(_org_designs(org_id))),
+    ))
+
+
+@dataclass
+class MovedTable:
+    """An org-scoped table and how to tell which of its rows to copy again"""
+
+    table: Table
+    # Rows of the org, as evaluated on either shard
+    scope: Callable[[uuid.UUID], Any]
+    # Rows changed since a time; None copies them all every round
+    changed: Optional[Callable[[datetime], Any]] = None
+    # Delete target rows the source no longer has (small tables only)
+    reconcile: bool = False
+    # Delete from the source once moved
+    cleanup: bool = True
+
+
+# Parents first. Users are shared with other orgs' passes, so they are only
+# ever added. Webhook events are moved separately, in the catch-up step.
+MOVED_TABLES = [
+    MovedTable(Org.__table__, lambda org: Org.id == org, reconcile=True),
+    MovedTable(
+        User.__table__,
+        _org_users,
+        changed=lambda since: User.id.in_(select(Pass.user_id).where(Pass.issued_at >= since)),
+        cleanup=False,
+    ),
+    MovedTable(Design.__table__, lambda org: Design.org_id == org, reconcile=True),
+    MovedTable(OrgRateLimit.__table__, lambda org: OrgRateLimit.org_id == org, reconcile=True),
+    MovedTable(ImportJob.__table__, lambda org: ImportJob.org_id == org, reconcile=True),
+    MovedTable(InventoryPool.__table__, lambda org: InventoryPool.org_id == org, reconcile=True),
+    MovedTable(
+        PassInventory.__table__,
+        lambda org: PassInventory.design_id.in_(_org_designs(org)),
+        reconcile=True,
+    ),
+    MovedTable(
+        Pass.__table__,
+        lambda org: Pass.design_id.in_(_org_designs(org)),
+        changed=lambda since: or_(
+            Pass.issued_at >= since, Pass.last_updated >= since, Pass.redeemed_at >= since
+        ),
+    ),
+    MovedTable(
+        PassArtifact.__table__,
+        lambda org: PassArtifact.pass_id.in_(_org_passes(org)),
+        changed=lambda since: PassArtifact.pass_id.in_(select(Pass.id).where(Pass.issued_at >= since)),
+    ),
+    MovedTable(
+        PassArchive.__table__,
+        lambda org: PassArchive.design_id.in_(_org_designs(org)),
+        changed=lambda since: PassArchive.archived_at >= since,
+    ),
+    MovedTable(
+        ArchivedPassCount.__table__,
+        lambda org: ArchivedPassCount.design_id.in_(_org_designs(org)),
+        reconcile=True,
+    ),
+    # Counters of any bucket can change, so they are copied whole each round
+    MovedTable(IssuanceRollup.__table__, lambda org: IssuanceRollup.org_id == org),
+    # Devices unregister and re-register with new push tokens without a
+    # timestamp changing, so they are copied whole and reconciled too
+    MovedTable(
+        DeviceRegistration.__table__,
+        lambda org: DeviceRegistration.serial.in_(
+            select(PassArtifact.serial).where(PassArtifact.pass_id.in_(_org_passes(org)))
+        ),
+        reconcile=True,
+    ),
+    MovedTable(WebhookSubscription.__table__, lambda org: WebhookSubscription.org_id == org, reconcile=True),
+]
+
+
+class OrgMover:
+    """Copies one org from its shard to another, then flips the shard map"""
+
+    def __init__(
+        self,
+        org_id: str,
+        target: str,
+        router: ShardRouter = shard_router,
+        grace: float = 5.0,
+        batch_size: int = SHARD_MOVE_BATCH_SIZE,
+        tables: List[MovedTable] = MOVED_TABLES,
+    ):
+        self.org_id = uuid.UUID(org_id)
+        self.router = router
+        self.target = router.shards[target]
+        self.grace = grace
+        self.batch_size = batch_size
+        self.tables = tables
+        self.source: Optional[Shard] = None
+        self.started: Optional[datetime] = None
+        self.counts: Dict[str, int] = {}
+
+    async def run(self) -> Dict[str, int]:
+        """
+        Move the org.
+
+        Returns:
+            Rows upserted into the target per table, over every round
+
+        Raises:
+            ValueError: If the org is already on the target shard, or is importing
+        """
+        self.router.forget_org(str(self.org_id))
+        self.source, _ = await self.router.org_shard(str(self.org_id))
+        if self.source is self.target:
+            raise ValueError(f"Org {self.org_id} is already on shard {self.target.name}")
+        # Imports write from a background task, past the freeze
+        async with self.source.session() as session:
+            importing = (await session.execute(select(ImportJob.id).where(
+                ImportJob.org_id == self.org_id, ImportJob.status.in_(["pending", "running"])
+            ).limit(1))).first()
+        if importing:
+            raise ValueError(f"Org {self.org_id} has an import in progress")
+        logger.info("Moving org", extra={
+            "org_id": str(self.org_id), "source": self.source.name, "target": self.target.name,
+        })
+
+        # Copy while the org is live, twice so the frozen catch-up is short
+        self.started = await self._copy_round(None)
+        since = await self._copy_round(self.started)
+
+        await self._set_placement(self.source, frozen=True)
+        await self._wait()
+        await self._copy_round(since, final=True)
+        await self._move_webhook_events()
+        await self._place_users()
+        await self._set_placement(self.target, frozen=False)
+
+        await self._wait()
+        await self._delete_from_source()
+        logger.info("Moved org", extra={"org_id": str(self.org_id), "target": self.target.name})
+        return self.counts
+
+    async def _wait(self) -> None:
+        """Let every worker's cached placement expire, and running requests finish"""
+        await asyncio.sleep(self.router.ttl + self.grace)
+
+    async def _copy_round(self, since: Optional[datetime], final: bool = False) -> datetime:
+        """Copy rows changed since a time, or all rows; returns when the round started"""
+        async with self.source.session() as session:
+            started = (await session.execute(select(func.now()))).scalar()
+
+        for moved in self.tables:
+            where = moved.scope(self.org_id)
+            if since is not None and moved.changed is not None:
+                where = and_(where, moved.changed(since))
+            if moved.table is PassArchive.__table__:
+                await self._ensure_partitions(where)
+            copied = await self._copy(moved.table, where)
+            self.counts[moved.table.name] = self.counts.get(moved.table.name, 0) + copied
+            if final and moved.reconcile:
+                await self._reconcile(moved)
+
+        if final:
+            await self._drop_archived(self.started)
+        return started
+
+    async def _copy(self, table: Table, where) -> int:
+        """Upsert the matching source rows into the target, in primary key order"""
+        key = list(table.primary_key.columns)
+        updated = [column for column in table.columns if not column.primary_key]
+        last = None
+        copied = 0
+        while True:
+            stmt = select(table).where(where)
+            if last is not None:
+                stmt = stmt.where(tuple_(*key) > tuple_(*[
+                    literal(value, column.type) for value, column in zip(last, key)
+                ]))
+            stmt = stmt.order_by(*key).limit(self.batch_size)
+            async with self.source.session() as session:
+                rows = [dict(row) for row in (await session.execute(stmt)).mappings()]
+            if not rows:
+                return copied
+
+            upsert = insert(table).values(rows)
+            if updated:
+                upsert = upsert.on_conflict_do_update(
+                    index_elements=[column.name for column in key],
+                    set_={column.name: upsert.excluded[column.name] for column in updated},
+                )
+            else:
+                upsert = upsert.on_conflict_do_nothing()
+            async with self.target.session() as session:
+                await session.execute(upsert)
+                await session.commit()
+
+            copied += len(rows)
+            last = [rows[-1][column.name] for column in key]
+
+    async def _keys(self, shard: Shard, moved: MovedTable) -> set:
+        key = list(moved.table.primary_key.columns)
+        async with shard.session() as session:
+            result = await session.execute(select(*key).where(moved.scope(self.org_id)))
+            return {tuple(row) for row in result}
+
+    async def _reconcile(self, moved: MovedTable) -> None:
+        """Delete target rows that were deleted from the source after being copied"""
+        extra = await self._keys(self.target, moved) - await self._keys(self.source, moved)
+        if not extra:
+            return
+        key = list(moved.table.primary_key.columns)
+        async with self.target.session() as session:
+            await session.execute(delete(moved.table).where(tuple_(*key).in_(list(extra))))
+            await session.commit()
+
+    async def _drop_archived(self, since: datetime) -> None:
+        """Delete target passes that the archiver moved out of the source's passes table"""
+        stmt = select(PassArchive.id).where(
+            PassArchive.design_id.in_(_org_designs(self.org_id)), PassArchive.archived_at >= since
+        )
+        async with self.source.session() as session:
+            archived = list((await session.execute(stmt.distinct())).scalars())
+        for start in range(0, len(archived), self.batch_size):
+            async with self.target.session() as session:
+                await session.execute(delete(Pass).where(Pass.id.in_(archived[start:start + self.batch_size])))
+                await session.commit()
+
+    async def _ensure_partitions(self, where) -> None:
+        async with self.source.session() as session:
+            oldest, newest = (await session.execute(
+                select(func.min(PassArchive.expires_at), func.max(PassArchive.expires_at)).where(where)
+            )).one()
+        if oldest is not None:
+            async with self.target.session() as session:
+                await create_archive_partitions(session, oldest, newest)
+                await session.commit()
+
+    async def _move_webhook_events(self) -> None:
+        """Queue the org's undelivered webhook events on the target, in order, under new IDs in one transaction"""
+        subscriptions = select(WebhookSubscription.id).where(WebhookSubscription.org_id == self.org_id)
+        columns = [WebhookOutbox.subscription_id, WebhookOutbox.event_type, WebhookOutbox.payload, WebhookOutbox.created_at]
+        async with self.source.session() as session:
+            rows = [dict(row) for row in (await session.execute(
+                select(*columns).where(WebhookOutbox.subscription_id.in_(subscriptions)).order_by(WebhookOutbox.xact_id, WebhookOutbox.id)
+            )).mappings()]
+
+        async with self.target.session() as session:
+            # A rerun replaces what an earlier attempt moved
+            await session.execute(delete(WebhookOutbox).where(WebhookOutbox.subscription_id.in_(subscriptions)))
+            for start in range(0, len(rows), self.batch_size):
+                await session.execute(insert(WebhookOutbox).values(rows[start:start + self.batch_size]))
+            await session.commit()
+        self.counts[WebhookOutbox.__tablename__] = len(rows)
+
+    async def _place_users(self) -> None:
+        """Record the org's users on the target, and on the source if they keep passes there"""
+        moved_users = _org_users(self.org_id)
+        elsewhere = select(Pass.user_id).where(
+            Pass.user_id.in_(select(User.id).where(moved_users)),
+            Pass.design_id.notin_(_org_designs(self.org_id)),
+        ).distinct()
+        async with self.target.session() as session:
+            users = list((await session.execute(select(User.id).where(moved_users))).scalars())
+        async with self.source.session() as session:
+            staying = list((await session.execute(elsewhere)).scalars())
+
+        placements = [{"user_id": user, "shard": self.target.name} for user in users]
+        placements += [{"user_id": user, "shard": self.source.name} for user in staying]
+        async with self.router.default.session() as session:
+            for start in range(0, len(placements), self.batch_size):
+                await session.execute(
+                    insert(UserShard).values(placements[start:start + self.batch_size]).on_conflict_do_nothing()
+                )
+            await session.commit()
+
+    async def _set_placement(self, shard: Shard, frozen: bool) -> None:
+        stmt = insert(OrgShard).values(org_id=self.org_id, shard=shard.name, frozen=frozen)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["org_id"],
+            set_={"shard": stmt.excluded.shard, "frozen": stmt.excluded.frozen, "updated_at": func.now()},
+        )
+        async with self.router.default.session() as session:
+            await session.execute(stmt)
+            await session.commit()
+        self.router.forget_org(str(self.org_id))
+
+    async def _delete_from_source(self) -> None:
+        """Delete the org's rows from the source, children first, in batches"""
+        for moved in reversed(self.tables):
+            if not moved.cleanup:
+                continue
+            key = list(moved.table.primary_key.columns)
+            while True:
+                batch = select(*key).where(moved.scope(self.org_id)).limit(self.batch_size)
+                async with self.source.session() as session:
+                    result = await session.execute(delete(moved.table).where(tuple_(*key).in_(batch)))
+                    await session.commit()
+                if result.rowcount < self.batch_size:
+                    break
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move an org to another database shard, online")
+    parser.add_argument("org_id", help="Org to move")
+    parser.add_argument("shard", choices=sorted(shards), help="Shard to move it to")
+    parser.add_argument(
+        "--grace", type=float, default=5.0,
+        help=f"Seconds for running requests to finish, on top of SHARD_MAP_TTL ({SHARD_MAP_TTL:g})",
+    )
+    parser.add_argument("--batch-size", type=int, default=SHARD_MOVE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    async def _main() -> None:
+        from ..utils.log import configure_logging, stop_logging
+        configure_logging()
+        try:
+            counts = await OrgMover(args.org_id, args.shard, grace=args.grace, batch_size=args.batch_size).run()
+            for table, count in counts.items():
+                print(f"{table}: {count} rows copied")
+        finally:
+            stop_logging()
+
+    asyncio.run(_main())
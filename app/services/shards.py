@@ -0,0 +1,293 @@
+"""
+Routes each request to the database shard holding its org's data.
+
+Orgs live on the default shard (DATABASE_URL) unless `org_shards` places
+them on one of SHARD_DATABASE_URLS; `user_shards` lists the shards holding
+a user's passes. Both tables live on the default shard. Placement is cached
+for SHARD_MAP_TTL seconds, which is also how long the mover waits for every
+worker to notice an org being frozen or flipped to its new shard.
+
+ShardRoutingMiddleware picks the shard from the bearer token (or, for the
+Wallet web service, the pass serial) and every session the request opens,
+including those of background tasks it starts, goes there. With no
+SHARD_DATABASE_URLS the middleware is not installed and nothing changes.
+"""
+import os
+import re
+import time
+import uuid
+import asyncio
+from typing import Dict, List, Optional, Tuple
+from fastapi import HTTPException
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+
+from ..config import load_env
+from ..models.base import DEFAULT_SHARD, Shard, shards, use_shard
+from ..models.models import Design, OrgShard, Pass, PassArtifact, User, UserShard
+from ..utils.auth import decode_jwt_token
+
+load_env()
+
+# Seconds a worker trusts its cached placement of an org or user
+SHARD_MAP_TTL = float(os.getenv("SHARD_MAP_TTL", "10"))
+
+# Entries kept per lookup cache before it is cleared
+SHARD_CACHE_SIZE = 100_000
+
+SAFE_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+# Wallet web service paths ending in a pass serial
+WALLET_SERIAL_PATH = re.compile(r"^/api/v1/(?:devices/[^/]+/registrations|passes)/[^/]+/([^/]+)$")
+
+
+class ShardRouter:
+    """Looks up which database shard holds an org, a user's passes, a design or a serial"""
+
+    def __init__(self, shard_map: Dict[str, Shard], ttl: float = SHARD_MAP_TTL):
+        self.shards = shard_map
+        self.default = shard_map[DEFAULT_SHARD]
+        self.ttl = ttl
+        self._orgs: Dict[str, Tuple[str, bool, float]] = {}
+        self._users: Dict[str, Tuple[List[str], float]] = {}
+        # A design or serial never changes org, so these never go stale
+        self._design_orgs: Dict[str, str] = {}
+        self._serial_orgs: Dict[str, str] = {}
+        self._placed_users: Dict[Tuple[str, str], bool] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return len(self.shards) > 1
+
+    def _remember(self, cache: dict, key, value) -> None:
+        if len(cache) >= SHARD_CACHE_SIZE:
+            cache.clear()
+        cache[key] = value
+
+    def forget_org(self, org_id: str) -> None:
+        self._orgs.pop(org_id, None)
+
+    async def org_shard(self, org_id: str) -> Tuple[Shard, bool]:
+        """
+        Find the shard holding an org.
+
+        Args:
+            org_id: Org ID
+
+        Returns:
+            Tuple of (shard, frozen); writes are refused while frozen
+        """
+        if not self.enabled:
+            return self.default, False
+
+        cached = self._orgs.get(org_id)
+        if cached is None or time.monotonic() - cached[2] > self.ttl:
+            async with self.default.session() as session:
+                row = (await session.execute(
+                    select(OrgShard.shard, OrgShard.frozen).where(OrgShard.org_id == uuid.UUID(org_id))
+                )).first()
+            cached = (row.shard, row.frozen, time.monotonic()) if row else (DEFAULT_SHARD, False, time.monotonic())
+            self._remember(self._orgs, org_id, cached)
+        return self.shards[cached[0]], cached[1]
+
+    async def user_shards(self, user_id: str) -> List[Shard]:
+        """
+        Find the shards holding a user's passes, the one they first got a pass on first.
+
+        Args:
+            user_id: User ID
+
+        Returns:
+            Shards; just the default shard for users never placed elsewhere
+        """
+        if not self.enabled:
+            return [self.default]
+
+        cached = self._users.get(user_id)
+        if cached is None or time.monotonic() - cached[1] > self.ttl:
+            async with self.default.session() as session:
+                result = await session.execute(
+                    select(UserShard.shard)
+                    .where(UserShard.user_id == uuid.UUID(user_id))
+                    .order_by(UserShard.created_at, UserShard.shard)
+                )
+                names = list(result.scalars()) or [DEFAULT_SHARD]
+            cached = (names, time.monotonic())
+            self._remember(self._users, user_id, cached)
+        return [self.shards[name] for name in cached[0]]
+
+    async def place_user(self, user_id: str, shard: Shard) -> None:
+        """
+        Record that a user has passes on a shard, copying the user row there.
+
+        Users sign in on the default shard; the first time they get a pass on
+        another shard, their default-shard passes (if any) are recorded too,
+        since users without rows are assumed to live only there.
+
+        Args:
+            user_id: User ID
+            shard: Shard the user is getting a pass on
+        """
+        if not self.enabled or (user_id, shard.name) in self._placed_users:
+            return
+
+        user_uuid = uuid.UUID(user_id)
+        async with self.default.session() as session:
+            result = await session.execute(select(UserShard.shard).where(UserShard.user_id == user_uuid))
+            placed = set(result.scalars())
+            if shard.name not in placed:
+                names = {shard.name}
+                if not placed and shard is not self.default:
+                    has_default_passes = await session.execute(
+                        select(Pass.id).where(Pass.user_id == user_uuid).limit(1)
+                    )
+                    if has_default_passes.first():
+                        names.add(DEFAULT_SHARD)
+                await session.execute(
+                    insert(UserShard)
+                    .values([{"user_id": user_uuid, "shard": name} for name in sorted(names)])
+                    .on_conflict_do_nothing()
+                )
+            user = (await session.execute(select(User.line_user_id).where(User.id == user_uuid))).first()
+            await session.commit()
+
+        if shard is not self.default and user is not None:
+            async with shard.session() as session:
+                await session.execute(
+                    insert(User).values(id=user_uuid, line_user_id=user.line_user_id).on_conflict_do_nothing()
+                )
+                await session.commit()
+
+        self._users.pop(user_id, None)
+        self._remember(self._placed_users, (user_id, shard.name), True)
+
+    async def _probe(self, stmt) -> Optional[str]:
+        """Run a single-value lookup on every shard; the first hit wins"""
+        async def lookup(shard: Shard):
+            async with shard.session() as session:
+                return (await session.execute(stmt)).scalar()
+
+        results = await asyncio.gather(*(lookup(shard) for shard in self.shards.values()))
+        for value in results:
+            if value is not None:
+                return str(value)
+        return None
+
+    async def design_shard(self, design_id: str) -> Tuple[Optional[Shard], bool]:
+        """
+        Find the shard holding a design, by its org.
+
+        Args:
+            design_id: Design ID
+
+        Returns:
+            Tuple of (shard or None if no shard has the design, frozen)
+        """
+        if not self.enabled:
+            return self.default, False
+
+        org_id = self._design_orgs.get(design_id)
+        if org_id is None:
+            org_id = await self._probe(select(Design.org_id).where(Design.id == uuid.UUID(design_id)))
+            if org_id is None:
+                return None, False
+            self._remember(self._design_orgs, design_id, org_id)
+        return await self.org_shard(org_id)
+
+    async def serial_shard(self, serial: str) -> Tuple[Optional[Shard], bool]:
+        """
+        Find the shard holding a pass by its serial, by the pass's org.
+
+        Args:
+            serial: Pass serial number
+
+        Returns:
+            Tuple of (shard or None if no shard has the serial, frozen)
+        """
+        org_id = self._serial_orgs.get(serial)
+        if org_id is None:
+            org_id = await self._probe(
+                select(Design.org_id)
+                .join(Pass, Pass.design_id == Design.id)
+                .join(PassArtifact, PassArtifact.pass_id == Pass.id)
+                .where(PassArtifact.serial == serial)
+            )
+            if org_id is None:
+                return None, False
+            self._remember(self._serial_orgs, serial, org_id)
+        return await self.org_shard(org_id)
+
+    async def route(self, headers: Headers, path: str) -> Tuple[Shard, bool]:
+        """
+        Pick the shard for a request.
+
+        Org tokens go to the org's shard and user tokens to the shard the
+        user's passes are on (the first, for users on several); Wallet web
+        service calls go to the shard of the pass serial in the path.
+        Anything else, including bad tokens left for auth to reject, goes to
+        the default shard.
+
+        Args:
+            headers: Request headers
+            path: Request path
+
+        Returns:
+            Tuple of (shard, frozen)
+        """
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        if scheme.lower() == "bearer" and token:
+            try:
+                payload = decode_jwt_token(token)
+            except HTTPException:
+                return self.default, False
+            subject = payload.get("sub")
+            user_type = payload.get("user_type", "user")
+            if subject and user_type == "org":
+                return await self.org_shard(subject)
+            if subject and user_type == "user":
+                return (await self.user_shards(subject))[0], False
+            return self.default, False
+
+        match = WALLET_SERIAL_PATH.match(path)
+        if match:
+            shard, frozen = await self.serial_shard(match.group(1))
+            if shard is not None:
+                return shard, frozen
+        return self.default, False
+
+
+def moving_http_exception() -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Org is moving between database shards, retry shortly",
+        headers={"Retry-After": str(max(1, int(SHARD_MAP_TTL)))},
+    )
+
+
+class ShardRoutingMiddleware:
+    """ASGI middleware running each request against its org's database shard"""
+
+    def __init__(self, app, router: Optional[ShardRouter] = None):
+        self.app = app
+        self.router = router or shard_router
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        shard, frozen = await self.router.route(Headers(scope=scope), scope["path"])
+        if frozen and scope["method"] not in SAFE_METHODS:
+            exc = moving_http_exception()
+            response = JSONResponse({"detail": exc.detail}, status_code=exc.status_code, headers=exc.headers)
+            await response(scope, receive, send)
+            return
+
+        with use_shard(shard):
+            await self.app(scope, receive, send)
+
+
+# Create a singleton instance
+shard_router = ShardRouter(shards)
@@ -0,0 +1,231 @@
+"""
+Signer backends for Apple pass manifests.
+
+LocalSigner signs in-process with the certificate from APPLE_PASS_CERT_P12.
+RemoteSigner keeps the private key out of API workers: it sends manifests
+to the signing daemon (app/services/signing_daemon.py) at SIGNER_URL, a
+Unix socket (`unix:///run/passmint/signer.sock`) or local TCP address
+(`tcp://127.0.0.1:7800`).
+
+Requests are pipelined: each connection carries many in-flight requests,
+matched to replies by ID, and every request submitted in the same event loop
+iteration goes out in a single write, which the daemon signs as one batch.
+SIGNER_POOL_SIZE connections are kept open and requests go to the one with
+the fewest in flight.
+
+Wire format, big-endian:
+    request   u32 id, u32 length, manifest
+    response  u32 id, u8 status (0 ok, 1 error), u32 length, signature or error text
+"""
+import os
+import struct
+import asyncio
+import itertools
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from ..config import load_env
+
+load_env()
+
+# Empty signs in the API worker itself
+SIGNER_URL = os.getenv("SIGNER_URL", "")
+SIGNER_POOL_SIZE = int(os.getenv("SIGNER_POOL_SIZE", "4"))
+SIGNER_TIMEOUT = float(os.getenv("SIGNER_TIMEOUT", "5"))
+
+REQUEST_HEADER = struct.Struct("!II")
+RESPONSE_HEADER = struct.Struct("!IBI")
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+# Largest frame either side accepts
+MAX_FRAME = 1024 * 1024
+
+
+class SigningError(Exception):
+    """The daemon could not sign a manifest"""
+
+
+async def open_stream(url: str):
+    """Connect to a `unix://` or `tcp://` address"""
+    parsed = urlparse(url)
+    if parsed.scheme == "unix":
+        return await asyncio.open_unix_connection(parsed.path)
+    if parsed.scheme == "tcp":
+        return await asyncio.open_connection(parsed.hostname, parsed.port)
+    raise ValueError(f"Unsupported signer URL: {url}")
+
+
+class LocalSigner:
+    """Signs in this process"""
+
+    def __init__(self, signer):
+        self.signer = signer
+
+    async def sign(self, manifest: bytes) -> bytes:
+        # A single RSA signature; cheaper than a thread hop
+        return self.signer.sign(manifest)
+
+    async def close(self) -> None:
+        pass
+
+
+class _Connection:
+    """One pipelined connection to the daemon"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.pending: Dict[int, asyncio.Future] = {}
+        self.closed = False
+        self.writes = 0
+        self._ids = itertools.count(1)
+        self._outgoing: List[bytes] = []
+        self._reader_task = asyncio.create_task(self._read_replies())
+
+    def submit(self, manifest: bytes) -> Tuple[int, asyncio.Future]:
+        request_id = next(self._ids) & 0xFFFFFFFF
+        future = asyncio.get_running_loop().create_future()
+        self.pending[request_id] = future
+        if not self._outgoing:
+            # Flush once this loop iteration is done, with everything submitted meanwhile
+            asyncio.get_running_loop().call_soon(self._flush)
+        self._outgoing.append(REQUEST_HEADER.pack(request_id, len(manifest)) + manifest)
+        return request_id, future
+
+    def _flush(self) -> None:
+        if self.closed or not self._outgoing:
+            return
+        self.writer.write(b"".join(self._outgoing))
+        self._outgoing = []
+        self.writes += 1
+
+    async def _read_replies(self) -> None:
+        try:
+            while True:
+                header = await self.reader.readexactly(RESPONSE_HEADER.size)
+                request_id, status, length = RESPONSE_HEADER.unpack(header)
+                payload = await self.reader.readexactly(length)
+                future = self.pending.pop(request_id, None)
+                if future is None or future.done():
+                    continue
+                if status == STATUS_OK:
+                    future.set_result(payload)
+                else:
+                    future.set_exception(SigningError(payload.decode("utf-8", "replace")))
+        except (asyncio.IncompleteReadError, ConnectionError, OSError) as e:
+            self._fail(ConnectionError(f"Signing daemon connection lost: {e}"))
+        except asyncio.CancelledError:
+            self._fail(ConnectionError("Signing daemon connection closed"))
+            raise
+
+    def _fail(self, error: Exception) -> None:
+        self.closed = True
+        for future in self.pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self.pending.clear()
+
+    async def close(self) -> None:
+        self.closed = True
+        self._reader_task.cancel()
+        try:
+            await self._reader_task
+        except asyncio.CancelledError:
+            pass
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except (ConnectionError, OSError):
+            pass
+
+
+class RemoteSigner:
+    """Signs through the signing daemon over a pool of pipelined connections"""
+
+    def __init__(self, url: str, pool_size: int = SIGNER_POOL_SIZE, timeout: float = SIGNER_TIMEOUT):
+        self.url = url
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self._connections: List[_Connection] = []
+        self._opening: Optional[asyncio.Task] = None
+
+    async def _connection(self) -> _Connection:
+        self._connections = [conn for conn in self._connections if not conn.closed]
+        idle = [conn for conn in self._connections if not conn.pending]
+        if idle or len(self._connections) >= self.pool_size:
+            return min(self._connections, key=lambda conn: len(conn.pending))
+
+        # Requests arriving while a connection opens wait for that one, and
+        # all resume in the same loop iteration, so they still share a write
+        if self._opening is None:
+            self._opening = asyncio.create_task(self._open())
+        await asyncio.shield(self._opening)
+        return min(self._connections, key=lambda conn: len(conn.pending))
+
+    async def _open(self) -> None:
+        try:
+            reader, writer = await asyncio.wait_for(open_stream(self.url), self.timeout)
+            self._connections.append(_Connection(reader, writer))
+        finally:
+            self._opening = None
+
+    async def sign(self, manifest: bytes) -> bytes:
+        """
+        Sign a manifest through the daemon.
+
+        Args:
+            manifest: manifest.json bytes
+
+        Returns:
+            Detached DER PKCS#7 signature
+
+        Raises:
+            SigningError: If the daemon failed to sign
+            ConnectionError: If the daemon could not be reached, after one retry
+            TimeoutError: If the daemon did not answer within the timeout
+        """
+        for attempt in range(2):
+            conn = await self._connection()
+            request_id, future = conn.submit(manifest)
+            try:
+                return await asyncio.wait_for(future, self.timeout)
+            except ConnectionError:
+                # The connection dropped; a new one is opened on the retry
+                if attempt:
+                    raise
+            except asyncio.TimeoutError:
+                # Don't leave requests queued behind a stuck one; the next
+                # request opens a fresh connection, others in flight retry
+                await conn.close()
+                raise
+            finally:
+                # Timed out or cancelled requests would otherwise stay pending
+                conn.pending.pop(request_id, None)
+
+    @property
+    def writes(self) -> int:
+        return sum(conn.writes for conn in self._connections)
+
+    async def close(self) -> None:
+        for conn in self._connections:
+            await conn.close()
+        self._connections = []
+
+
+def signer_backend(p12_data: Optional[bytes], password: str, url: str = SIGNER_URL):
+    """
+    Build the configured backend.
+
+    Args:
+        p12_data: PKCS#12 bundle, for local signing
+        password: Bundle password
+        url: Signing daemon address; empty to sign locally
+
+    Returns:
+        RemoteSigner or LocalSigner
+    """
+    if url:
+        return RemoteSigner(url)
+    from ..utils.pkpass import PKPassSigner
+    return LocalSigner(PKPassSigner(p12_data, password))
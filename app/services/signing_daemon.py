@@ -0,0 +1,169 @@
+"""
+Standalone signing daemon holding the Apple pass certificate.
+
+    APPLE_PASS_CERT_P12=... python -m app.services.signing_daemon \\
+        --listen unix:///run/passmint/signer.sock --workers 4
+
+API workers then set SIGNER_URL to the same address and never load the
+private key. Requests that arrive together on a connection are signed as
+one batch by a worker process, and their replies go back in one write; see
+app/services/signing.py for the client and wire format.
+
+The daemon does not authenticate clients. Listen on a Unix socket, which is
+created mode 0660, or on a loopback TCP address.
+"""
+import os
+import base64
+import signal
+import asyncio
+import argparse
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+from urllib.parse import urlparse
+
+from ..config import load_env
+from .signing import REQUEST_HEADER, RESPONSE_HEADER, STATUS_OK, STATUS_ERROR, MAX_FRAME
+
+load_env()
+
+# Requests signed per task sent to a worker
+SIGNER_BATCH_SIZE = 64
+
+_signer = None
+
+
+def _init_worker(p12_data: bytes, password: str) -> None:
+    global _signer
+    from ..utils.pkpass import PKPassSigner
+    _signer = PKPassSigner(p12_data, password)
+
+
+def sign_batch(manifests: List[bytes]) -> List[Tuple[int, bytes]]:
+    """Sign manifests in a worker; (status, signature or error text) for each"""
+    results = []
+    for manifest in manifests:
+        try:
+            results.append((STATUS_OK, _signer.sign(manifest)))
+        except Exception as e:
+            results.append((STATUS_ERROR, str(e).encode("utf-8")))
+    return results
+
+
+class SigningDaemon:
+    def __init__(self, p12_data: bytes, password: str, workers: int = 0):
+        """
+        Args:
+            p12_data: PKCS#12 bundle with the pass certificate and key
+            password: Bundle password
+            workers: Signing processes; 0 signs on a thread in this process
+        """
+        # Fail here on a bad bundle rather than in every worker
+        _init_worker(p12_data, password)
+        if workers:
+            self.executor: Executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(p12_data, password),
+            )
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=1)
+        self.slots = asyncio.Semaphore(max(1, workers) * 2)
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, url: str) -> None:
+        parsed = urlparse(url)
+        if parsed.scheme == "unix":
+            if os.path.exists(parsed.path):
+                os.unlink(parsed.path)
+            self.server = await asyncio.start_unix_server(self._serve, parsed.path)
+            os.chmod(parsed.path, 0o660)
+        elif parsed.scheme == "tcp":
+            self.server = await asyncio.start_server(self._serve, parsed.hostname, parsed.port)
+        else:
+            raise ValueError(f"Unsupported listen address: {url}")
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        requests: asyncio.Queue = asyncio.Queue()
+        batcher = asyncio.create_task(self._batch(requests, writer))
+        try:
+            while True:
+                header = await reader.readexactly(REQUEST_HEADER.size)
+                request_id, length = REQUEST_HEADER.unpack(header)
+                if length > MAX_FRAME:
+                    break
+                # Frames already buffered are read without yielding, so a
+                # pipelined burst is queued whole before the batcher runs
+                requests.put_nowait((request_id, await reader.readexactly(length)))
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            batcher.cancel()
+            writer.close()
+
+    async def _batch(self, requests: asyncio.Queue, writer: asyncio.StreamWriter) -> None:
+        loop = asyncio.get_running_loop()
+        in_flight = set()
+        try:
+            while True:
+                batch = [await requests.get()]
+                while len(batch) < SIGNER_BATCH_SIZE and not requests.empty():
+                    batch.append(requests.get_nowait())
+                await self.slots.acquire()
+                task = asyncio.create_task(self._sign(loop, batch, writer))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+        finally:
+            for task in in_flight:
+                task.cancel()
+
+    async def _sign(self, loop, batch, writer: asyncio.StreamWriter) -> None:
+        try:
+            results = await loop.run_in_executor(
+                self.executor, sign_batch, [manifest for _, manifest in batch]
+            )
+        except Exception as e:
+            results = [(STATUS_ERROR, str(e).encode("utf-8"))] * len(batch)
+        finally:
+            self.slots.release()
+        if writer.is_closing():
+            return
+        writer.write(b"".join(
+            RESPONSE_HEADER.pack(request_id, status, len(payload)) + payload
+            for (request_id, _), (status, payload) in zip(batch, results)
+        ))
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def close(self) -> None:
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+async def _main(listen: str, workers: int) -> None:
+    p12 = base64.b64decode(os.getenv("APPLE_PASS_CERT_P12", ""))
+    if not p12:
+        raise SystemExit("APPLE_PASS_CERT_P12 is not set")
+    daemon = SigningDaemon(p12, os.getenv("APPLE_PASS_CERT_PASSWORD", ""), workers)
+    await daemon.start(listen)
+    print(f"Signing daemon listening on {listen} with {workers} workers")
+    stop = asyncio.Event()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        asyncio.get_running_loop().add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        await daemon.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Apple pass signing daemon")
+    parser.add_argument("--listen", default="unix:///run/passmint/signer.sock")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    args = parser.parse_args()
+    asyncio.run(_main(args.listen, args.workers))
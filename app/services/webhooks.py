@@ -0,0 +1,511 @@
+"""
+Webhook delivery of pass lifecycle events.
+
+record_event() writes an event to webhook_outbox in the caller's transaction,
+one row per subscribed endpoint, so an event exists exactly when the pass
+change it describes committed. Orgs without subscriptions are skipped
+without a query, from a per-worker list refreshed every
+WEBHOOK_SUBSCRIBERS_TTL seconds. The dispatcher, run as
+
+    python -m app.services.webhooks --interval 1
+
+claims endpoints with events waiting and POSTs them as JSON arrays of up to
+WEBHOOK_BATCH_SIZE events over pooled keep-alive connections, deleting what
+was delivered. Each endpoint receives its events in order: after a failure
+the endpoint backs off exponentially and retries from its oldest event, and
+only one dispatcher delivers to an endpoint at a time. Event IDs are taken
+at insert, not commit, so an event is only delivered once every transaction
+that started before its own has finished; none of them can then commit an
+event that belongs ahead of it. The same process
+emits pass.expired as passes reach their expiry.
+
+Requests carry `X-PassMint-Signature: t=<unix time>,v1=<hex>`, the
+HMAC-SHA256 of `<t>.<body>` under the endpoint's secret; see
+verify_signature(). Deliveries are at least once, so receivers should
+dedupe on the event `id`.
+"""
+import os
+import hmac
+import json
+import time
+import random
+import socket
+import asyncio
+import hashlib
+import logging
+import argparse
+import ipaddress
+import httpx
+import httpcore
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Set, Tuple
+from urllib.parse import urlsplit
+from ..config import load_env
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.base import async_session, current_shard, shards, use_shard
+
+load_env()
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ("pass.issued", "pass.updated", "pass.redeemed", "pass.expired")
+
+SIGNATURE_HEADER = "X-PassMint-Signature"
+
+# Events per request, and requests per endpoint before another endpoint gets a turn
+WEBHOOK_BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "100"))
+WEBHOOK_BATCHES_PER_CLAIM = 10
+
+# Endpoints delivered to at once, and pooled connections shared by all of them
+WEBHOOK_CONCURRENCY = int(os.getenv("WEBHOOK_CONCURRENCY", "16"))
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "64"))
+WEBHOOK_TIMEOUT = float(os.getenv("WEBHOOK_TIMEOUT", "10"))
+
+# Backoff after a failed delivery doubles from RETRY_BASE up to this
+WEBHOOK_RETRY_MAX = float(os.getenv("WEBHOOK_RETRY_MAX", "3600"))
+RETRY_BASE = 5
+
+# Local development only: accept http:// endpoints and private, loopback and
+# link-local addresses, which are otherwise refused so orgs can't reach our network
+WEBHOOK_ALLOW_PRIVATE_URLS = os.getenv("WEBHOOK_ALLOW_PRIVATE_URLS", "false").lower() == "true"
+
+# Seconds a worker trusts its list of orgs with subscriptions; events of an
+# org subscribed through another worker are recorded after at most this long
+WEBHOOK_SUBSCRIBERS_TTL = float(os.getenv("WEBHOOK_SUBSCRIBERS_TTL", "5"))
+
+# Seconds between pass.expired sweeps
+WEBHOOK_EXPIRY_INTERVAL = float(os.getenv("WEBHOOK_EXPIRY_INTERVAL", "60"))
+
+# An endpoint is leased to one dispatcher for longer than its claim can take
+LEASE_SECONDS = WEBHOOK_TIMEOUT * WEBHOOK_BATCHES_PER_CLAIM + 30
+
+# Fan an event out to every active subscription of the org that wants it
+RECORD_EVENT_SQL = text("""
+    INSERT INTO webhook_outbox (subscription_id, event_type, payload)
+    SELECT id, CAST(:event_type AS text), CAST(:payload AS jsonb)
+    FROM webhook_subscriptions
+    WHERE org_id = CAST(:org_id AS uuid) AND active
+      AND CAST(:event_type AS text) = ANY(events)
+""")
+
+SUBSCRIBERS_SQL = text("SELECT DISTINCT org_id FROM webhook_subscriptions WHERE active")
+
+# Lease due endpoints that have events waiting
+CLAIM_SQL = text("""
+    UPDATE webhook_subscriptions s
+    SET next_attempt_at = now() + make_interval(secs => :lease)
+    WHERE s.id IN (
+        SELECT id FROM webhook_subscriptions w
+        WHERE active AND next_attempt_at <= now()
+          AND EXISTS (SELECT 1 FROM webhook_outbox o WHERE o.subscription_id = w.id)
+        ORDER BY next_attempt_at
+        LIMIT :limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING s.id, s.url, s.secret, s.failures
+""")
+
+# Events of transactions older than any still running; later transactions
+# get higher xact_ids, so nothing can still appear ahead of these
+BATCH_SQL = text("""
+    SELECT id, event_type, payload, created_at FROM webhook_outbox
+    WHERE subscription_id = :subscription_id
+      AND xact_id < pg_snapshot_xmin(pg_current_snapshot())::text::bigint
+    ORDER BY xact_id, id
+    LIMIT :limit
+""")
+
+DELIVERED_SQL = text("""
+    DELETE FROM webhook_outbox
+    WHERE subscription_id = :subscription_id AND id = ANY(CAST(:ids AS bigint[]))
+""")
+
+# Release the lease; failures reset once a batch gets through
+RELEASE_SQL = text("""
+    UPDATE webhook_subscriptions
+    SET next_attempt_at = now(), failures = 0, last_error = NULL
+    WHERE id = :subscription_id
+""")
+
+BACKOFF_SQL = text("""
+    UPDATE webhook_subscriptions
+    SET next_attempt_at = now() + make_interval(secs => :delay),
+        failures = failures + 1, last_error = :error
+    WHERE id = :subscription_id
+""")
+
+# Emit pass.expired for passes that expired since each subscription's last
+# sweep, and move its watermark; ix_passes_expires_at bounds the scan
+EXPIRY_SQL = text("""
+    WITH subs AS (
+        SELECT id, org_id, expired_through FROM webhook_subscriptions
+        WHERE active AND 'pass.expired' = ANY(events)
+        FOR UPDATE SKIP LOCKED
+    ),
+    advanced AS (
+        UPDATE webhook_subscriptions w SET expired_through = :now
+        FROM subs WHERE w.id = subs.id
+    )
+    INSERT INTO webhook_outbox (subscription_id, event_type, payload)
+    SELECT subs.id, 'pass.expired', jsonb_build_object(
+        'pass_id', p.id, 'design_id', p.design_id, 'user_id', p.user_id, 'expires_at', p.expires_at
+    )
+    FROM subs
+    JOIN designs d ON d.org_id = subs.org_id
+    JOIN passes p ON p.design_id = d.id
+        AND p.expires_at > subs.expired_through AND p.expires_at <= :now
+    ORDER BY p.expires_at, p.id
+""")
+
+
+# Per database shard: (loaded at, org IDs with active subscriptions)
+_subscribers: Dict[str, Tuple[float, Set[str]]] = {}
+
+
+async def _has_subscriptions(session: AsyncSession, org_id: str) -> bool:
+    shard = current_shard().name
+    loaded_at, orgs = _subscribers.get(shard, (0.0, set()))
+    if time.monotonic() - loaded_at > WEBHOOK_SUBSCRIBERS_TTL:
+        result = await session.execute(SUBSCRIBERS_SQL)
+        orgs = {str(org) for org in result.scalars()}
+        _subscribers[shard] = (time.monotonic(), orgs)
+    return org_id in orgs
+
+
+def note_subscription(org_id: str) -> None:
+    """Record events for a just-subscribed org on this worker right away"""
+    loaded_at, orgs = _subscribers.get(current_shard().name, (0.0, set()))
+    orgs.add(org_id)
+    _subscribers[current_shard().name] = (loaded_at, orgs)
+
+
+async def record_event(
+    session: AsyncSession, org_id: str, event_type: str, data: Dict[str, Any]
+) -> None:
+    """
+    Queue an event for the org's webhooks, in the caller's transaction.
+
+    Args:
+        session: Database session that commits the change
+        org_id: Org whose subscriptions receive it
+        event_type: One of EVENT_TYPES
+        data: Event body; pass_id and whatever else describes the change
+    """
+    if not await _has_subscriptions(session, str(org_id)):
+        return
+    await session.execute(RECORD_EVENT_SQL, {
+        "org_id": org_id,
+        "event_type": event_type,
+        "payload": json.dumps(data, default=str),
+    })
+
+
+def sign_payload(secret: str, body: bytes, timestamp: Optional[int] = None) -> str:
+    """The X-PassMint-Signature header value for a request body"""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    digest = hmac.new(secret.encode("utf-8"), f"{timestamp}.".encode("utf-8") + body, hashlib.sha256)
+    return f"t={timestamp},v1={digest.hexdigest()}"
+
+
+def verify_signature(secret: str, body: bytes, header: str, tolerance: int = 300) -> bool:
+    """
+    Check a delivery's signature, as a receiver would.
+
+    Args:
+        secret: The endpoint's secret
+        body: Raw request body
+        header: X-PassMint-Signature value
+        tolerance: Seconds of clock skew accepted, against replays
+
+    Returns:
+        True if the body was signed with the secret recently
+    """
+    try:
+        parts = dict(item.split("=", 1) for item in header.split(","))
+        timestamp = int(parts["t"])
+    except (KeyError, ValueError):
+        return False
+    if abs(time.time() - timestamp) > tolerance:
+        return False
+    expected = sign_payload(secret, body, timestamp).split("v1=", 1)[1]
+    return hmac.compare_digest(expected, parts.get("v1", ""))
+
+
+def check_url(url: str) -> str:
+    """
+    Check an endpoint URL is https with a host, before anything is resolved.
+
+    Raises:
+        ValueError: If it is not
+    """
+    parsed = urlsplit(url)
+    schemes = ("https", "http") if WEBHOOK_ALLOW_PRIVATE_URLS else ("https",)
+    if parsed.scheme not in schemes or not parsed.hostname:
+        raise ValueError(f"url must be an {'http(s)' if WEBHOOK_ALLOW_PRIVATE_URLS else 'https'} URL")
+    return url
+
+
+async def resolve_public(host: str, port: int) -> str:
+    """
+    Resolve a host and refuse it unless every address is public.
+
+    Returns:
+        The address to connect to; the host itself when
+        WEBHOOK_ALLOW_PRIVATE_URLS is set
+
+    Raises:
+        ValueError: If the host doesn't resolve or resolves to a private,
+            loopback, link-local or otherwise non-public address
+    """
+    if WEBHOOK_ALLOW_PRIVATE_URLS:
+        return host
+    try:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (socket.gaierror, UnicodeError) as e:
+        raise ValueError(f"url host {host} does not resolve: {e}")
+    for info in infos:
+        address = ipaddress.ip_address(info[4][0].split("%", 1)[0])
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        if not address.is_global or address.is_multicast:
+            raise ValueError(f"url host {host} resolves to non-public address {address}")
+    return infos[0][4][0]
+
+
+async def check_url_host(url: str) -> None:
+    """
+    Check an endpoint's host resolves only to public addresses, when it is
+    subscribed. Deliveries check again as they connect; see
+    PublicAddressBackend.
+
+    Raises:
+        ValueError: If it doesn't
+    """
+    parsed = urlsplit(url)
+    await resolve_public(parsed.hostname, parsed.port or 443)
+
+
+class PublicAddressBackend(httpcore.AsyncNetworkBackend):
+    """
+    Network backend connecting only to public addresses.
+
+    The host is resolved and checked once per connection and the socket is
+    opened to the address that passed, so DNS can't be rebound to a private
+    address in between. TLS still verifies, and sends SNI for, the hostname.
+    """
+
+    def __init__(self, backend: Optional[httpcore.AsyncNetworkBackend] = None):
+        self.backend = backend or httpcore.AnyIOBackend()
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        try:
+            address = await asyncio.wait_for(resolve_public(host, port), timeout)
+        except ValueError as e:
+            raise httpcore.ConnectError(f"Blocked: {e}")
+        except asyncio.TimeoutError:
+            raise httpcore.ConnectTimeout(f"Resolving {host} timed out")
+        return await self.backend.connect_tcp(
+            address, port, timeout=timeout, local_address=local_address, socket_options=socket_options
+        )
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        raise httpcore.ConnectError("Webhooks are not delivered over unix sockets")
+
+    async def sleep(self, seconds: float) -> None:
+        await self.backend.sleep(seconds)
+
+
+class PublicAddressTransport(httpx.AsyncHTTPTransport):
+    """httpx transport whose connections go through PublicAddressBackend"""
+
+    def __init__(self, limits: httpx.Limits, backend: Optional[httpcore.AsyncNetworkBackend] = None):
+        super().__init__(limits=limits)
+        # httpx doesn't take a network backend itself, so its pool is replaced
+        # with one built the same way around ours
+        self._pool = httpcore.AsyncConnectionPool(
+            ssl_context=httpx.create_ssl_context(),
+            max_connections=limits.max_connections,
+            max_keepalive_connections=limits.max_keepalive_connections,
+            keepalive_expiry=limits.keepalive_expiry,
+            network_backend=PublicAddressBackend(backend),
+        )
+
+
+class WebhookDispatcher:
+    def __init__(
+        self,
+        batch_size: int = WEBHOOK_BATCH_SIZE,
+        concurrency: int = WEBHOOK_CONCURRENCY,
+        max_connections: int = WEBHOOK_MAX_CONNECTIONS,
+        timeout: float = WEBHOOK_TIMEOUT,
+    ):
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self._swept_at: Dict[str, float] = {}  # Per database shard
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                transport=PublicAddressTransport(httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                )),
+                timeout=httpx.Timeout(self.timeout, pool=None),
+            )
+        return self._client
+
+    async def deliver(self, url: str, secret: str, events: List[Dict[str, Any]]) -> Optional[str]:
+        """
+        POST a batch of events to an endpoint.
+
+        Args:
+            url: Endpoint URL
+            secret: Signing secret
+            events: Events in delivery order
+
+        Returns:
+            None if the endpoint accepted them, otherwise why not
+        """
+        body = json.dumps(events, default=str, separators=(",", ":")).encode("utf-8")
+        try:
+            response = await self._get_client().post(url, content=body, headers={
+                "Content-Type": "application/json",
+                SIGNATURE_HEADER: sign_payload(secret, body),
+            })
+        except httpx.HTTPError as e:
+            return f"{type(e).__name__}: {e}"
+        if 200 <= response.status_code < 300:
+            return None
+        return f"HTTP {response.status_code}"
+
+    async def _deliver_subscription(self, subscription) -> int:
+        """Deliver an endpoint's waiting events in order until done, failed or out of turns"""
+        params = {"subscription_id": subscription.id}
+        delivered = 0
+        for _ in range(WEBHOOK_BATCHES_PER_CLAIM):
+            # No connection is held while the endpoint is called
+            async with async_session() as session:
+                rows = (await session.execute(BATCH_SQL, {**params, "limit": self.batch_size})).all()
+            if not rows:
+                break
+            error = await self.deliver(subscription.url, subscription.secret, [
+                {"id": row.id, "type": row.event_type, "created_at": row.created_at, "data": row.payload}
+                for row in rows
+            ])
+            async with async_session() as session:
+                if error:
+                    failures = subscription.failures + 1
+                    delay = min(WEBHOOK_RETRY_MAX, RETRY_BASE * 2 ** (failures - 1)) * random.uniform(0.5, 1.0)
+                    await session.execute(BACKOFF_SQL, {**params, "delay": delay, "error": error[:500]})
+                    await session.commit()
+                    logger.warning(
+                        "Webhook delivery failed, retrying in %.0fs: %s", delay, error,
+                        extra={"subscription_id": str(subscription.id), "failures": failures},
+                    )
+                    return delivered
+                await session.execute(DELIVERED_SQL, {**params, "ids": [row.id for row in rows]})
+                await session.commit()
+            delivered += len(rows)
+            if len(rows) < self.batch_size:
+                break
+        async with async_session() as session:
+            await session.execute(RELEASE_SQL, params)
+            await session.commit()
+        return delivered
+
+    async def sweep_expired(self) -> None:
+        """Queue pass.expired for passes that expired since the last sweep"""
+        async with async_session() as session:
+            await session.execute(EXPIRY_SQL, {"now": datetime.now(timezone.utc)})
+            await session.commit()
+
+    async def run_once(self) -> int:
+        """
+        Deliver to every endpoint that is due, a claim's worth each, on every shard.
+
+        Returns:
+            Events delivered
+        """
+        delivered = 0
+        for shard in shards.values():
+            with use_shard(shard):
+                if time.monotonic() - self._swept_at.get(shard.name, 0.0) > WEBHOOK_EXPIRY_INTERVAL:
+                    await self.sweep_expired()
+                    self._swept_at[shard.name] = time.monotonic()
+                delivered += await self._run_shard()
+        return delivered
+
+    async def _run_shard(self) -> int:
+
+        async with async_session() as session:
+            subscriptions = (await session.execute(CLAIM_SQL, {
+                "lease": LEASE_SECONDS, "limit": self.concurrency,
+            })).all()
+            await session.commit()
+        if not subscriptions:
+            return 0
+
+        results = await asyncio.gather(
+            *(self._deliver_subscription(subscription) for subscription in subscriptions),
+            return_exceptions=True,
+        )
+        delivered = 0
+        for subscription, result in zip(subscriptions, results):
+            if isinstance(result, Exception):
+                # The lease runs out and another pass retries it
+                logger.error(
+                    "Error delivering webhooks: %s", result,
+                    extra={"subscription_id": str(subscription.id)},
+                )
+            else:
+                delivered += result
+        return delivered
+
+    async def run(self, interval: float) -> None:
+        while True:
+            try:
+                delivered = await self.run_once()
+            except Exception:
+                logger.exception("Error dispatching webhooks")
+                delivered = 0
+            # Keep going without a pause while there is a backlog
+            if not delivered:
+                await asyncio.sleep(interval)
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Create a singleton instance
+webhook_dispatcher = WebhookDispatcher()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Deliver queued webhook events")
+    parser.add_argument(
+        "--interval", type=float, default=1,
+        help="Seconds between polls when idle; 0 delivers what is due and exits",
+    )
+    args = parser.parse_args()
+
+    async def _main() -> None:
+        from ..utils.log import configure_logging, stop_logging
+        configure_logging()
+        try:
+            if args.interval:
+                await webhook_dispatcher.run(args.interval)
+            else:
+                while await webhook_dispatcher.run_once():
+                    pass
+        finally:
+            await webhook_dispatcher.close()
+            stop_logging()
+
+    asyncio.run(_main())
@@ -0,0 +1,28 @@
+import pytest
+from ..models.base import Base, engine
+
+
+@pytest.fixture
+async def create_schema():
+    """Creates the tables on a database, skipping the test when it can't be reached"""
+    engines = []
+
+    async def create(db_engine=engine):
+        engines.append(db_engine)
+        try:
+            async with db_engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+        except Exception as e:
+            pytest.skip(f"Postgres not available: {e}")
+        return db_engine
+
+    yield create
+
+    for db_engine in engines:
+        await db_engine.dispose()
+
+
+@pytest.fixture
+async def database(create_schema):
+    """The test database with the schema created; skipped without Postgres"""
+    return await create_schema()
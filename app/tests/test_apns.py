@@ -0,0 +1,151 @@
+import asyncio
+import uuid
+import httpx
+import pytest
+from collections import Counter
+from sqlalchemy import select
+from ..models.base import async_session
+from ..models.models import DeviceRegistration
+from ..services.apns import APNsDispatcher
+
+
+class StaticToken:
+    """Provider token stand-in counting how often it was invalidated"""
+
+    def __init__(self):
+        self.invalidated = 0
+
+    def get(self) -> str:
+        return f"token-{self.invalidated}"
+
+    def invalidate(self) -> None:
+        self.invalidated += 1
+
+
+def _dispatcher(handler, **kwargs) -> APNsDispatcher:
+    return APNsDispatcher(
+        "http://apns.test", "pass.test", StaticToken(), http2=False,
+        transport=httpx.MockTransport(handler), **kwargs,
+    )
+
+
+def _device(request: httpx.Request) -> str:
+    return request.url.path.rsplit("/", 1)[1]
+
+
+@pytest.mark.asyncio
+async def test_pushes_to_a_device_are_coalesced():
+    """Test devices queued several times within the debounce window get one push each"""
+    pushed = Counter()
+
+    def handler(request):
+        pushed[_device(request)] += 1
+        assert request.headers["apns-topic"] == "pass.test"
+        return httpx.Response(200)
+
+    dispatcher = _dispatcher(handler, debounce=0.05)
+    dispatcher.enqueue(["a", "b"])
+    dispatcher.enqueue(["b", "c"])
+    dispatcher.enqueue(["a"])
+    await asyncio.sleep(0.2)
+    await dispatcher.close()
+
+    assert pushed == {"a": 1, "b": 1, "c": 1}
+
+
+@pytest.mark.asyncio
+async def test_transient_failures_are_retried():
+    """Test 5xx, 429, transport errors and expired provider tokens are retried, up to max_retries"""
+    attempts = Counter()
+
+    def handler(request):
+        device = _device(request)
+        attempts[device] += 1
+        if device == "flaky" and attempts[device] == 1:
+            return httpx.Response(503, json={"reason": "ServiceUnavailable"})
+        if device == "flaky" and attempts[device] == 2:
+            raise httpx.ConnectError("reset")
+        if device == "expired" and request.headers["authorization"] == "bearer token-0":
+            return httpx.Response(403, json={"reason": "ExpiredProviderToken"})
+        if device == "busy":
+            return httpx.Response(429, json={"reason": "TooManyRequests"})
+        if device == "bad":
+            return httpx.Response(400, json={"reason": "BadTopic"})
+        return httpx.Response(200)
+
+    dispatcher = _dispatcher(handler, max_retries=2)
+    counts = await dispatcher.send_many(["flaky", "expired", "busy", "bad"])
+    await dispatcher.close()
+
+    assert counts == {"sent": 2, "invalid": 0, "failed": 2}
+    assert attempts == {"flaky": 3, "expired": 2, "busy": 3, "bad": 1}
+    assert dispatcher.provider_token.invalidated == 1
+
+
+@pytest.mark.asyncio
+async def test_dead_tokens_are_forgotten(monkeypatch):
+    """Test tokens answered 410 or BadDeviceToken are removed and others kept"""
+    removed = []
+
+    def handler(request):
+        device = _device(request)
+        if device == "gone":
+            return httpx.Response(410, json={"reason": "Unregistered"})
+        if device == "bad":
+            return httpx.Response(400, json={"reason": "BadDeviceToken"})
+        return httpx.Response(200)
+
+    dispatcher = _dispatcher(handler)
+
+    async def remove_registrations(tokens):
+        removed.extend(tokens)
+
+    monkeypatch.setattr(dispatcher, "_remove_registrations", remove_registrations)
+    counts = await dispatcher.send_many(["ok", "gone", "bad"])
+    await dispatcher.close()
+
+    assert counts == {"sent": 1, "invalid": 2, "failed": 0}
+    assert sorted(removed) == ["bad", "gone"]
+
+
+@pytest.fixture
+async def registrations(database):
+    """Two devices registered for one serial and a third for another; skipped without Postgres"""
+    serials = [f"PM-{uuid.uuid4().hex[:10]}" for _ in range(2)]
+    tokens = [uuid.uuid4().hex for _ in range(3)]
+    async with async_session() as session:
+        session.add_all([
+            DeviceRegistration(device_library_id=uuid.uuid4().hex, pass_type_id="pass.test", serial=serial, push_token=token)
+            for serial, token in zip([serials[0], serials[0], serials[1]], tokens)
+        ])
+        await session.commit()
+
+    yield serials, tokens
+
+    async with async_session() as session:
+        await session.execute(DeviceRegistration.__table__.delete().where(DeviceRegistration.serial.in_(serials)))
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_changed_serials_push_their_devices_and_drop_dead_ones(registrations):
+    """Test a changed pass pushes each of its devices and deletes registrations APNs rejects"""
+    serials, tokens = registrations
+    pushed = []
+
+    def handler(request):
+        pushed.append(_device(request))
+        return httpx.Response(410 if _device(request) == tokens[1] else 200)
+
+    dispatcher = _dispatcher(handler, debounce=0.05)
+    async with async_session() as session:
+        await dispatcher.notify_serials(session, [serials[0]])
+    await asyncio.sleep(0.5)
+    await dispatcher.close()
+
+    assert sorted(pushed) == sorted(tokens[:2])
+    async with async_session() as session:
+        result = await session.execute(
+            select(DeviceRegistration.push_token).where(DeviceRegistration.serial.in_(serials))
+        )
+        assert sorted(result.scalars()) == sorted([tokens[0], tokens[2]])
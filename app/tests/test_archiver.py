@@ -0,0 +1,87 @@
+import re
+import uuid
+import pytest
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import select
+from ..models.base import async_session
+from ..models.models import Org, User, Design, Pass, PassArtifact, PassArchive, ArchivedPassCount
+from ..services.archiver import archive_expired_passes, create_archive_partitions
+
+
+class RecordingSession:
+    """Collects the statements a function runs instead of sending them to a database"""
+
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, stmt, params=None):
+        self.statements.append(str(stmt))
+
+    async def commit(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_partitions_cover_whole_utc_months():
+    """Test partitions run from the first of each UTC month to the next, oldest through newest"""
+    session = RecordingSession()
+    jst = timezone(timedelta(hours=9))
+    # 2025-12-01 05:00 JST is still November in UTC
+    await create_archive_partitions(
+        session, datetime(2025, 12, 1, 5, tzinfo=jst), datetime(2026, 1, 31, 23, tzinfo=timezone.utc)
+    )
+
+    bounds = [
+        re.search(r"passes_archive_(\d+) .* FROM \('(.+)'\) TO \('(.+)'\)", sql).groups()
+        for sql in session.statements
+    ]
+    assert bounds == [
+        ("202511", "2025-11-01T00:00:00+00:00", "2025-12-01T00:00:00+00:00"),
+        ("202512", "2025-12-01T00:00:00+00:00", "2026-01-01T00:00:00+00:00"),
+        ("202601", "2026-01-01T00:00:00+00:00", "2026-02-01T00:00:00+00:00"),
+    ]
+
+
+@pytest.fixture
+async def expired_passes(database):
+    """A design with two long-expired passes and one recent one; skipped without Postgres"""
+    org = Org(id=uuid.uuid4(), name="Archive Org")
+    user = User(id=uuid.uuid4(), line_user_id=uuid.uuid4().hex)
+    design = Design(id=uuid.uuid4(), org_id=org.id, template_json={"logoText": "Archive"})
+    now = datetime.now(timezone.utc)
+    passes = [
+        Pass(id=uuid.uuid4(), user_id=user.id, design_id=design.id, expires_at=now - timedelta(days=days), artifacts=[
+            PassArtifact(platform="apple", serial=f"PM-{uuid.uuid4().hex[:10]}", deep_link="https://a"),
+        ])
+        for days in (400, 200, 1)
+    ]
+    async with async_session() as session:
+        session.add_all([org, user])
+        await session.flush()
+        session.add(design)
+        await session.flush()
+        session.add_all(passes)
+        await session.commit()
+
+    yield design.id, [pass_.id for pass_ in passes]
+
+    async with async_session() as session:
+        await session.delete(await session.get(User, user.id))
+        await session.delete(await session.get(Org, org.id))
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_batches_move_expired_passes_and_count_them(expired_passes):
+    """Test every batch moves its passes into the archive and bumps the design's counter"""
+    design_id, (oldest, older, recent) = expired_passes
+
+    assert await archive_expired_passes(timedelta(days=90), batch_size=1) >= 2
+
+    async with async_session() as session:
+        remaining = await session.execute(select(Pass.id).where(Pass.design_id == design_id))
+        assert list(remaining.scalars()) == [recent]
+        archived = await session.execute(select(PassArchive.id).where(PassArchive.design_id == design_id))
+        assert set(archived.scalars()) == {oldest, older}
+        counted = await session.get(ArchivedPassCount, (design_id, "apple"))
+        assert counted.count == 2
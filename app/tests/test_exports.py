@@ -0,0 +1,117 @@
+import csv
+import gzip
+import io
+import json
+import uuid
+import pytest
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from httpx import AsyncClient
+from ..main import app
+from ..api.exports import EXPORT_COLUMNS, _encode_stream
+from ..models.base import async_session
+from ..models.models import Org, User, Design, Pass, PassArtifact
+from ..utils.auth import create_jwt_token
+from ..utils.pagination import decode_cursor
+
+Row = namedtuple("Row", "id design_id platform serial deep_link issued_at expires_at")
+
+
+def _rows(count):
+    design_id = uuid.uuid4()
+    issued_at = datetime(2026, 5, 1, tzinfo=timezone.utc)
+    return [
+        Row(uuid.uuid4(), design_id, "apple", f"PM-{n:010d}", f"https://p/{n}", issued_at - timedelta(minutes=n), None)
+        for n in range(count)
+    ]
+
+
+async def _batches(*batches):
+    for batch in batches:
+        yield batch
+
+
+async def _collect(chunks):
+    return b"".join([chunk async for chunk in chunks])
+
+
+@pytest.mark.asyncio
+async def test_csv_and_ndjson_rows_carry_their_cursor():
+    """Test both formats write every column, with a cursor decoding to the row's sort key"""
+    rows = _rows(3)
+
+    body = await _collect(_encode_stream(_batches(rows[:2], rows[2:]), "csv", True, False))
+    records = list(csv.DictReader(io.StringIO(body.decode("utf-8"))))
+    assert list(records[0]) == EXPORT_COLUMNS
+    assert [record["serial"] for record in records] == [row.serial for row in rows]
+    assert decode_cursor(records[1]["cursor"], (uuid.UUID, datetime, uuid.UUID, str)) == [
+        rows[1].design_id, rows[1].issued_at, rows[1].id, "apple",
+    ]
+
+    body = await _collect(_encode_stream(_batches(rows), "ndjson", False, False))
+    lines = [json.loads(line) for line in body.decode("utf-8").splitlines()]
+    assert [line["pass_id"] for line in lines] == [str(row.id) for row in rows]
+    assert lines[0]["expires_at"] is None
+
+    # An empty export is still a valid CSV file; a resumed one has no header
+    assert await _collect(_encode_stream(_batches(), "csv", True, False)) == (",".join(EXPORT_COLUMNS) + "\r\n").encode()
+    body = await _collect(_encode_stream(_batches(rows), "csv", False, False))
+    assert not body.startswith(b"pass_id")
+
+
+@pytest.mark.asyncio
+async def test_gzip_stream_is_one_member_of_the_plain_output():
+    """Test gzipped exports decompress, as one member, to the uncompressed bytes"""
+    rows = _rows(50)
+    plain = await _collect(_encode_stream(_batches(rows[:20], rows[20:]), "ndjson", False, False))
+    chunks = [chunk async for chunk in _encode_stream(_batches(rows[:20], rows[20:]), "ndjson", False, True)]
+
+    assert all(chunks)
+    assert gzip.decompress(b"".join(chunks)) == plain
+    assert b"".join(chunks).count(b"\x1f\x8b\x08") == 1
+
+
+@pytest.fixture
+async def org_with_passes(database):
+    """An org with four passes, in the test database; skipped without Postgres"""
+    org = Org(id=uuid.uuid4(), name="Export Org")
+    user = User(id=uuid.uuid4(), line_user_id=uuid.uuid4().hex)
+    design = Design(id=uuid.uuid4(), org_id=org.id, template_json={"logoText": "Export"})
+    now = datetime.now(timezone.utc)
+    passes = [
+        Pass(user_id=user.id, design_id=design.id, issued_at=now - timedelta(minutes=n), artifacts=[
+            PassArtifact(platform="apple", serial=f"PM-{uuid.uuid4().hex[:10]}", deep_link=f"https://a/{n}"),
+        ])
+        for n in range(4)
+    ]
+    async with async_session() as session:
+        session.add_all([org, user])
+        await session.flush()
+        session.add(design)
+        await session.flush()
+        session.add_all(passes)
+        await session.commit()
+
+    yield str(org.id)
+
+    async with async_session() as session:
+        await session.delete(await session.get(User, user.id))
+        await session.delete(await session.get(Org, org.id))
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_export_resumes_after_the_last_received_row(org_with_passes):
+    """Test a dropped export resumes from a row's cursor with exactly the rows after it"""
+    headers = {"Authorization": f"Bearer {create_jwt_token(org_with_passes, 'org')}"}
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/api/exports/passes?format=ndjson", headers=headers)
+        assert response.status_code == 200
+        full = [json.loads(line) for line in response.text.splitlines()]
+        assert len(full) == 4
+
+        response = await client.get(
+            "/api/exports/passes", params={"format": "csv", "cursor": full[1]["cursor"]}, headers=headers
+        )
+        resumed = list(csv.reader(io.StringIO(response.text)))
+        assert [record[0] for record in resumed] == [line["pass_id"] for line in full[2:]]
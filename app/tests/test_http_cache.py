@@ -0,0 +1,36 @@
+from datetime import datetime, timezone
+from ..utils.http_cache import compute_etag, etag_matches, ResponseCache
+
+
+def test_etag_changes_with_version():
+    """Test ETags are stable for equal input and change with last_updated"""
+    first = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    second = datetime(2026, 1, 2, tzinfo=timezone.utc)
+
+    assert compute_etag("apple", "PM-1", first) == compute_etag("apple", "PM-1", first)
+    assert compute_etag("apple", "PM-1", first) != compute_etag("apple", "PM-1", second)
+
+
+def test_etag_matches_if_none_match_forms():
+    """Test lists, weak validators and wildcards in If-None-Match"""
+    etag = compute_etag("x")
+
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
+
+
+def test_response_cache_evicts_least_recently_used():
+    """Test the cache keeps the most recently used entries"""
+    cache = ResponseCache(max_entries=2)
+    cache.set("pass:1", "v1", "user", b"one")
+    cache.set("pass:2", "v1", "user", b"two")
+    assert cache.get("pass:1", "v1", "user") == b"one"
+
+    cache.set("pass:3", "v1", "user", b"three")
+
+    assert cache.get("pass:2", "v1", "user") is None
+    assert cache.get("pass:1", "v1", "user") == b"one"
+    assert cache.get("pass:1", "v1", "other-user") is None
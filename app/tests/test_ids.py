@@ -0,0 +1,13 @@
+import time
+from ..utils.ids import uuid7
+
+
+def test_uuid7_is_time_ordered():
+    """Test v7 IDs carry their creation time and sort by it"""
+    first = uuid7()
+    time.sleep(0.002)
+    second = uuid7()
+
+    assert first.version == 7 and second.version == 7
+    assert first < second
+    assert abs((first.int >> 80) - time.time() * 1000) < 5000
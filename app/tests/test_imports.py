@@ -0,0 +1,109 @@
+import uuid
+import pytest
+from sqlalchemy import select
+from ..models.base import async_session
+from ..models.models import Org, User, Design, ImportJob
+from ..services.importer import ImportService, _count_rows
+
+
+def test_count_rows_matches_the_reader(tmp_path):
+    """Test blank lines are not counted, as DictReader skips them"""
+    path = tmp_path / "recipients.csv"
+    path.write_text("line_user_id,name\r\nU1,Ann\r\n\r\nU2,Bob\r\n\r\n", encoding="utf-8")
+    assert _count_rows(str(path)) == 2
+
+    path.write_text("line_user_id\r\n", encoding="utf-8")
+    assert _count_rows(str(path)) == 0
+
+
+@pytest.mark.asyncio
+async def test_chunk_rows_are_validated_and_progress_recorded(monkeypatch):
+    """Test bad rows and failed issues become per-row errors and the rest are issued"""
+    service = ImportService()
+    issued, progress = [], []
+
+    async def upsert_users(rows):
+        return {row_num: f"user-{line_user_id}" for row_num, line_user_id in rows}
+
+    async def issue(user_id, design_id, metadata):
+        if user_id == "user-U3":
+            raise ValueError("Design not found")
+        issued.append((user_id, metadata))
+
+    async def record_progress(job_id, processed, succeeded, errors):
+        progress.append((processed, succeeded, errors))
+
+    monkeypatch.setattr(service, "_upsert_users", upsert_users)
+    monkeypatch.setattr(service, "_issue_with_backoff", issue)
+    monkeypatch.setattr(service, "_record_progress", record_progress)
+
+    await service._process_chunk("job", "design", [
+        (2, {"line_user_id": " U1 ", "seat": "12A", "note": ""}),
+        (3, {"line_user_id": ""}),
+        (4, {"line_user_id": "U3"}),
+        (5, {"line_user_id": "U" * 65}),
+    ])
+
+    assert issued == [("user-U1", {"seat": "12A"})]
+    assert progress == [(4, 1, [
+        {"row": 3, "error": "Missing line_user_id"},
+        {"row": 4, "error": "Design not found"},
+        {"row": 5, "error": "line_user_id longer than 64 characters"},
+    ])]
+
+
+@pytest.fixture
+async def import_job(database):
+    """An org, a design and a pending import job, in the test database; skipped without Postgres"""
+    org = Org(id=uuid.uuid4(), name="Import Org")
+    existing = User(id=uuid.uuid4(), line_user_id=f"U{uuid.uuid4().hex}")
+    design = Design(id=uuid.uuid4(), org_id=org.id, template_json={"logoText": "Import"})
+    job = ImportJob(id=uuid.uuid4(), org_id=org.id, design_id=design.id)
+    async with async_session() as session:
+        session.add_all([org, existing])
+        await session.flush()
+        session.add(design)
+        await session.flush()
+        session.add(job)
+        await session.commit()
+
+    yield str(job.id), existing
+
+    async with async_session() as session:
+        await session.delete(await session.get(Org, org.id))
+        await session.execute(User.__table__.delete().where(User.line_user_id.like(f"{existing.line_user_id}%")))
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_import_upserts_users_and_records_progress(import_job, tmp_path, monkeypatch):
+    """Test staged users are merged once each and the job counts every row"""
+    job_id, existing = import_job
+    new_id = f"{existing.line_user_id}-new"
+    path = tmp_path / "recipients.csv"
+    path.write_text(
+        f"line_user_id,seat\r\n{existing.line_user_id},1\r\n\r\n{new_id},2\r\n{new_id},3\r\n,4\r\n",
+        encoding="utf-8",
+    )
+
+    service = ImportService()
+    issued = []
+
+    async def issue(user_id, design_id, metadata):
+        issued.append((user_id, metadata["seat"]))
+
+    monkeypatch.setattr(service, "_issue_with_backoff", issue)
+    await service.run(job_id, str(path))
+
+    async with async_session() as session:
+        job = await session.get(ImportJob, uuid.UUID(job_id))
+        result = await session.execute(select(User.id).where(User.line_user_id == new_id))
+        new_user_id = str(result.scalar_one())
+
+    assert (job.status, job.total_rows, job.processed_rows) == ("completed", 4, 4)
+    assert (job.succeeded_rows, job.failed_rows) == (3, 1)
+    assert job.errors == [{"row": 5, "error": "Missing line_user_id"}]
+    assert sorted(issued, key=lambda item: item[1]) == [
+        (str(existing.id), "1"), (new_user_id, "2"), (new_user_id, "3"),
+    ]
+    assert not path.exists()
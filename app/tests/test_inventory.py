@@ -0,0 +1,131 @@
+import asyncio
+import uuid
+import pytest
+from datetime import datetime, timedelta, timezone
+from pydantic import ValidationError
+from sqlalchemy import func, select
+from ..models.base import async_session
+from ..models.models import Org, User, Design, InventoryPool, PassInventory
+from ..schemas.inventory import InventoryConfig
+from ..services import inventory as inventory_module
+from ..services.inventory import InventoryService
+
+
+def test_inventory_config_watermark():
+    """Test the low watermark defaults to a fifth of the pool and stays below it"""
+    assert InventoryConfig(size=500).low_watermark == 100
+    assert InventoryConfig(size=500, low_watermark=50).low_watermark == 50
+    with pytest.raises(ValidationError):
+        InventoryConfig(size=10, low_watermark=10)
+
+
+@pytest.mark.asyncio
+async def test_schedule_fill_runs_one_fill_per_design():
+    """Test claims during a refill don't start a second refill for the design"""
+    service = InventoryService()
+    calls = []
+    release = asyncio.Event()
+
+    async def fill(design_id, force=False):
+        calls.append((design_id, force))
+        await release.wait()
+        return 0
+
+    service.fill = fill
+    service.schedule_fill("d1", force=True)
+    service.schedule_fill("d1", force=True)
+    service.schedule_fill("d2")
+    await asyncio.sleep(0)
+
+    assert calls == [("d1", True), ("d2", False)]
+    release.set()
+    await asyncio.gather(*service._tasks.values())
+
+
+@pytest.fixture
+def removed(monkeypatch):
+    """Records the storage keys deleted and Google passes expired by the inventory"""
+    removed = {"apple": [], "google": []}
+
+    async def delete_files(keys):
+        removed["apple"].extend(keys)
+
+    async def expire_generic_passes(pass_ids):
+        removed["google"].extend(pass_ids)
+
+    monkeypatch.setattr(inventory_module.storage, "delete_files", delete_files)
+    monkeypatch.setattr(inventory_module.google_wallet_service, "expire_generic_passes", expire_generic_passes)
+    return removed
+
+
+@pytest.fixture
+async def empty_pool(database):
+    """A design with a pool but no inventory, in the test database; skipped without Postgres"""
+    org = Org(id=uuid.uuid4(), name="Inventory Org")
+    design = Design(id=uuid.uuid4(), org_id=org.id, template_json={"logoText": "Inventory"})
+    async with async_session() as session:
+        session.add(org)
+        await session.flush()
+        session.add(design)
+        await session.flush()
+        session.add(InventoryPool(design_id=design.id, org_id=org.id, target_size=10, low_watermark=2, ttl_seconds=60))
+        await session.commit()
+
+    yield design
+
+    async with async_session() as session:
+        await session.delete(await session.get(Org, org.id))
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_empty_claim_keeps_the_callers_transaction(empty_pool):
+    """Test a claim that finds no inventory leaves the caller's pending writes alone"""
+    service = InventoryService()
+    service.schedule_fill = lambda design_id, force=False: None
+    user = User(id=uuid.uuid4(), line_user_id=uuid.uuid4().hex)
+
+    async with async_session() as session:
+        session.add(user)
+        await session.flush()
+        assert await service.claim(session, str(user.id), empty_pool) is None
+        await session.commit()
+
+    async with async_session() as session:
+        assert await session.get(User, user.id) is not None
+        await session.delete(await session.get(User, user.id))
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_expired_and_removed_inventory_deletes_its_files(empty_pool, removed, monkeypatch):
+    """Test dropping expired or discarded items removes their pkpass files and Google objects"""
+    service = InventoryService()
+    now = datetime.now(timezone.utc)
+
+    def item(expires_at, platforms):
+        return PassInventory(
+            id=uuid.uuid4(), design_id=empty_pool.id, qr_png="", expires_at=expires_at,
+            artifacts=[{"platform": p, "serial": f"PM-{uuid.uuid4().hex[:10]}", "deep_link": "x"} for p in platforms],
+        )
+
+    expired, live = item(now - timedelta(seconds=1), ["apple", "google"]), item(now + timedelta(hours=1), ["apple"])
+    async with async_session() as session:
+        session.add_all([expired, live])
+        await session.commit()
+
+    async def add_items(session, issuer_service, design, pool, count):
+        return 0
+
+    monkeypatch.setattr(service, "_add_items", add_items)
+    await service.fill(str(empty_pool.id), force=True)
+    assert removed == {"apple": [f"passes/apple/{expired.id}.pkpass"], "google": [str(expired.id)]}
+
+    async with async_session() as session:
+        await service.remove(session, str(empty_pool.id))
+    assert removed["apple"][1:] == [f"passes/apple/{live.id}.pkpass"]
+    async with async_session() as session:
+        result = await session.execute(
+            select(func.count()).select_from(PassInventory).where(PassInventory.design_id == empty_pool.id)
+        )
+        assert result.scalar() == 0
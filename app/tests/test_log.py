@@ -0,0 +1,65 @@
+import io
+import json
+import logging
+import pytest
+from httpx import AsyncClient
+from ..main import app
+from ..utils.log import configure_logging, stop_logging, request_id_var
+
+
+def _records(stream: io.StringIO):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_records_are_json_with_request_id_and_fields():
+    """Test records are written by the queue thread as JSON lines"""
+    stream = io.StringIO()
+    configure_logging(stream, levels={"app.test.quiet": "WARNING"}, sampling={})
+    try:
+        logger = logging.getLogger("app.test.log")
+        token = request_id_var.set("req-1")
+        try:
+            logger.info("Issued %s", "pass", extra={"pass_id": "p-1"})
+            try:
+                raise ValueError("bad cert")
+            except ValueError:
+                logger.exception("Signing failed")
+        finally:
+            request_id_var.reset(token)
+        logging.getLogger("app.test.quiet").info("not written")
+    finally:
+        stop_logging()
+
+    issued, failed = _records(stream)
+    assert issued["message"] == "Issued pass"
+    assert issued["level"] == "INFO"
+    assert issued["logger"] == "app.test.log"
+    assert issued["request_id"] == "req-1"
+    assert issued["pass_id"] == "p-1"
+    assert failed["level"] == "ERROR"
+    assert "ValueError: bad cert" in failed["exc"]
+
+
+def test_sampling_keeps_warnings():
+    """Test sampled loggers drop routine records but never warnings"""
+    stream = io.StringIO()
+    configure_logging(stream, sampling={"app.test.noisy": 0.0})
+    try:
+        logger = logging.getLogger("app.test.noisy.child")
+        for _ in range(50):
+            logger.info("routine")
+        logger.warning("unusual")
+    finally:
+        stop_logging()
+
+    assert [record["message"] for record in _records(stream)] == ["unusual"]
+
+
+@pytest.mark.asyncio
+async def test_request_id_header():
+    """Test a request ID is echoed back, or generated"""
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/health", headers={"X-Request-ID": "abc123"})
+        assert response.headers["x-request-id"] == "abc123"
+        response = await client.get("/health")
+        assert len(response.headers["x-request-id"]) == 32
@@ -0,0 +1,25 @@
+import uuid
+import pytest
+from datetime import datetime, timezone
+from fastapi import HTTPException
+from ..utils.pagination import encode_cursor, decode_cursor
+
+
+def test_cursor_round_trip():
+    """Test a cursor decodes back to the sort key it was built from"""
+    issued_at = datetime(2026, 5, 1, 12, 30, tzinfo=timezone.utc)
+    pass_id = uuid.uuid4()
+
+    cursor = encode_cursor(issued_at, pass_id, "apple")
+
+    assert decode_cursor(cursor, (datetime, uuid.UUID, str)) == [issued_at, pass_id, "apple"]
+
+
+def test_invalid_cursor_is_rejected():
+    """Test malformed cursors become a 400 rather than a server error"""
+    with pytest.raises(HTTPException) as exc_info:
+        decode_cursor("not-a-cursor", (datetime, uuid.UUID))
+    assert exc_info.value.status_code == 400
+
+    with pytest.raises(HTTPException):
+        decode_cursor(encode_cursor("2026-01-01T00:00:00"), (datetime, uuid.UUID))
@@ -0,0 +1,68 @@
+import io
+import json
+import hashlib
+import zipfile
+from datetime import datetime, timedelta
+from cryptography import x509
+from cryptography.x509.oid import NameOID
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.serialization import pkcs7, pkcs12
+from ..utils.pkpass import PKPassSigner, PKPassTemplate
+
+
+def _signer() -> PKPassSigner:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "Pass Type ID: pass.test")])
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(1)
+        .not_valid_before(datetime.utcnow())
+        .not_valid_after(datetime.utcnow() + timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    p12 = pkcs12.serialize_key_and_certificates(
+        b"pass", key, certificate, None, serialization.BestAvailableEncryption(b"secret")
+    )
+    return PKPassSigner(p12, "secret")
+
+
+def test_pkpass_matches_zipfile_byte_for_byte():
+    """Test the native archive equals zipfile's output for the same members"""
+    template = PKPassTemplate({"icon.png": b"\x89PNG not really", "logo.png": b"logo"})
+    archive = bytes(template.build({"serialNumber": "PM-0000000001"}, _signer()))
+
+    with zipfile.ZipFile(io.BytesIO(archive)) as zf:
+        assert zf.testzip() is None
+        members = [(info, zf.read(info)) for info in zf.infolist()]
+    names = [info.filename for info, _ in members]
+    assert names == ["pass.json", "icon.png", "logo.png", "manifest.json", "signature"]
+
+    # The manifest covers every other file and the signature parses
+    contents = dict((info.filename, data) for info, data in members)
+    manifest = json.loads(contents["manifest.json"])
+    assert manifest == {
+        name: hashlib.sha1(contents[name]).hexdigest()
+        for name in ("pass.json", "icon.png", "logo.png")
+    }
+    assert pkcs7.load_der_pkcs7_certificates(contents["signature"])
+
+    # PNGs are stored as-is, everything else deflated
+    assert [info.compress_type for info, _ in members] == [
+        zipfile.ZIP_DEFLATED, zipfile.ZIP_STORED, zipfile.ZIP_STORED,
+        zipfile.ZIP_DEFLATED, zipfile.ZIP_DEFLATED,
+    ]
+
+    reference = io.BytesIO()
+    with zipfile.ZipFile(reference, "w") as zf:
+        for info, data in members:
+            entry = zipfile.ZipInfo(info.filename, date_time=(1980, 1, 1, 0, 0, 0))
+            entry.compress_type = info.compress_type
+            entry.create_system = 3
+            entry.create_version = 20
+            entry.external_attr = 0o644 << 16
+            zf.writestr(entry, data, compresslevel=6)
+    assert reference.getvalue() == archive
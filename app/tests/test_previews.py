@@ -0,0 +1,126 @@
+import io
+import uuid
+import asyncio
+import pytest
+from datetime import datetime, timedelta, timezone
+from PIL import Image
+from ..models.base import async_session
+from ..models.models import Org, Design
+from ..services import previews
+from ..services.previews import PreviewService
+from ..utils.pass_preview import render_pass_preview, template_hash, parse_color
+
+
+def test_preview_uses_template_colors():
+    """Test the rendered preview is a PNG filled with the design's background"""
+    png = render_pass_preview({
+        "logoText": "Cafe Mint",
+        "backgroundColor": "rgb(20, 120, 90)",
+        "style": "storeCard",
+        "storeCard": {"primaryFields": [{"key": "balance", "label": "Balance", "value": "$12"}]},
+    })
+
+    image = Image.open(io.BytesIO(png))
+    assert image.format == "PNG"
+    assert image.convert("RGB").getpixel((5, image.height // 2)) == (20, 120, 90)
+    assert parse_color("#ff8000", "rgb(0, 0, 0)") == (255, 128, 0)
+    assert parse_color("not a color", "rgb(1, 2, 3)") == (1, 2, 3)
+
+
+def test_template_hash_changes_only_with_content():
+    """Test key order doesn't cause a re-render but a changed field does"""
+    assert template_hash({"a": 1, "b": 2}) == template_hash({"b": 2, "a": 1})
+    assert template_hash({"a": 1}) != template_hash({"a": 2})
+
+
+def test_live_claims_are_left_to_their_worker():
+    """Test a design is re-rendered unless its preview is current or a fresh claim covers it"""
+    template = {"logoText": "Lease"}
+    version = template_hash(template)
+    service = PreviewService()
+    now = datetime.now(timezone.utc)
+
+    assert service.needs_render(Design(template_json=template))
+    assert not service.needs_render(Design(template_json=template, preview_hash=version))
+    assert not service.needs_render(Design(template_json=template, preview_claim=version, preview_claimed_at=now))
+    assert service.needs_render(Design(
+        template_json=template, preview_claim=version, preview_claimed_at=now - timedelta(hours=1)
+    ))
+    assert service.needs_render(Design(template_json=template, preview_claim="older", preview_claimed_at=now))
+
+
+@pytest.fixture
+async def design(database):
+    """A design without a preview, in the test database; skipped without Postgres"""
+    org = Org(id=uuid.uuid4(), name="Preview Org")
+    design = Design(id=uuid.uuid4(), org_id=org.id, template_json={"logoText": "Preview"})
+    async with async_session() as session:
+        session.add(org)
+        await session.flush()
+        session.add(design)
+        await session.commit()
+
+    yield design
+
+    async with async_session() as session:
+        await session.delete(await session.get(Org, org.id))
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_interrupted_render_is_retaken_after_its_lease(design, monkeypatch):
+    """Test a render cancelled mid-upload blocks others only until its claim expires"""
+    uploading = asyncio.Event()
+
+    async def hang(*args, **kwargs):
+        uploading.set()
+        await asyncio.Event().wait()
+
+    async def upload(file, key, content_type=None):
+        return f"https://cdn.test/{key}"
+
+    service = PreviewService()
+    design_id = str(design.id)
+    monkeypatch.setattr(previews.storage, "upload_file", hang)
+    interrupted = asyncio.create_task(service.render(design_id, design.template_json))
+    await uploading.wait()
+    interrupted.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await interrupted
+
+    monkeypatch.setattr(previews.storage, "upload_file", upload)
+    assert await service.render(design_id, design.template_json) is None
+
+    monkeypatch.setattr(previews, "PREVIEW_CLAIM_TTL", 0)
+    url = await service.render(design_id, design.template_json)
+    assert url.endswith(f"{template_hash(design.template_json)}.png")
+
+    async with async_session() as session:
+        rendered = await session.get(Design, design.id)
+        assert rendered.rendered_preview_url == url
+        assert rendered.preview_claim is None
+        assert not service.needs_render(rendered)
+
+
+@pytest.mark.asyncio
+async def test_failed_render_waits_for_its_lease(design, monkeypatch):
+    """Test a render that fails is not retried on the next read, only once its claim expires"""
+    attempts = []
+
+    def broken(template_json):
+        attempts.append(template_json)
+        raise ValueError("unrenderable")
+
+    service = PreviewService()
+    design_id = str(design.id)
+    monkeypatch.setattr(previews, "render_pass_preview", broken)
+    assert await service.render(design_id, design.template_json) is None
+    assert await service.render(design_id, design.template_json) is None
+    assert len(attempts) == 1
+
+    async with async_session() as session:
+        assert not service.needs_render(await session.get(Design, design.id))
+
+    monkeypatch.setattr(previews, "PREVIEW_CLAIM_TTL", 0)
+    assert await service.render(design_id, design.template_json) is None
+    assert len(attempts) == 2
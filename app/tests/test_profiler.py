@@ -0,0 +1,59 @@
+import time
+import pytest
+from fastapi import FastAPI
+from httpx import AsyncClient
+from ..utils.profiler import ProfilingMiddleware, ProfileStore
+
+
+def busy_wait(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def _profiled_app(store: ProfileStore) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/slow/{item_id}")
+    async def slow(item_id: str):
+        busy_wait(0.1)
+        return {"ok": True}
+
+    @app.get("/fast")
+    async def fast():
+        return {"ok": True}
+
+    app.add_middleware(ProfilingMiddleware, sample_rate=0, slow_ms=50, interval_ms=1, store=store)
+    return app
+
+
+@pytest.mark.asyncio
+async def test_slow_requests_are_profiled(tmp_path):
+    """Test requests over the latency threshold leave a flamegraph-ready profile"""
+    store = ProfileStore(str(tmp_path))
+    app = _profiled_app(store)
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        assert (await client.get("/fast")).status_code == 200
+        assert (await client.get("/slow/42")).status_code == 200
+
+    profiles = await store.list()
+    assert len(profiles) == 1
+    profile = profiles[0]
+    assert profile["route"] == "/slow/{item_id}"
+    assert profile["reason"] == "slow"
+    assert profile["status"] == 200
+    assert profile["duration_ms"] >= 100
+
+    with open(store.path(profile["id"])) as f:
+        lines = f.read().splitlines()
+    assert any("busy_wait" in line for line in lines)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+
+def test_profile_path_rejects_traversal(tmp_path):
+    """Test profile downloads cannot read outside the profile directory"""
+    store = ProfileStore(str(tmp_path))
+
+    assert store.path("../etc/passwd") is None
+    assert store.path("missing") is None
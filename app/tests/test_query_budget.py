@@ -0,0 +1,88 @@
+import uuid
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import create_engine, text
+from ..main import app
+from ..models.base import async_session
+from ..models.models import Org, User, Design, Pass, PassArtifact
+from ..utils.auth import create_jwt_token
+from ..utils.query_stats import QueryStats, query_budget, record_queries
+
+
+def test_statements_are_counted_per_block():
+    """Test each block sees its own statements and nested blocks count toward outer ones"""
+    db = create_engine("sqlite://")
+    with db.connect() as conn:
+        with record_queries() as outer:
+            conn.execute(text("SELECT 1"))
+            with record_queries() as inner:
+                conn.execute(text("SELECT 2"))
+        conn.execute(text("SELECT 3"))
+
+    assert [sql for sql, _, _ in outer.statements] == ["SELECT 1", "SELECT 2"]
+    assert [sql for sql, _, _ in inner.statements] == ["SELECT 2"]
+    assert outer.db_ms >= inner.db_ms >= 0
+
+    with pytest.raises(AssertionError, match="2 queries, budget is 1"):
+        with query_budget(1):
+            with db.connect() as conn:
+                conn.execute(text("SELECT 1"))
+                conn.execute(text("SELECT 2"))
+
+    stats = QueryStats()
+    stats.record("SELECT 1", 3, 1.25)
+    stats.record("UPDATE x", -1, 1.0)
+    assert stats.summary() == "2; rows=3; time=2.2ms"
+
+
+@pytest.fixture
+async def seeded_pass(database):
+    """A user with one pass and its org, in the test database; skipped without Postgres"""
+    org = Org(id=uuid.uuid4(), name="Budget Org")
+    user = User(id=uuid.uuid4(), line_user_id=uuid.uuid4().hex)
+    design = Design(id=uuid.uuid4(), org_id=org.id, template_json={"logoText": "Budget"})
+    issued = Pass(user_id=user.id, design_id=design.id, artifacts=[
+        PassArtifact(platform="apple", serial=f"PM-{uuid.uuid4().hex[:10]}", deep_link="https://a"),
+        PassArtifact(platform="google", serial=f"GP-{uuid.uuid4().hex[:10]}", deep_link="https://g"),
+    ])
+    async with async_session() as session:
+        session.add_all([org, user])
+        await session.flush()
+        session.add(design)
+        await session.flush()
+        session.add(issued)
+        await session.commit()
+
+    yield issued.id, {"Authorization": f"Bearer {create_jwt_token(str(user.id))}"}, str(org.id)
+
+    async with async_session() as session:
+        await session.delete(await session.get(Org, org.id))
+        await session.delete(await session.get(User, user.id))
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_pass_endpoints_stay_within_query_budget(seeded_pass):
+    """Test reading a pass is one query and listing passes two"""
+    pass_id, headers, _ = seeded_pass
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        with query_budget(1):
+            response = await client.get(f"/api/passes/{pass_id}", headers=headers)
+        assert response.status_code == 200
+
+        with query_budget(2):
+            response = await client.get("/api/passes", headers=headers)
+        assert response.status_code == 200
+        assert response.json()["items"][0]["id"] == str(pass_id)
+
+
+@pytest.mark.asyncio
+async def test_stats_endpoint_stays_within_query_budget(seeded_pass):
+    """Test org stats take four queries: counts, platforms, archived counters and recent activity"""
+    _, _, org_id = seeded_pass
+    headers = {"Authorization": f"Bearer {create_jwt_token(org_id, 'org')}"}
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        with query_budget(4):
+            response = await client.get(f"/api/stats/org/{org_id}", headers=headers)
+        assert response.status_code == 200
+        assert response.json()["passes"]["total_issued"] == 2
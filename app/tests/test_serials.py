@@ -0,0 +1,44 @@
+import asyncio
+import pytest
+from ..services.serials import SerialAllocator, encode_serial
+
+
+def test_serials_sort_in_numeric_order():
+    """Test fixed-width encoding keeps serials ordered and short"""
+    serials = [encode_serial(n) for n in (0, 31, 32, 1000, 10 ** 12)]
+
+    assert serials == sorted(serials)
+    assert serials[0] == "PM-0000000000"
+    assert all(len(serial) <= 32 for serial in serials)
+    with pytest.raises(ValueError):
+        encode_serial(32 ** 10)
+
+
+@pytest.mark.asyncio
+async def test_workers_never_share_a_serial():
+    """Test allocators drawing blocks from one sequence hand out unique numbers"""
+    sequence = {"next": 1}
+    fetches = []
+
+    async def fetch_block():
+        await asyncio.sleep(0)
+        start = sequence["next"]
+        sequence["next"] += 10
+        fetches.append(start)
+        return start, 10
+
+    workers = [SerialAllocator(fetch_block), SerialAllocator(fetch_block)]
+    numbers = await asyncio.gather(*[
+        worker.next_number() for _ in range(25) for worker in workers
+    ])
+
+    assert len(set(numbers)) == 50
+    # Blocks are prefetched before running out, so a few extra were reserved
+    assert len(fetches) >= 5
+
+    serials = await workers[0].next_serials()
+    assert serials["apple"][3:] == serials["google"][3:]
+
+    for worker in workers:
+        await worker.close()
+        assert worker._refill is None
@@ -0,0 +1,95 @@
+import os
+import uuid
+import sqlite3
+import pytest
+from sqlalchemy import update
+from ..models.base import async_session
+from ..models.models import Org, Design
+from ..services import issuer
+from ..utils.shared_cache import SharedCache
+
+
+@pytest.mark.asyncio
+async def test_values_are_shared_and_versioned(tmp_path):
+    """Test a value one worker stores is seen by another, for the same version only"""
+    path = os.path.join(tmp_path, "cache.sqlite")
+    worker_a, worker_b = SharedCache(path), SharedCache(path)
+
+    worker_a.set("design:1", b"v1 body", version="1")
+    worker_a.flush()
+    assert await worker_b.get("design:1", version="1") == b"v1 body"
+    assert await worker_b.get("design:1", version="2") is None
+    assert await worker_b.get("design:1", version="1", max_age=0) is None
+
+    worker_b.delete("design:1")
+    worker_b.flush()
+    assert await worker_a.get("design:1", version="1") is None
+    assert await SharedCache("").get("design:1") is None
+
+
+@pytest.mark.asyncio
+async def test_lookups_stay_off_the_event_loop(tmp_path):
+    """Test opening the file and reading it happen on another thread than the event loop's"""
+    cache = SharedCache(os.path.join(tmp_path, "cache.sqlite"))
+    assert await cache.get("design:1") is None
+    assert getattr(cache._local, "conn", None) is None
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_entries_are_evicted(tmp_path):
+    """Test the cache stays under its size limit, dropping the oldest entries"""
+    cache = SharedCache(os.path.join(tmp_path, "cache.sqlite"), max_bytes=1000)
+    for i in range(5):
+        cache.set(f"qr:{i}", bytes(300))
+    cache.flush()
+
+    assert await cache.get("qr:0") is None
+    assert await cache.get("qr:4") == bytes(300)
+    stored = sum([await cache.get(f"qr:{i}") is not None for i in range(5)])
+    assert stored * 300 <= 1000
+
+
+def test_running_size_total_follows_every_write(tmp_path):
+    """Test the size total kept by triggers matches the entries after stores, replaces and deletes"""
+    path = os.path.join(tmp_path, "cache.sqlite")
+    cache = SharedCache(path)
+    cache.set("a", bytes(100))
+    cache.set("b", bytes(50))
+    cache.set("a", bytes(10))
+    cache.delete("b")
+    cache.set("c", bytes(5))
+    cache.flush()
+
+    with sqlite3.connect(path) as conn:
+        total = conn.execute("SELECT total_size FROM stats").fetchone()[0]
+        assert total == conn.execute("SELECT SUM(size) FROM entries").fetchone()[0] == 15
+
+
+@pytest.mark.asyncio
+async def test_edited_designs_miss_the_cache(database, tmp_path, monkeypatch):
+    """Test issuance sees a design's new template once it is edited, not the cached one"""
+    cache = SharedCache(os.path.join(tmp_path, "cache.sqlite"))
+    monkeypatch.setattr(issuer, "shared_cache", cache)
+    org = Org(id=uuid.uuid4(), name="Cache Org")
+    design = Design(id=uuid.uuid4(), org_id=org.id, template_json={"logoText": "Before"})
+    async with async_session() as session:
+        session.add(org)
+        await session.flush()
+        session.add(design)
+        await session.commit()
+
+    async with async_session() as session:
+        found = await issuer.issuer_service._get_design(session, str(design.id))
+        assert found.template_json == {"logoText": "Before"}
+        cache.flush()
+        assert (await issuer.issuer_service._get_design(session, str(design.id))).template_json == {"logoText": "Before"}
+
+        await session.execute(
+            update(Design).where(Design.id == design.id).values(template_json={"logoText": "After"})
+        )
+        await session.commit()
+
+    async with async_session() as session:
+        found = await issuer.issuer_service._get_design(session, str(design.id))
+        assert found.template_json == {"logoText": "After"}
+        assert await issuer.issuer_service._get_design(session, str(uuid.uuid4())) is None
@@ -0,0 +1,104 @@
+import asyncio
+import pytest
+from datetime import datetime, timedelta
+from cryptography import x509
+from cryptography.x509.oid import NameOID
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.serialization import pkcs7, pkcs12
+from ..services.signing import RemoteSigner
+from ..services.signing_daemon import SigningDaemon
+
+
+def _p12() -> bytes:
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "Pass Type ID: pass.test")])
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(1)
+        .not_valid_before(datetime.utcnow())
+        .not_valid_after(datetime.utcnow() + timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    return pkcs12.serialize_key_and_certificates(
+        b"pass", key, certificate, None, serialization.BestAvailableEncryption(b"secret")
+    )
+
+
+@pytest.fixture
+async def daemon_url(tmp_path):
+    daemon = SigningDaemon(_p12(), "secret", workers=0)
+    url = f"unix://{tmp_path}/signer.sock"
+    await daemon.start(url)
+    yield url
+    await daemon.close()
+
+
+@pytest.mark.asyncio
+async def test_remote_signer_pipelines_requests(daemon_url):
+    """Test concurrent signatures share connections and writes"""
+    signer = RemoteSigner(daemon_url, pool_size=2)
+    manifests = [f'{{"pass.json":"{n:040x}"}}'.encode() for n in range(100)]
+    try:
+        signatures = await asyncio.gather(*(signer.sign(m) for m in manifests))
+        assert len(signer._connections) <= 2
+        assert signer.writes < len(manifests)
+    finally:
+        await signer.close()
+
+    for signature in signatures:
+        certificates = pkcs7.load_der_pkcs7_certificates(signature)
+        assert certificates[0].subject.rfc4514_string() == "CN=Pass Type ID: pass.test"
+
+
+@pytest.mark.asyncio
+async def test_remote_signer_reconnects(daemon_url):
+    """Test a dropped connection is replaced on the next request"""
+    signer = RemoteSigner(daemon_url, pool_size=1)
+    try:
+        await signer.sign(b"{}")
+        signer._connections[0].writer.transport.abort()
+        assert await signer.sign(b"{}")
+    finally:
+        await signer.close()
+
+
+@pytest.fixture
+async def stuck_daemon_url(tmp_path):
+    """A daemon that accepts requests and never answers"""
+    async def swallow(reader, writer):
+        while await reader.read(65536):
+            pass
+        writer.close()
+
+    server = await asyncio.start_unix_server(swallow, path=f"{tmp_path}/stuck.sock")
+    yield f"unix://{tmp_path}/stuck.sock"
+    server.close()
+    await server.wait_closed()
+
+
+@pytest.mark.asyncio
+async def test_timed_out_and_cancelled_requests_are_forgotten(stuck_daemon_url):
+    """Test abandoned requests leave nothing pending and a timeout replaces the connection"""
+    signer = RemoteSigner(stuck_daemon_url, pool_size=1, timeout=0.1)
+    try:
+        task = asyncio.create_task(signer.sign(b"{}"))
+        await asyncio.sleep(0.02)
+        first = signer._connections[0]
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        assert first.pending == {} and not first.closed
+
+        with pytest.raises(asyncio.TimeoutError):
+            await signer.sign(b"{}")
+        assert first.pending == {} and first.closed
+
+        with pytest.raises(asyncio.TimeoutError):
+            await signer.sign(b"{}")
+        assert signer._connections[0] is not first
+    finally:
+        await signer.close()
@@ -0,0 +1,133 @@
+import io
+import os
+import uuid
+import pytest
+from collections import namedtuple
+from datetime import datetime, timezone
+from httpx import AsyncClient
+from ..main import app
+from ..api import passes as passes_module
+from ..api import wallet as wallet_module
+from ..models.base import get_db
+from ..utils.auth import pass_authentication_token
+from ..utils import spool as spool_module
+from ..utils.spool import UploadSpool
+
+
+@pytest.mark.asyncio
+async def test_spooled_file_is_served_until_uploaded(tmp_path):
+    """Test a spooled file is readable, uploaded in the background, then removed"""
+    uploaded = {}
+    spool = UploadSpool(str(tmp_path), enabled=True, concurrency=2)
+
+    async def upload(file_content, key, content_type=None):
+        uploaded[key] = (file_content.read(), content_type)
+
+    spool.upload = upload
+    await spool.put("passes/apple/1.pkpass", b"pkpass", content_type="application/vnd.apple.pkpass")
+    await spool.close()
+
+    assert uploaded == {"passes/apple/1.pkpass": (b"pkpass", "application/vnd.apple.pkpass")}
+    assert await spool.read("passes/apple/1.pkpass") is None
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.asyncio
+async def test_recovery_uploads_files_left_by_a_previous_process(tmp_path, monkeypatch):
+    """Test a restart uploads what the last process spooled and drops torn writes"""
+    crashed = UploadSpool(str(tmp_path), enabled=True)
+    crashed._write("passes/apple/2.pkpass", b"left behind", None)
+    torn = os.path.join(tmp_path, "passes%2Fapple%2F3.pkpass.tmp")
+    open(torn, "wb").close()
+    os.utime(torn, (0, 0))
+    assert await crashed.read("passes/apple/2.pkpass") == b"left behind"
+
+    attempts = []
+    restarted = UploadSpool(str(tmp_path), enabled=True)
+
+    async def flaky_upload(file_content, key, content_type=None):
+        attempts.append(key)
+        if len(attempts) == 1:
+            raise ConnectionError("S3 unavailable")
+
+    monkeypatch.setattr(spool_module, "RETRY_BASE", 0.01)
+    restarted.upload = flaky_upload
+    assert await restarted.recover() == 1
+    await restarted.close(timeout=5)
+
+    # Uploaded on the retry, and only then removed
+    assert attempts == ["passes/apple/2.pkpass", "passes/apple/2.pkpass"]
+    assert os.listdir(tmp_path) == []
+
+
+@pytest.mark.asyncio
+async def test_download_waits_for_files_spooled_on_another_host(tmp_path, monkeypatch):
+    """Test a pass neither in the local spool nor in storage yet is a 503 to retry, then a redirect"""
+    stored = set()
+
+    async def exists(key):
+        return key in stored
+
+    monkeypatch.setattr(passes_module, "upload_spool", UploadSpool(str(tmp_path), enabled=True))
+    monkeypatch.setattr(passes_module.storage, "exists", exists)
+    pass_id = uuid.uuid4()
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get(f"/api/passes/{pass_id}/pkpass")
+        assert response.status_code == 503
+        assert int(response.headers["retry-after"]) >= 1
+
+        stored.add(f"passes/apple/{pass_id}.pkpass")
+        response = await client.get(f"/api/passes/{pass_id}/pkpass")
+        assert response.status_code == 307
+        assert response.headers["location"].endswith(f"passes/apple/{pass_id}.pkpass")
+
+
+class PassLookup:
+    """Session stand-in answering the pass lookup with one row"""
+
+    def __init__(self, row):
+        self.row = row
+
+    async def execute(self, stmt):
+        row = self.row
+
+        class Result:
+            def first(self):
+                return row
+
+        return Result()
+
+
+@pytest.mark.asyncio
+async def test_wallet_update_waits_for_files_spooled_on_another_host(tmp_path, monkeypatch):
+    """Test Wallet's fetch of a pass spooled elsewhere is a 503 to retry, then the stored file"""
+    pass_id = uuid.uuid4()
+    key = f"passes/apple/{pass_id}.pkpass"
+    stored = {}
+
+    async def exists(key):
+        return key in stored
+
+    async def get_file(key):
+        return io.BytesIO(stored[key])
+
+    async def lookup():
+        Row = namedtuple("Row", "id last_updated")
+        yield PassLookup(Row(pass_id, datetime(2026, 5, 1, tzinfo=timezone.utc)))
+
+    monkeypatch.setattr(wallet_module, "upload_spool", UploadSpool(str(tmp_path), enabled=True))
+    monkeypatch.setattr(wallet_module.storage, "exists", exists)
+    monkeypatch.setattr(wallet_module.storage, "get_file", get_file)
+    monkeypatch.setitem(app.dependency_overrides, get_db, lookup)
+    headers = {"Authorization": f"ApplePass {pass_authentication_token('PM-SPOOLED1')}"}
+
+    async with AsyncClient(app=app, base_url="http://test") as client:
+        response = await client.get("/api/v1/passes/pass.test/PM-SPOOLED1", headers=headers)
+        assert response.status_code == 503
+        assert int(response.headers["retry-after"]) >= 1
+
+        stored[key] = b"pkpass bytes"
+        response = await client.get("/api/v1/passes/pass.test/PM-SPOOLED1", headers=headers)
+        assert response.status_code == 200
+        assert response.content == b"pkpass bytes"
@@ -0,0 +1,51 @@
+import sys
+import asyncio
+import binascii
+import subprocess
+import pytest
+from ..services import apple_pass
+from ..utils.startup import StartupReport
+
+
+def test_heavy_dependencies_are_not_imported_with_app():
+    """Test importing the app leaves pass signing, QR and S3 libraries for later"""
+    code = (
+        "import sys, app.main; "
+        "print('loaded:' + ','.join(m for m in ('passpy', 'qrcode', 'PIL', 'aioboto3') if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    )
+    assert result.stdout.splitlines()[-1] == "loaded:"
+
+
+@pytest.mark.asyncio
+async def test_failed_phase_is_reported_without_stopping_startup():
+    """Test a failing or slow warm-up step is recorded and startup continues"""
+    async def broken():
+        raise RuntimeError("unreachable")
+
+    report = StartupReport()
+    await report.run("broken", broken())
+    await report.run("slow", asyncio.sleep(1), timeout=0.01)
+    await report.run("ok", asyncio.sleep(0))
+    report.finish()
+
+    phases = {phase["phase"]: phase for phase in report.as_dict()["phases"]}
+    assert phases["broken"]["error"] == "unreachable"
+    assert phases["slow"]["error"].startswith("timed out")
+    assert phases["ok"]["error"] is None
+    assert report.total_ms is not None
+
+
+def test_failed_warm_up_is_retried(monkeypatch):
+    """Test a signer whose certificate fails to decode stays cold and warms on the next call"""
+    signer = apple_pass.ApplePassSigner()
+    monkeypatch.setattr(apple_pass, "APPLE_PASS_CERT_P12", "a")
+    with pytest.raises(binascii.Error):
+        signer.warm()
+    assert not signer._warmed
+
+    monkeypatch.setattr(apple_pass, "APPLE_PASS_CERT_P12", "")
+    signer.warm()
+    assert signer._warmed and signer.backend is None
@@ -0,0 +1,252 @@
+import json
+import uuid
+import socket
+import httpcore
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from sqlalchemy import select, func
+from ..models.base import async_session
+from ..models.models import Org, WebhookSubscription, WebhookOutbox
+from pydantic import ValidationError
+from ..schemas.webhooks import WebhookCreate
+from ..services import webhooks
+from ..services.webhooks import (
+    PublicAddressBackend, WebhookDispatcher, SIGNATURE_HEADER, check_url_host, note_subscription, record_event,
+    verify_signature,
+)
+
+
+class Receiver:
+    """Local webhook endpoint recording what it receives"""
+
+    def __init__(self):
+        self.requests = []
+        self.status = 200
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # Keep-alive
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers["Content-Length"]))
+                receiver.requests.append({
+                    "port": self.client_address[1],
+                    "signature": self.headers[SIGNATURE_HEADER],
+                    "body": body,
+                })
+                self.send_response(receiver.status)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/hooks"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def receiver(monkeypatch):
+    # The receiver is on loopback over http
+    monkeypatch.setattr(webhooks, "WEBHOOK_ALLOW_PRIVATE_URLS", True)
+    receiver = Receiver()
+    yield receiver
+    receiver.close()
+
+
+@pytest.mark.asyncio
+async def test_deliveries_are_signed_and_reuse_connections(receiver):
+    """Test batches are signed and sent over one pooled connection"""
+    dispatcher = WebhookDispatcher()
+    try:
+        for n in range(3):
+            events = [{"id": n * 2 + i, "type": "pass.issued", "data": {"pass_id": str(uuid.uuid4())}} for i in range(2)]
+            assert await dispatcher.deliver(receiver.url, "s3cret", events) is None
+        receiver.status = 500
+        assert await dispatcher.deliver(receiver.url, "s3cret", events) == "HTTP 500"
+    finally:
+        await dispatcher.close()
+
+    assert len({request["port"] for request in receiver.requests}) == 1
+    assert [event["id"] for request in receiver.requests[:3] for event in json.loads(request["body"])] == list(range(6))
+    request = receiver.requests[0]
+    assert verify_signature("s3cret", request["body"], request["signature"])
+    assert not verify_signature("other", request["body"], request["signature"])
+    assert not verify_signature("s3cret", request["body"] + b" ", request["signature"])
+
+
+@pytest.mark.asyncio
+async def test_endpoints_must_be_public_https():
+    """Test http URLs and hosts on private, loopback or link-local addresses are refused"""
+    with pytest.raises(ValidationError):
+        WebhookCreate(url="http://hooks.example.com/passmint")
+    assert WebhookCreate(url="https://hooks.example.com/passmint").url == "https://hooks.example.com/passmint"
+
+    for url in [
+        "https://127.0.0.1/hooks", "https://localhost:8443/hooks", "https://10.1.2.3/hooks",
+        "https://192.168.0.10/hooks", "https://169.254.169.254/latest/meta-data",
+        "https://[::1]/hooks", "https://[::ffff:127.0.0.1]/hooks", "https://[fe80::1]/hooks",
+    ]:
+        with pytest.raises(ValueError):
+            await check_url_host(url)
+    await check_url_host("https://93.184.216.34/hooks")
+
+
+@pytest.mark.asyncio
+async def test_dispatcher_refuses_private_addresses():
+    """Test delivery to an endpoint on a private address fails before connecting"""
+    dispatcher = WebhookDispatcher()
+    try:
+        error = await dispatcher.deliver("https://169.254.169.254/hooks", "s3cret", [{"id": 1}])
+    finally:
+        await dispatcher.close()
+
+    assert error.startswith("ConnectError: Blocked:")
+
+
+@pytest.mark.asyncio
+async def test_connections_go_to_the_address_that_was_checked(monkeypatch):
+    """Test each connection opens to the resolved public address, and a rebound name is refused"""
+    answers = iter(["93.184.216.34", "10.0.0.5"])
+    connected = []
+
+    def getaddrinfo(host, port, *args, **kwargs):
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (next(answers), port))]
+
+    class RecordingBackend:
+        async def connect_tcp(self, host, port, **kwargs):
+            connected.append((host, port))
+
+    monkeypatch.setattr(socket, "getaddrinfo", getaddrinfo)
+    backend = PublicAddressBackend(RecordingBackend())
+
+    await backend.connect_tcp("hooks.example.com", 443)
+    with pytest.raises(httpcore.ConnectError, match="Blocked"):
+        await backend.connect_tcp("hooks.example.com", 443)
+    assert connected == [("93.184.216.34", 443)]
+
+
+class SubscribersSession:
+    """Session stand-in listing one subscribed org and recording the statements run"""
+
+    def __init__(self, org_id):
+        self.org_id = org_id
+        self.statements = []
+
+    async def execute(self, stmt, params=None):
+        self.statements.append(str(stmt).split()[0])
+        org_id = self.org_id
+
+        class Result:
+            def scalars(self):
+                return [org_id]
+
+        return Result()
+
+
+@pytest.mark.asyncio
+async def test_orgs_without_subscriptions_record_no_events(monkeypatch):
+    """Test events of orgs without webhooks skip the insert, with the subscriber list loaded once"""
+    monkeypatch.setattr(webhooks, "_subscribers", {})
+    subscribed = str(uuid.uuid4())
+    session = SubscribersSession(uuid.UUID(subscribed))
+
+    for _ in range(3):
+        await record_event(session, str(uuid.uuid4()), "pass.issued", {"pass_id": "p"})
+    await record_event(session, subscribed, "pass.issued", {"pass_id": "p"})
+    assert session.statements == ["SELECT", "INSERT"]
+
+    # A subscription made on this worker counts before the next reload
+    other = str(uuid.uuid4())
+    note_subscription(other)
+    await record_event(session, other, "pass.issued", {"pass_id": "p"})
+    assert session.statements == ["SELECT", "INSERT", "INSERT"]
+
+
+@pytest.fixture
+async def subscription(database, receiver):
+    """An org subscribed to the local receiver; skipped without Postgres"""
+    org = Org(id=uuid.uuid4(), name="Webhook Org")
+    subscription = WebhookSubscription(
+        id=uuid.uuid4(), org_id=org.id, url=receiver.url, secret="s3cret", events=["pass.issued", "pass.updated"],
+    )
+    async with async_session() as session:
+        session.add(org)
+        await session.flush()
+        session.add(subscription)
+        await session.commit()
+    note_subscription(str(org.id))
+
+    yield str(org.id), subscription.id
+
+    async with async_session() as session:
+        await session.delete(await session.get(Org, org.id))
+        await session.commit()
+
+
+@pytest.mark.asyncio
+async def test_outbox_delivers_in_order_and_backs_off(receiver, subscription):
+    """Test committed events arrive in one ordered batch, and a failing endpoint keeps its events"""
+    org_id, subscription_id = subscription
+    async with async_session() as session:
+        for n in range(3):
+            await record_event(session, org_id, "pass.issued", {"pass_id": f"p-{n}"})
+        await record_event(session, org_id, "pass.redeemed", {"pass_id": "p-0"})  # Not subscribed
+        await session.commit()
+    async with async_session() as session:
+        await record_event(session, org_id, "pass.updated", {"pass_id": "rolled-back"})
+        await session.rollback()
+
+    dispatcher = WebhookDispatcher()
+    try:
+        assert await dispatcher.run_once() == 3
+        (request,) = receiver.requests
+        events = json.loads(request["body"])
+        assert [event["data"]["pass_id"] for event in events] == ["p-0", "p-1", "p-2"]
+        assert verify_signature("s3cret", request["body"], request["signature"])
+
+        receiver.status = 503
+        async with async_session() as session:
+            await record_event(session, org_id, "pass.updated", {"pass_id": "p-1"})
+            await session.commit()
+        assert await dispatcher.run_once() == 0
+    finally:
+        await dispatcher.close()
+
+    async with async_session() as session:
+        state = await session.get(WebhookSubscription, subscription_id)
+        waiting = await session.scalar(
+            select(func.count()).where(WebhookOutbox.subscription_id == subscription_id)
+        )
+    assert state.failures == 1 and state.last_error == "HTTP 503"
+    assert waiting == 1
+
+
+@pytest.mark.asyncio
+async def test_events_wait_for_earlier_transactions(receiver, subscription):
+    """Test an event committed while an earlier transaction is open waits, then follows that one's events"""
+    org_id, _ = subscription
+    dispatcher = WebhookDispatcher()
+    try:
+        async with async_session() as earlier:
+            await record_event(earlier, org_id, "pass.issued", {"pass_id": "first"})
+            async with async_session() as later:
+                await record_event(later, org_id, "pass.updated", {"pass_id": "second"})
+                await later.commit()
+
+            # The later event is visible, but the earlier transaction may still commit ahead of it
+            assert await dispatcher.run_once() == 0
+            await earlier.commit()
+
+        assert await dispatcher.run_once() == 2
+    finally:
+        await dispatcher.close()
+
+    (request,) = receiver.requests
+    assert [event["data"]["pass_id"] for event in json.loads(request["body"])] == ["first", "second"]
@@ -1,12 +1,14 @@
 import jwt
 import os
+import hmac
+import hashlib
 from datetime import datetime, timedelta
 from typing import Dict, Optional, Tuple
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from dotenv import load_dotenv
+from ..config import load_env
 
-load_dotenv()
+load_env()
 
 security = HTTPBearer()
 
@@ -21,7 +23,7 @@ def create_jwt_token(user_id: str, user_type: str = "user") -> str:
     
     Args:
         user_id: User or org ID
-        user_type: Either "user" or "org"
+        user_type: "user", "org" or "admin"
         
     Returns:
         JWT token as string
@@ -96,4 +98,60 @@ async def get_current_org(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Not authorized as organization",
         )
-    return user_id 
\ No newline at end of file
+    return user_id
+
+
+async def get_current_admin(
+    current_user: Tuple[str, str] = Depends(get_current_user)
+) -> str:
+    """
+    Get current admin ID from JWT token. Verify it's an admin token.
+    
+    Args:
+        current_user: Tuple of (user_id, user_type) from get_current_user
+        
+    Returns:
+        admin ID
+    """
+    user_id, user_type = current_user
+    if user_type != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized as admin",
+        )
+    return user_id
+
+
+def pass_authentication_token(serial: str) -> str:
+    """
+    Derive the Apple Wallet authenticationToken for a pass.
+
+    The token is an HMAC of the serial, so it never needs to be stored.
+    
+    Args:
+        serial: Pass serial number
+        
+    Returns:
+        Hex token to embed in pass.json
+    """
+    return hmac.new(
+        JWT_SECRET.encode("utf-8"), f"pass:{serial}".encode("utf-8"), hashlib.sha256
+    ).hexdigest()
+
+
+def verify_pass_authentication(serial: str, authorization: Optional[str]) -> None:
+    """
+    Verify an `Authorization: ApplePass <token>` header sent by Wallet.
+    
+    Args:
+        serial: Pass serial number from the request path
+        authorization: Raw Authorization header
+    """
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme != "ApplePass" or not hmac.compare_digest(
+        token.strip(), pass_authentication_token(serial)
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid pass authentication token",
+        )
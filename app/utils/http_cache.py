@@ -0,0 +1,122 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+from ..config import load_env
+from fastapi import Response, status
+from fastapi.encoders import jsonable_encoder
+
+load_env()
+
+# Max responses kept per worker
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2048"))
+
+# Per-principal resources: browsers may keep them but must revalidate
+PRIVATE_REVALIDATE = "private, no-cache"
+
+
+def compute_etag(*parts: Any) -> str:
+    """
+    Compute a strong ETag from the parts that make up a representation.
+
+    Args:
+        parts: Values identifying the version and content (ids, timestamps, fields)
+
+    Returns:
+        Quoted ETag header value
+    """
+    payload = json.dumps(jsonable_encoder(parts), sort_keys=True, separators=(",", ":"))
+    return '"' + hashlib.sha256(payload.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against an ETag.
+
+    Uses the weak comparison required for If-None-Match, so `W/"x"` matches `"x"`.
+
+    Args:
+        if_none_match: Raw If-None-Match header value
+        etag: Current ETag
+
+    Returns:
+        True if the client's copy is current
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == etag:
+            return True
+    return False
+
+
+def cache_headers(etag: str, cache_control: str = PRIVATE_REVALIDATE) -> dict:
+    """Build the validator headers sent with both 200 and 304 responses"""
+    return {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "Vary": "Authorization",
+    }
+
+
+def not_modified_response(etag: str, cache_control: str = PRIVATE_REVALIDATE) -> Response:
+    """Build an empty 304 response"""
+    return Response(
+        status_code=status.HTTP_304_NOT_MODIFIED,
+        headers=cache_headers(etag, cache_control),
+    )
+
+
+def json_bytes(content: Any) -> bytes:
+    """Serialize a response body the way JSONResponse does"""
+    return json.dumps(
+        jsonable_encoder(content),
+        ensure_ascii=False,
+        allow_nan=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+
+
+class ResponseCache:
+    """
+    Per-worker LRU cache of serialized response bodies.
+
+    Keys are (resource, version, principal); the version is the ETag, so a
+    changed row simply stops being looked up and ages out.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[Hashable, ...], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, resource: str, version: str, principal: str) -> Optional[bytes]:
+        key = (resource, version, principal)
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def set(self, resource: str, version: str, principal: str, body: bytes) -> None:
+        key = (resource, version, principal)
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# Create a singleton instance
+response_cache = ResponseCache(RESPONSE_CACHE_SIZE)
@@ -1,10 +1,10 @@
 import os
 import jwt
 import httpx
-from dotenv import load_dotenv
+from ..config import load_env
 from fastapi import HTTPException, status
 
-load_dotenv()
+load_env()
 
 LINE_CHANNEL_SECRET = os.getenv("LINE_CHANNEL_SECRET", "")
 
@@ -0,0 +1,232 @@
+"""
+Structured logging that never blocks the event loop.
+
+configure_logging() routes every logger through a bounded queue: the calling
+task only formats the message and enqueues it, and a background thread
+writes one JSON object per line to stdout. When the queue is full, records
+are dropped and counted rather than waited on.
+
+    {"ts": "...", "level": "WARNING", "logger": "app.services.issuer",
+     "message": "Error generating Apple Pass", "request_id": "...", "pass_id": "..."}
+
+Fields passed with `extra=` become keys of the object. RequestIdMiddleware
+gives each request an ID (from `X-Request-ID`, or a new one) that is added
+to every record logged while handling it and echoed in the response.
+
+    LOG_LEVEL      root level, default INFO
+    LOG_LEVELS     per-logger levels, e.g. "app.services.inventory=DEBUG,sqlalchemy.engine=INFO"
+    LOG_SAMPLING   fraction of records below WARNING kept per logger, e.g. "app.api.wallet=0.01"
+    LOG_QUEUE_SIZE records buffered before dropping
+"""
+import os
+import sys
+import copy
+import json
+import uuid
+import queue
+import random
+import logging
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from ..config import load_env
+
+load_env()
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+
+def _pairs(spec: str) -> Dict[str, str]:
+    return {
+        name.strip(): value.strip()
+        for name, _, value in (item.partition("=") for item in spec.split(",") if "=" in item)
+    }
+
+
+LOG_LEVELS = {name: level.upper() for name, level in _pairs(os.getenv("LOG_LEVELS", "")).items()}
+LOG_SAMPLING = {name: float(rate) for name, rate in _pairs(os.getenv("LOG_SAMPLING", "")).items()}
+
+REQUEST_ID_HEADER = b"x-request-id"
+
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else came from `extra=`
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "request_id", "sample_rate"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with `extra=` fields as keys"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if getattr(record, "request_id", None):
+            entry["request_id"] = record.request_id
+        if getattr(record, "sample_rate", None):
+            entry["sample_rate"] = record.sample_rate
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class ContextFilter(logging.Filter):
+    """Stamps records with the current request ID, in the logging task"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keeps a fraction of a logger's records below WARNING"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = rates
+        self._resolved: Dict[str, float] = {}
+
+    def rate(self, name: str) -> float:
+        rate = self._resolved.get(name)
+        if rate is None:
+            # The most specific configured logger wins: "a.b" over "a"
+            matches = [
+                prefix for prefix in self.rates
+                if name == prefix or name.startswith(prefix + ".")
+            ]
+            rate = self.rates[max(matches, key=len)] if matches else 1.0
+            self._resolved[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rate(record.name)
+        if rate >= 1:
+            return True
+        # Readers can scale counts back up
+        record.sample_rate = rate
+        return random.random() < rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Enqueues without waiting; drops and counts records when the queue is full"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Resolve the message and traceback here, where the arguments and
+        # exception are still live, and keep the record's own fields
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+_handler: Optional[NonBlockingQueueHandler] = None
+_listener: Optional[QueueListener] = None
+
+
+def configure_logging(
+    stream=None,
+    level: str = LOG_LEVEL,
+    levels: Dict[str, str] = LOG_LEVELS,
+    sampling: Dict[str, float] = LOG_SAMPLING,
+    queue_size: int = LOG_QUEUE_SIZE,
+) -> NonBlockingQueueHandler:
+    """
+    Send all logging through the queue to a JSON writer thread.
+
+    Args:
+        stream: Where lines are written; stdout by default
+        level: Root logger level
+        levels: Per-logger levels
+        sampling: Per-logger fraction of records below WARNING to keep
+        queue_size: Records buffered before dropping
+
+    Returns:
+        The handler installed on the root logger
+    """
+    global _handler, _listener
+    stop_logging()
+
+    writer = logging.StreamHandler(stream or sys.stdout)
+    writer.setFormatter(JsonFormatter())
+    _handler = NonBlockingQueueHandler(queue.Queue(queue_size))
+    _handler.addFilter(SamplingFilter(sampling))
+    _handler.addFilter(ContextFilter())
+    _listener = QueueListener(_handler.queue, writer, respect_handler_level=True)
+
+    root = logging.getLogger()
+    root.handlers = [_handler]
+    root.setLevel(level)
+    for name, logger_level in levels.items():
+        logging.getLogger(name).setLevel(logger_level)
+    _listener.start()
+    return _handler
+
+
+def stop_logging() -> None:
+    """Write out queued records and stop the writer thread"""
+    global _handler, _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    if _handler.dropped:
+        print(f"WARNING: {_handler.dropped} log records dropped, queue full", file=sys.stderr)
+    logging.getLogger().removeHandler(_handler)
+    _handler = _listener = None
+
+
+class RequestIdMiddleware:
+    """ASGI middleware giving each request an ID for its log records"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == REQUEST_ID_HEADER:
+                request_id = value.decode("latin-1")[:64]
+                break
+        request_id = request_id or uuid.uuid4().hex
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (REQUEST_ID_HEADER, request_id.encode("latin-1"))
+                ]
+            await send(message)
+
+        token = request_id_var.set(request_id)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            request_id_var.reset(token)
@@ -0,0 +1,82 @@
+import json
+import base64
+import binascii
+import uuid
+from datetime import datetime
+from typing import Any, List, Sequence, Type
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import tuple_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(*values: Any) -> str:
+    """
+    Encode the sort key of the last row on a page as an opaque cursor.
+
+    Args:
+        values: Sort key values, in the order of the ORDER BY clause
+
+    Returns:
+        URL-safe cursor string
+    """
+    payload = json.dumps(jsonable_encoder(values), separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Sequence[Type]) -> List[Any]:
+    """
+    Decode a cursor produced by encode_cursor.
+
+    Args:
+        cursor: Cursor string from a previous page
+        types: Expected type of each sort key value (datetime, uuid.UUID, str, int)
+
+    Returns:
+        List of sort key values
+
+    Raises:
+        HTTPException: If the cursor is malformed
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        raw = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if not isinstance(raw, list) or len(raw) != len(types):
+            raise ValueError("cursor arity mismatch")
+
+        values = []
+        for value, value_type in zip(raw, types):
+            if value_type is datetime:
+                values.append(datetime.fromisoformat(value))
+            elif value_type is uuid.UUID:
+                values.append(uuid.UUID(value))
+            else:
+                values.append(value_type(value))
+        return values
+    except (ValueError, TypeError, binascii.Error, UnicodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor",
+        )
+
+
+def keyset_after(columns: Sequence[Any], values: Sequence[Any], descending: bool = True):
+    """
+    Build the WHERE clause that continues a keyset-ordered scan.
+
+    Uses a row-value comparison so Postgres can seek straight into a
+    composite index on the same columns.
+
+    Args:
+        columns: Sort key columns
+        values: Sort key of the last row already returned
+        descending: Whether the scan is in descending order
+
+    Returns:
+        SQLAlchemy boolean clause
+    """
+    if descending:
+        return tuple_(*columns) < tuple_(*values)
+    return tuple_(*columns) > tuple_(*values)
@@ -0,0 +1,141 @@
+import io
+import re
+import json
+import hashlib
+from typing import Any, Dict, List, Tuple
+
+# Rendered at 2x a Wallet card's on-screen size
+PREVIEW_WIDTH = 640
+PREVIEW_HEIGHT = 820
+
+DEFAULT_FOREGROUND = "rgb(255, 255, 255)"
+DEFAULT_BACKGROUND = "rgb(60, 90, 150)"
+
+FIELD_GROUPS = ("headerFields", "primaryFields", "secondaryFields", "auxiliaryFields")
+
+_RGB = re.compile(r"rgba?\(\s*(\d+)\s*,\s*(\d+)\s*,\s*(\d+)")
+
+
+def template_hash(template_json: Dict[str, Any]) -> str:
+    """
+    Version of a design's template; a new hash means a new preview.
+
+    Args:
+        template_json: Design template
+
+    Returns:
+        Hex SHA-256 of the canonical JSON
+    """
+    canonical = json.dumps(template_json, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def parse_color(value: Any, default: str) -> Tuple[int, int, int]:
+    """Parse the "rgb(r, g, b)" or "#rrggbb" colors pass.json accepts"""
+    for candidate in (value, default):
+        if not isinstance(candidate, str):
+            continue
+        match = _RGB.match(candidate.strip())
+        if match:
+            return tuple(min(int(part), 255) for part in match.groups())
+        hex_value = candidate.strip().lstrip("#")
+        if len(hex_value) == 6:
+            try:
+                return tuple(int(hex_value[i:i + 2], 16) for i in (0, 2, 4))
+            except ValueError:
+                pass
+    return (0, 0, 0)
+
+
+def _font(size: int):
+    from PIL import ImageFont
+
+    try:
+        return ImageFont.load_default(size=size)
+    except (TypeError, ImportError, OSError):
+        # Pillow without FreeType only has the fixed-size bitmap font
+        return ImageFont.load_default()
+
+
+def _fields(template_json: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    style = template_json.get("style", "generic")
+    section = template_json.get(style) or {}
+    return {
+        group: [field for field in section.get(group, []) if isinstance(field, dict)]
+        for group in FIELD_GROUPS
+    }
+
+
+def render_pass_preview(template_json: Dict[str, Any]) -> bytes:
+    """
+    Draw a preview of the pass a design produces.
+
+    Uses the same template keys as ApplePassSigner: colors, logoText,
+    description and the style's field groups, with a placeholder where the
+    barcode goes. CPU-bound; call it from a worker thread.
+
+    Args:
+        template_json: Design template
+
+    Returns:
+        PNG bytes
+    """
+    from PIL import Image, ImageDraw
+
+    background = parse_color(template_json.get("backgroundColor"), DEFAULT_BACKGROUND)
+    foreground = parse_color(template_json.get("foregroundColor"), DEFAULT_FOREGROUND)
+    label_color = parse_color(template_json.get("labelColor"), template_json.get("foregroundColor") or DEFAULT_FOREGROUND)
+
+    image = Image.new("RGB", (PREVIEW_WIDTH, PREVIEW_HEIGHT), background)
+    draw = ImageDraw.Draw(image)
+    margin = 32
+
+    # Header: logo text left, header fields right
+    draw.text((margin, margin), str(template_json.get("logoText", "PassMint")), fill=foreground, font=_font(36))
+    fields = _fields(template_json)
+    x = PREVIEW_WIDTH - margin
+    for field in reversed(fields["headerFields"][:2]):
+        value = str(field.get("value", ""))
+        label = str(field.get("label", "")).upper()
+        width = max(draw.textlength(value, font=_font(28)), draw.textlength(label, font=_font(18)))
+        x -= width
+        draw.text((x, margin - 4), label, fill=label_color, font=_font(18))
+        draw.text((x, margin + 18), value, fill=foreground, font=_font(28))
+        x -= 24
+
+    # Primary fields large, then secondary and auxiliary rows
+    y = 130
+    for field in fields["primaryFields"][:1]:
+        draw.text((margin, y), str(field.get("label", "")).upper(), fill=label_color, font=_font(22))
+        draw.text((margin, y + 28), str(field.get("value", "")), fill=foreground, font=_font(56))
+        y += 110
+    for group in ("secondaryFields", "auxiliaryFields"):
+        row = fields[group][:4]
+        if not row:
+            continue
+        column_width = (PREVIEW_WIDTH - 2 * margin) / len(row)
+        for index, field in enumerate(row):
+            x = margin + index * column_width
+            draw.text((x, y), str(field.get("label", "")).upper(), fill=label_color, font=_font(18))
+            draw.text((x, y + 24), str(field.get("value", "")), fill=foreground, font=_font(28))
+        y += 80
+
+    # Barcode placeholder, where Wallet draws the QR code
+    size = 260
+    left = (PREVIEW_WIDTH - size) // 2
+    top = PREVIEW_HEIGHT - size - 90
+    draw.rounded_rectangle((left - 16, top - 16, left + size + 16, top + size + 48), radius=12, fill="white")
+    cell = size // 13
+    for row in range(13):
+        for column in range(13):
+            finder = (row < 4 and column < 4) or (row < 4 and column > 8) or (row > 8 and column < 4)
+            if finder or (row * 7 + column * 3) % 5 == 0:
+                draw.rectangle(
+                    (left + column * cell, top + row * cell, left + (column + 1) * cell - 1, top + (row + 1) * cell - 1),
+                    fill="black",
+                )
+    draw.text((left, top + size + 10), "PM-0000000000", fill="black", font=_font(22))
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
@@ -0,0 +1,168 @@
+"""
+Native .pkpass writer.
+
+A pkpass is a ZIP of pass.json, the pass images, manifest.json (the SHA-1 of
+every file) and signature (a detached PKCS#7 signature of the manifest).
+Most of that is identical for every pass of a design, so PKPassTemplate
+compresses each static asset once and keeps its finished ZIP entry; a build
+then only compresses pass.json, writes the manifest, signs it and copies the
+entries into a buffer sized up front.
+
+Entries use a fixed timestamp, so two builds of the same pass differ only in
+the signature.
+"""
+import json
+import struct
+import zlib
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.serialization import pkcs7, pkcs12
+
+# 1980-01-01 00:00:00 in MS-DOS format, the earliest ZIP timestamp
+DOS_TIME = 0
+DOS_DATE = (0 << 9) | (1 << 5) | 1
+
+LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+END_RECORD = struct.Struct("<IHHHHIIH")
+
+STORED = 0
+DEFLATED = 8
+
+# Made by version 2.0 on Unix, so the rw-r--r-- mode is read back
+VERSION_MADE_BY = (3 << 8) | 20
+FILE_ATTRIBUTES = 0o644 << 16
+
+# Already-compressed formats are stored rather than deflated again
+STORED_SUFFIXES = (".png", ".jpg", ".jpeg", ".gif")
+
+
+class ZipEntry:
+    """One finished ZIP member: its local header and data, ready to copy"""
+
+    __slots__ = ("name", "local", "crc", "compressed_size", "size", "method", "sha1")
+
+    def __init__(self, name: str, data: bytes, level: int = 6):
+        encoded_name = name.encode("utf-8")
+        self.name = encoded_name
+        self.sha1 = hashlib.sha1(data).hexdigest()
+        self.crc = zlib.crc32(data) & 0xFFFFFFFF
+        self.size = len(data)
+
+        if name.lower().endswith(STORED_SUFFIXES):
+            self.method = STORED
+            payload = data
+        else:
+            self.method = DEFLATED
+            compressor = zlib.compressobj(level, zlib.DEFLATED, -15)
+            payload = compressor.compress(data) + compressor.flush()
+        self.compressed_size = len(payload)
+
+        self.local = LOCAL_HEADER.pack(
+            0x04034B50, 20, 0, self.method, DOS_TIME, DOS_DATE,
+            self.crc, self.compressed_size, self.size, len(encoded_name), 0,
+        ) + encoded_name + payload
+
+    def central(self, offset: int) -> bytes:
+        return CENTRAL_HEADER.pack(
+            0x02014B50, VERSION_MADE_BY, 20, 0, self.method, DOS_TIME, DOS_DATE,
+            self.crc, self.compressed_size, self.size, len(self.name),
+            0, 0, 0, 0, FILE_ATTRIBUTES, offset,
+        ) + self.name
+
+
+def write_zip(entries: List[ZipEntry]) -> bytearray:
+    """
+    Lay entries out in a ZIP archive, in one preallocated buffer.
+
+    Args:
+        entries: Members in archive order
+
+    Returns:
+        The archive
+    """
+    offsets = []
+    position = 0
+    for entry in entries:
+        offsets.append(position)
+        position += len(entry.local)
+    centrals = [entry.central(offset) for entry, offset in zip(entries, offsets)]
+    central_size = sum(len(central) for central in centrals)
+
+    buffer = bytearray(position + central_size + END_RECORD.size)
+    view = memoryview(buffer)
+    cursor = 0
+    for part in [entry.local for entry in entries] + centrals:
+        view[cursor:cursor + len(part)] = part
+        cursor += len(part)
+    view[cursor:] = END_RECORD.pack(
+        0x06054B50, 0, 0, len(entries), len(entries), central_size, position, 0
+    )
+    return buffer
+
+
+class PKPassSigner:
+    """Signs pkpass manifests with a Pass Type ID certificate"""
+
+    def __init__(self, p12_data: bytes, password: Optional[str] = None):
+        key, certificate, chain = pkcs12.load_key_and_certificates(
+            p12_data, password.encode("utf-8") if password else None
+        )
+        if key is None or certificate is None:
+            raise ValueError("PKCS#12 bundle has no key and certificate")
+        self.key = key
+        self.certificate = certificate
+        # The WWDR intermediate travels in the bundle alongside the pass certificate
+        self.chain = list(chain or [])
+
+    def sign(self, manifest: bytes) -> bytes:
+        """Detached DER PKCS#7 signature of the manifest"""
+        builder = pkcs7.PKCS7SignatureBuilder().set_data(manifest).add_signer(
+            self.certificate, self.key, hashes.SHA256()
+        )
+        for certificate in self.chain:
+            builder = builder.add_certificate(certificate)
+        return builder.sign(
+            serialization.Encoding.DER,
+            [pkcs7.PKCS7Options.DetachedSignature, pkcs7.PKCS7Options.Binary],
+        )
+
+
+class PKPassTemplate:
+    """The static files of a design, compressed once and reused by every build"""
+
+    def __init__(self, assets: Dict[str, bytes]):
+        self.entries = [ZipEntry(name, data) for name, data in sorted(assets.items())]
+        self.hashes = {entry.name.decode("utf-8"): entry.sha1 for entry in self.entries}
+
+    def build(self, pass_json: Dict, signer: PKPassSigner) -> bytearray:
+        """
+        Build a signed pkpass.
+
+        Args:
+            pass_json: The pass.json document
+            signer: Signer for the manifest
+
+        Returns:
+            The .pkpass archive
+        """
+        pass_entry, manifest = self.prepare(pass_json)
+        return self.assemble(pass_entry, manifest, signer.sign(manifest))
+
+    def prepare(self, pass_json: Dict) -> Tuple[ZipEntry, bytes]:
+        """The pass.json entry and the manifest to sign, for signing elsewhere"""
+        pass_entry = ZipEntry("pass.json", json.dumps(pass_json, separators=(",", ":")).encode("utf-8"))
+        return pass_entry, manifest_bytes({"pass.json": pass_entry.sha1, **self.hashes})
+
+    def assemble(self, pass_entry: ZipEntry, manifest: bytes, signature: bytes) -> bytearray:
+        """Zip a prepared pass with its manifest signature"""
+        manifest_entry = ZipEntry("manifest.json", manifest)
+        signature_entry = ZipEntry("signature", signature)
+        return write_zip([pass_entry, *self.entries, manifest_entry, signature_entry])
+
+
+def manifest_bytes(hashes_by_name: Dict[str, str]) -> bytes:
+    return json.dumps(hashes_by_name, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
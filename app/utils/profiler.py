@@ -0,0 +1,272 @@
+"""
+Sampling profiler for slow or randomly chosen requests.
+
+A background thread samples the event loop thread's stack every
+PROFILER_INTERVAL_MS into a ring buffer. When a request finishes, the
+middleware decides whether to keep its profile (a PROFILER_SAMPLE_RATE
+fraction of requests, plus anything slower than PROFILER_SLOW_MS) and, if so,
+writes the samples taken while it was in flight as collapsed stacks
+(`frame;frame;frame count`), ready for flamegraph.pl or speedscope.
+
+The event loop runs many requests at once, so a profile shows everything
+the loop executed during the request, not only that request's code. Time
+spent awaiting I/O does not appear in the samples; compare the sample count
+against the request's duration to tell CPU from waiting.
+
+With both settings at 0 the middleware is not installed and the sampler
+thread never starts.
+"""
+import os
+import logging
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import threading
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import Deque, Dict, List, Optional, Tuple
+
+from ..config import load_env
+
+load_env()
+
+logger = logging.getLogger(__name__)
+
+# Fraction of requests to profile (0 disables)
+PROFILER_SAMPLE_RATE = float(os.getenv("PROFILER_SAMPLE_RATE", "0"))
+
+# Profile every request slower than this many milliseconds (0 disables)
+PROFILER_SLOW_MS = float(os.getenv("PROFILER_SLOW_MS", "0"))
+
+PROFILER_INTERVAL_MS = float(os.getenv("PROFILER_INTERVAL_MS", "5"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/passmint-profiles")
+
+# Oldest profiles are deleted beyond this many
+PROFILE_MAX_FILES = int(os.getenv("PROFILE_MAX_FILES", "500"))
+
+# Samples kept in memory; requests longer than this window lose their start
+PROFILER_BUFFER_SECONDS = 120
+
+
+class StackSampler:
+    """Samples one thread's stack at a fixed interval into a ring buffer"""
+
+    def __init__(self, thread_id: int, interval: float, buffer_seconds: float = PROFILER_BUFFER_SECONDS):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples: Deque[Tuple[float, tuple]] = deque(
+            maxlen=max(1, int(buffer_seconds / interval))
+        )
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            # Keep code objects; formatting is deferred until a profile is written
+            stack = []
+            while frame is not None:
+                stack.append(frame.f_code)
+                frame = frame.f_back
+            self.samples.append((time.perf_counter(), tuple(stack)))
+
+    def collapse(self, start: float, end: float) -> Dict[str, int]:
+        """
+        Fold the samples taken between start and end into collapsed stacks.
+
+        Args:
+            start: perf_counter() when the window opened
+            end: perf_counter() when the window closed
+
+        Returns:
+            Mapping of "root;...;leaf" to sample count
+        """
+        counts: Counter = Counter()
+        for taken_at, stack in list(self.samples):
+            if start <= taken_at <= end:
+                counts[stack] += 1
+        return {
+            ";".join(_frame_name(code) for code in reversed(stack)): count
+            for stack, count in counts.items()
+        }
+
+
+def _frame_name(code) -> str:
+    filename = code.co_filename
+    for marker in ("site-packages/", "lib/python"):
+        if marker in filename:
+            filename = filename.split(marker, 1)[1]
+            break
+    else:
+        filename = os.path.relpath(filename) if os.path.isabs(filename) else filename
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class ProfileStore:
+    """
+    Profiles on disk: `<id>.folded` stacks plus `<id>.json` metadata.
+
+    Disk I/O runs in a worker thread, off the event loop.
+    """
+
+    def __init__(self, directory: str, max_files: int = PROFILE_MAX_FILES):
+        self.directory = directory
+        self.max_files = max_files
+
+    async def save(self, stacks: Dict[str, int], metadata: Dict) -> str:
+        return await asyncio.to_thread(self._save, stacks, metadata)
+
+    def _save(self, stacks: Dict[str, int], metadata: Dict) -> str:
+        os.makedirs(self.directory, exist_ok=True)
+        profile_id = f"{datetime.now(timezone.utc):%Y%m%dT%H%M%S}-{uuid.uuid4().hex[:8]}"
+        metadata = {"id": profile_id, **metadata}
+
+        with open(os.path.join(self.directory, f"{profile_id}.folded"), "w") as f:
+            for stack, count in stacks.items():
+                f.write(f"{stack} {count}\n")
+        with open(os.path.join(self.directory, f"{profile_id}.json"), "w") as f:
+            json.dump(metadata, f)
+
+        self._prune()
+        return profile_id
+
+    def _prune(self) -> None:
+        entries = sorted(name for name in os.listdir(self.directory) if name.endswith(".json"))
+        for name in entries[:-self.max_files]:
+            for suffix in (".json", ".folded"):
+                try:
+                    os.remove(os.path.join(self.directory, name[:-5] + suffix))
+                except FileNotFoundError:
+                    pass
+
+    async def list(self) -> List[Dict]:
+        return await asyncio.to_thread(self._list)
+
+    def _list(self) -> List[Dict]:
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for name in sorted(os.listdir(self.directory), reverse=True):
+            if name.endswith(".json"):
+                with open(os.path.join(self.directory, name)) as f:
+                    profiles.append(json.load(f))
+        return profiles
+
+    def path(self, profile_id: str) -> Optional[str]:
+        # Profile IDs are generated here; refuse anything that could escape the directory
+        if not profile_id or "/" in profile_id or profile_id.startswith("."):
+            return None
+        path = os.path.join(self.directory, f"{profile_id}.folded")
+        return path if os.path.isfile(path) else None
+
+
+def _org_from_headers(headers: Dict[bytes, bytes]) -> Optional[str]:
+    """Best-effort caller ID from the bearer token, for profile metadata"""
+    from .auth import decode_jwt_token
+
+    scheme, _, token = headers.get(b"authorization", b"").decode("latin-1").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        payload = decode_jwt_token(token)
+    except Exception:
+        return None
+    return payload.get("sub") if payload.get("user_type") == "org" else None
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware keeping profiles of sampled and slow requests.
+
+    Install only when profiling is enabled; see profiling_enabled().
+    """
+
+    def __init__(
+        self,
+        app,
+        sample_rate: float = PROFILER_SAMPLE_RATE,
+        slow_ms: float = PROFILER_SLOW_MS,
+        interval_ms: float = PROFILER_INTERVAL_MS,
+        store: Optional[ProfileStore] = None,
+    ):
+        self.app = app
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.interval = interval_ms / 1000
+        self.store = store or profile_store
+        self.sampler: Optional[StackSampler] = None
+
+    def _ensure_sampler(self) -> StackSampler:
+        # Started on the first request, from the event loop thread it samples
+        if self.sampler is None:
+            self.sampler = StackSampler(threading.get_ident(), self.interval)
+            self.sampler.start()
+        return self.sampler
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        sampler = self._ensure_sampler()
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            finished = time.perf_counter()
+            duration_ms = (finished - started) * 1000
+
+            reason = None
+            if self.slow_ms and duration_ms >= self.slow_ms:
+                reason = "slow"
+            elif self.sample_rate and random.random() < self.sample_rate:
+                reason = "sampled"
+
+            if reason:
+                await self._save(scope, sampler, started, finished, duration_ms, status_code, reason)
+
+    async def _save(self, scope, sampler, started, finished, duration_ms, status_code, reason) -> None:
+        try:
+            stacks = await asyncio.to_thread(sampler.collapse, started, finished)
+            route = scope.get("route")
+            await self.store.save(stacks, {
+                "method": scope.get("method"),
+                "path": scope.get("path"),
+                "route": getattr(route, "path", None),
+                "org_id": _org_from_headers(dict(scope.get("headers") or [])),
+                "status": status_code,
+                "duration_ms": round(duration_ms, 1),
+                "samples": sum(stacks.values()),
+                "interval_ms": sampler.interval * 1000,
+                "reason": reason,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+            })
+        except Exception:
+            logger.exception("Error saving request profile")
+
+
+def profiling_enabled() -> bool:
+    return PROFILER_SAMPLE_RATE > 0 or PROFILER_SLOW_MS > 0
+
+
+# Create a singleton instance
+profile_store = ProfileStore(PROFILE_DIR)
@@ -0,0 +1,337 @@
+"""
+QR rendering and print-sheet encoders for batch output.
+
+The render_* functions run in worker processes, so this module imports
+nothing from the app and only pulls in qrcode when a worker first renders.
+"""
+import struct
+import zlib
+import zipfile
+from typing import Iterable, List, Sequence, Tuple
+
+# A4 portrait in PDF points
+PAGE_WIDTH = 595
+PAGE_HEIGHT = 842
+PAGE_MARGIN = 36
+LABEL_FONT_SIZE = 8
+
+
+def qr_matrix(data: str, border: int = 4) -> List[List[bool]]:
+    """
+    Compute the module matrix of a QR code, quiet zone included.
+
+    Args:
+        data: Text to encode
+        border: Quiet zone width in modules
+
+    Returns:
+        Rows of modules; True is dark
+    """
+    import qrcode
+
+    qr = qrcode.QRCode(
+        error_correction=qrcode.constants.ERROR_CORRECT_M,
+        border=border,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+    return qr.get_matrix()
+
+
+def _pack_row(row: Sequence[bool], scale: int = 1) -> bytes:
+    """Pack modules into 1-bit grayscale, MSB first; dark modules are 0 (black)"""
+    bits = 0
+    length = 0
+    out = bytearray()
+    for dark in row:
+        for _ in range(scale):
+            bits = (bits << 1) | (0 if dark else 1)
+            length += 1
+            if length == 8:
+                out.append(bits)
+                bits = 0
+                length = 0
+    if length:
+        out.append(((bits << (8 - length)) | ((1 << (8 - length)) - 1)) & 0xFF)
+    return bytes(out)
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return (
+        struct.pack(">I", len(data)) + kind + data
+        + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+    )
+
+
+def matrix_to_png(matrix: List[List[bool]], box_size: int) -> bytes:
+    """Encode a module matrix as a 1-bit grayscale PNG, box_size pixels per module"""
+    size = len(matrix) * box_size
+    raw = bytearray()
+    for row in matrix:
+        line = b"\x00" + _pack_row(row, box_size)
+        raw += line * box_size
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + _png_chunk(b"IHDR", struct.pack(">IIBBBBB", size, size, 1, 0, 0, 0, 0))
+        + _png_chunk(b"IDAT", zlib.compress(bytes(raw), 9))
+        + _png_chunk(b"IEND", b"")
+    )
+
+
+def matrix_to_svg(matrix: List[List[bool]], box_size: int) -> bytes:
+    """Encode a module matrix as an SVG path, box_size user units per module"""
+    size = len(matrix)
+    path = "".join(
+        f"M{x},{y}h1v1h-1z"
+        for y, row in enumerate(matrix)
+        for x, dark in enumerate(row)
+        if dark
+    )
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{size * box_size}" '
+        f'height="{size * box_size}" viewBox="0 0 {size} {size}" shape-rendering="crispEdges">'
+        f'<rect width="{size}" height="{size}" fill="#fff"/><path d="{path}" fill="#000"/></svg>'
+    ).encode("utf-8")
+
+
+def render_chunk(items: List[Tuple[str, str]], image_format: str, box_size: int) -> List[Tuple[str, bytes, int]]:
+    """
+    Render a chunk of QR codes; the process pool's unit of work.
+
+    Args:
+        items: (label, data) pairs
+        image_format: "png", "svg", or "raw" (1-bit rows, deflated, for PDF sheets)
+        box_size: Pixels (or units) per module
+
+    Returns:
+        (label, encoded image, modules per side) for each item, in order
+    """
+    rendered = []
+    for label, data in items:
+        matrix = qr_matrix(data)
+        if image_format == "png":
+            image = matrix_to_png(matrix, box_size)
+        elif image_format == "svg":
+            image = matrix_to_svg(matrix, box_size)
+        else:
+            image = zlib.compress(b"".join(_pack_row(row) for row in matrix), 6)
+        rendered.append((label, image, len(matrix)))
+    return rendered
+
+
+def _pdf_string(text: str) -> str:
+    text = text.encode("latin-1", "replace").decode("latin-1")
+    return "(" + text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") + ")"
+
+
+class PDFSheetWriter:
+    """
+    Writes a multi-page PDF of labelled QR codes incrementally.
+
+    Every object is emitted as soon as its page is complete, so the document
+    can be streamed; the page tree, catalog and cross-reference table are
+    written by close().
+    """
+
+    CATALOG_ID = 1
+    PAGES_ID = 2
+    FONT_ID = 3
+
+    def __init__(self, columns: int = 3, rows: int = 4):
+        self.columns = columns
+        self.rows = rows
+        self._offsets = {}
+        self._position = 0
+        self._next_id = 4
+        self._page_ids: List[int] = []
+        self._pending: List[Tuple[str, bytes, int]] = []
+
+    def _object(self, object_id: int, body: bytes) -> bytes:
+        data = f"{object_id} 0 obj\n".encode("latin-1") + body + b"\nendobj\n"
+        self._offsets[object_id] = self._position
+        self._position += len(data)
+        return data
+
+    def _allocate(self) -> int:
+        object_id = self._next_id
+        self._next_id += 1
+        return object_id
+
+    def _emit(self, data: bytes) -> bytes:
+        self._position += len(data)
+        return data
+
+    def open(self) -> bytes:
+        header = self._emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        font = self._object(
+            self.FONT_ID, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"
+        )
+        return header + font
+
+    def add(self, rendered: Iterable[Tuple[str, bytes, int]]) -> bytes:
+        """
+        Queue rendered codes and return the bytes of any pages they complete.
+
+        Args:
+            rendered: (label, deflated 1-bit rows, modules per side) from render_chunk
+
+        Returns:
+            PDF bytes to append to the stream (possibly empty)
+        """
+        self._pending.extend(rendered)
+        per_page = self.columns * self.rows
+        out = []
+        while len(self._pending) >= per_page:
+            page, self._pending = self._pending[:per_page], self._pending[per_page:]
+            out.append(self._page(page))
+        return b"".join(out)
+
+    def _page(self, codes: List[Tuple[str, bytes, int]]) -> bytes:
+        out = []
+        cell_width = (PAGE_WIDTH - 2 * PAGE_MARGIN) / self.columns
+        cell_height = (PAGE_HEIGHT - 2 * PAGE_MARGIN) / self.rows
+        side = min(cell_width, cell_height - LABEL_FONT_SIZE * 2) * 0.9
+
+        images = []
+        content = []
+        for index, (label, data, modules) in enumerate(codes):
+            image_id = self._allocate()
+            out.append(self._object(
+                image_id,
+                (
+                    f"<< /Type /XObject /Subtype /Image /Width {modules} /Height {modules} "
+                    f"/ColorSpace /DeviceGray /BitsPerComponent 1 /Interpolate false "
+                    f"/Filter /FlateDecode /Length {len(data)} >>\nstream\n"
+                ).encode("latin-1") + data + b"\nendstream",
+            ))
+            name = f"Q{index}"
+            images.append(f"/{name} {image_id} 0 R")
+
+            column, row = index % self.columns, index // self.columns
+            x = PAGE_MARGIN + column * cell_width + (cell_width - side) / 2
+            top = PAGE_HEIGHT - PAGE_MARGIN - row * cell_height
+            y = top - side
+            content.append(f"q {side:.2f} 0 0 {side:.2f} {x:.2f} {y:.2f} cm /{name} Do Q")
+            content.append(
+                f"BT /F1 {LABEL_FONT_SIZE} Tf {x:.2f} {y - LABEL_FONT_SIZE * 1.5:.2f} Td "
+                f"{_pdf_string(label)} Tj ET"
+            )
+
+        stream = zlib.compress("\n".join(content).encode("latin-1"))
+        content_id = self._allocate()
+        out.append(self._object(
+            content_id,
+            f"<< /Length {len(stream)} /Filter /FlateDecode >>\nstream\n".encode("latin-1")
+            + stream + b"\nendstream",
+        ))
+
+        page_id = self._allocate()
+        self._page_ids.append(page_id)
+        out.append(self._object(
+            page_id,
+            (
+                f"<< /Type /Page /Parent {self.PAGES_ID} 0 R "
+                f"/MediaBox [0 0 {PAGE_WIDTH} {PAGE_HEIGHT}] "
+                f"/Resources << /Font << /F1 {self.FONT_ID} 0 R >> "
+                f"/XObject << {' '.join(images)} >> >> "
+                f"/Contents {content_id} 0 R >>"
+            ).encode("latin-1"),
+        ))
+        return b"".join(out)
+
+    def close(self) -> bytes:
+        """Flush the last partial page and write the trailer"""
+        out = []
+        if self._pending or not self._page_ids:
+            out.append(self._page(self._pending))
+            self._pending = []
+
+        kids = " ".join(f"{page_id} 0 R" for page_id in self._page_ids)
+        out.append(self._object(
+            self.PAGES_ID,
+            f"<< /Type /Pages /Kids [{kids}] /Count {len(self._page_ids)} >>".encode("latin-1"),
+        ))
+        out.append(self._object(
+            self.CATALOG_ID, f"<< /Type /Catalog /Pages {self.PAGES_ID} 0 R >>".encode("latin-1")
+        ))
+
+        xref_offset = self._position
+        lines = [f"xref\n0 {self._next_id}\n", "0000000000 65535 f \n"]
+        for object_id in range(1, self._next_id):
+            lines.append(f"{self._offsets[object_id]:010d} 00000 n \n")
+        lines.append(
+            f"trailer\n<< /Size {self._next_id} /Root {self.CATALOG_ID} 0 R >>\n"
+            f"startxref\n{xref_offset}\n%%EOF\n"
+        )
+        out.append(self._emit("".join(lines).encode("latin-1")))
+        return b"".join(out)
+
+
+class _ZipSink:
+    """Write-only file object that hands back what zipfile wrote so far"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data, self._chunks = b"".join(self._chunks), []
+        return data
+
+
+class ZipSheetWriter:
+    """Streams rendered QR images into a ZIP archive, one entry per code"""
+
+    def __init__(self, extension: str):
+        self.extension = extension
+        self._sink = _ZipSink()
+        # No tell() on the sink, so zipfile writes data descriptors and never seeks
+        self._zip = zipfile.ZipFile(self._sink, "w", compression=zipfile.ZIP_STORED)
+        self._names = set()
+
+    def open(self) -> bytes:
+        return b""
+
+    def add(self, rendered: Iterable[Tuple[str, bytes, int]]) -> bytes:
+        for label, image, _ in rendered:
+            name = _safe_name(label)
+            while f"{name}.{self.extension}" in self._names:
+                name += "_"
+            filename = f"{name}.{self.extension}"
+            self._names.add(filename)
+            # PNG is already deflated; SVG text is small per file
+            self._zip.writestr(filename, image)
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        self._zip.close()
+        return self._sink.drain()
+
+
+def _safe_name(label: str) -> str:
+    return "".join(c if c.isalnum() or c in "-_" else "_" for c in label) or "qr"
+
+
+def sheet_writer(output: str, image_format: str, columns: int = 3, rows: int = 4):
+    """
+    Build the writer for a batch output.
+
+    Args:
+        output: "pdf" or "zip"
+        image_format: "png" or "svg" (ZIP only)
+        columns: Codes per row on a PDF page
+        rows: Rows per PDF page
+
+    Returns:
+        A writer with open(), add(rendered) and close(), each returning bytes
+    """
+    if output == "pdf":
+        return PDFSheetWriter(columns, rows)
+    return ZipSheetWriter(image_format)
+
@@ -1,4 +1,3 @@
-import qrcode
 import io
 import base64
 from typing import Optional
@@ -18,6 +17,9 @@ def generate_qr_png_base64(
     Returns:
         Base64-encoded PNG as data URL
     """
+    # Deferred: qrcode pulls in PIL, which is slow to import
+    import qrcode
+
     qr = qrcode.QRCode(
         version=1,
         error_correction=qrcode.constants.ERROR_CORRECT_L,
@@ -36,4 +38,9 @@ def generate_qr_png_base64(
     
     # Encode as base64 data URL
     encoded = base64.b64encode(img_bytes).decode("ascii")
-    return f"data:image/png;base64,{encoded}"
\ No newline at end of file
+    return f"data:image/png;base64,{encoded}"
+
+
+def warm_qrcode() -> None:
+    """Import qrcode and PIL and render one code, so the first request doesn't"""
+    generate_qr_png_base64("https://passmint.example.com")
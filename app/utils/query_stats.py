@@ -0,0 +1,154 @@
+"""
+Per-request SQL instrumentation.
+
+Engine events record every statement run inside a record_queries() block:
+its SQL, row count and time spent in the database. QueryStatsMiddleware
+opens a block per request and reports it according to QUERY_STATS:
+
+    header  adds `X-DB-Queries: 3; rows=41; time=5.2ms` to the response
+    log     logs a record per request, with every statement
+    both    does both
+
+Tests use query_budget() to fail when an endpoint starts making more round
+trips than it should.
+"""
+import os
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from ..config import load_env
+
+load_env()
+
+logger = logging.getLogger(__name__)
+
+# "header", "log" or "both"; empty disables the middleware
+QUERY_STATS = os.getenv("QUERY_STATS", "").lower()
+
+QUERY_STATS_HEADER = b"x-db-queries"
+
+
+class QueryStats:
+    """Statements run during a block; nested blocks also count toward their parents"""
+
+    def __init__(self, parent: Optional["QueryStats"] = None):
+        self.parent = parent
+        self.statements: List[Tuple[str, int, float]] = []  # (sql, rows, ms)
+
+    def record(self, statement: str, rows: int, elapsed_ms: float) -> None:
+        stats = self
+        while stats is not None:
+            stats.statements.append((statement, rows, elapsed_ms))
+            stats = stats.parent
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @property
+    def rows(self) -> int:
+        # Drivers report -1 when they don't know
+        return sum(rows for _, rows, _ in self.statements if rows > 0)
+
+    @property
+    def db_ms(self) -> float:
+        return sum(elapsed for _, _, elapsed in self.statements)
+
+    def summary(self) -> str:
+        return f"{self.count}; rows={self.rows}; time={self.db_ms:.1f}ms"
+
+
+_current: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def record_queries():
+    """Record the statements run in this block, in this task and tasks it starts"""
+    stats = QueryStats(_current.get())
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def query_budget(max_queries: int):
+    """
+    Fail a test if the block runs more than max_queries statements.
+
+    Usage:
+        with query_budget(1):
+            response = await client.get(f"/api/passes/{pass_id}", headers=auth)
+    """
+    with record_queries() as stats:
+        yield stats
+    if stats.count > max_queries:
+        listing = "\n".join(f"  {sql.strip()}" for sql, _, _ in stats.statements)
+        raise AssertionError(
+            f"{stats.count} queries, budget is {max_queries}:\n{listing}"
+        )
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = conn.info.get("query_started")
+    if stats is None or not started:
+        return
+    elapsed_ms = (time.perf_counter() - started.pop()) * 1000
+    stats.record(statement, getattr(cursor, "rowcount", -1), elapsed_ms)
+
+
+class QueryStatsMiddleware:
+    """ASGI middleware reporting each request's queries; see QUERY_STATS"""
+
+    def __init__(self, app, mode: str = QUERY_STATS):
+        self.app = app
+        self.header = mode in ("header", "both")
+        self.log = mode in ("log", "both")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with record_queries() as stats:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start" and self.header:
+                    message.setdefault("headers", [])
+                    message["headers"] = list(message["headers"]) + [
+                        (QUERY_STATS_HEADER, stats.summary().encode("latin-1"))
+                    ]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                if self.log:
+                    logger.info(
+                        "DB %s %s: %s", scope.get("method"), scope.get("path"), stats.summary(),
+                        extra={
+                            "queries": stats.count,
+                            "db_ms": round(stats.db_ms, 1),
+                            "statements": [
+                                {"sql": " ".join(statement.split())[:200], "rows": rows, "ms": round(elapsed_ms, 1)}
+                                for statement, rows, elapsed_ms in stats.statements
+                            ],
+                        },
+                    )
+
+
+def query_stats_enabled() -> bool:
+    return QUERY_STATS in ("header", "log", "both")
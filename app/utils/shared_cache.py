@@ -0,0 +1,230 @@
+"""
+Host-wide cache shared by every worker process.
+
+gunicorn runs several workers per host; per-process caches are filled once
+per worker and hold the same entries several times over. This cache is a
+SQLite file that every worker opens (under /dev/shm when available, so it
+never touches disk), read through a shared memory map. Entries carry a
+version: a reader asking for another version misses, so bumping the version
+a value is built from invalidates it everywhere. The file is kept under
+SHARED_CACHE_MAX_BYTES by evicting the least recently used entries; triggers
+keep a running total of entry sizes so checking it never scans the table.
+
+Lookups run in a worker thread, where the file is opened (PRAGMAs, schema)
+on first use, so neither blocks the event loop. Writes (stores, deletes, LRU
+touches) are queued to a writer thread per process, so callers never wait on
+SQLite's write lock; a store is visible to other workers
+shortly after set() returns, and dropped if the queue is full.
+
+Set SHARED_CACHE_PATH to an empty string to disable it; lookups then always
+miss and callers compute values as before.
+"""
+import os
+import queue
+import asyncio
+import logging
+import time
+import sqlite3
+import tempfile
+import threading
+from typing import Callable, Optional
+
+from ..config import load_env
+
+load_env()
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+SHARED_CACHE_PATH = os.getenv("SHARED_CACHE_PATH", os.path.join(_DEFAULT_DIR, "passmint-cache.sqlite"))
+SHARED_CACHE_MAX_BYTES = int(os.getenv("SHARED_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+# Reads refresh an entry's LRU position at most this often, to keep them read-only
+ACCESS_RESOLUTION = 10.0
+
+# Writes waiting for the writer thread; more are dropped
+WRITE_QUEUE_SIZE = 1000
+
+_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS entries (
+        key TEXT PRIMARY KEY,
+        version TEXT NOT NULL,
+        value BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        stored_at REAL NOT NULL,
+        accessed_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS ix_entries_accessed_at ON entries (accessed_at);
+
+    CREATE TABLE IF NOT EXISTS stats (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        total_size INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO stats (id, total_size) SELECT 1, COALESCE(SUM(size), 0) FROM entries;
+    CREATE TRIGGER IF NOT EXISTS entries_inserted AFTER INSERT ON entries BEGIN
+        UPDATE stats SET total_size = total_size + NEW.size WHERE id = 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS entries_updated AFTER UPDATE OF size ON entries BEGIN
+        UPDATE stats SET total_size = total_size + NEW.size - OLD.size WHERE id = 1;
+    END;
+    CREATE TRIGGER IF NOT EXISTS entries_deleted AFTER DELETE ON entries BEGIN
+        UPDATE stats SET total_size = total_size - OLD.size WHERE id = 1;
+    END;
+"""
+
+
+class SharedCache:
+    def __init__(self, path: str, max_bytes: int = SHARED_CACHE_MAX_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._disabled = not path
+        self._writes: queue.Queue = queue.Queue(WRITE_QUEUE_SIZE)
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        # SQLite connections can't be shared across threads; one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is not None or self._disabled:
+            return conn
+        try:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(f"PRAGMA mmap_size={self.max_bytes * 2}")
+            conn.executescript(_SCHEMA)
+        except sqlite3.Error as e:
+            logger.warning("Shared cache disabled, %s unusable: %s", self.path, e)
+            self._disabled = True
+            return None
+        self._local.conn = conn
+        return conn
+
+    async def get(self, key: str, version: str = "", max_age: Optional[float] = None) -> Optional[bytes]:
+        """
+        Look up a value stored by any worker.
+
+        Args:
+            key: Cache key
+            version: Version the caller expects; other versions miss
+            max_age: Seconds after which an entry misses
+
+        Returns:
+            The value, or None on a miss
+        """
+        if self._disabled:
+            return None
+        return await asyncio.to_thread(self._get, key, version, max_age)
+
+    def _get(self, key: str, version: str, max_age: Optional[float]) -> Optional[bytes]:
+        conn = self._connect()
+        if conn is None:
+            return None
+        try:
+            row = conn.execute(
+                "SELECT version, value, stored_at, accessed_at FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or row[0] != version:
+                return None
+            now = time.time()
+            if max_age is not None and now - row[2] > max_age:
+                return None
+            if now - row[3] > ACCESS_RESOLUTION:
+                self._enqueue(_touch, key, now)
+            return row[1]
+        except sqlite3.Error as e:
+            logger.warning("Error reading shared cache: %s", e)
+            return None
+
+    def _enqueue(self, write: Callable, *args) -> None:
+        if self._writer is None:
+            with self._writer_lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(target=self._write_loop, name="shared-cache-writer", daemon=True)
+                    self._writer.start()
+        try:
+            self._writes.put_nowait((write, args))
+        except queue.Full:
+            # The writer is behind; skip rather than block the caller
+            pass
+
+    def _write_loop(self) -> None:
+        while True:
+            write, args = self._writes.get()
+            try:
+                conn = self._connect()
+                if conn is not None:
+                    write(self, conn, *args)
+            except sqlite3.Error as e:
+                # Another worker holding the write lock past the timeout; skip it
+                logger.warning("Error writing shared cache: %s", e)
+            finally:
+                self._writes.task_done()
+
+    def flush(self) -> None:
+        """Wait until queued writes are applied"""
+        if self._writer is not None:
+            self._writes.join()
+
+    def set(self, key: str, value: bytes, version: str = "") -> None:
+        """
+        Queue a value to be stored for every worker, evicting old entries if over the limit.
+
+        Args:
+            key: Cache key
+            value: Value to store
+            version: Version the value was built from
+        """
+        if self._disabled or len(value) > self.max_bytes:
+            return
+        self._enqueue(_store, key, value, version, time.time())
+
+    def _evict(self, conn: sqlite3.Connection, excess: int) -> None:
+        """Delete least recently used entries until `excess` bytes are freed"""
+        freed = 0
+        keys = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed_at"):
+            keys.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM entries WHERE key = ?", keys)
+
+    def delete(self, key: str) -> None:
+        if not self._disabled:
+            self._enqueue(_delete, key)
+
+    def clear(self) -> None:
+        if not self._disabled:
+            self._enqueue(_clear)
+
+
+def _store(cache: SharedCache, conn: sqlite3.Connection, key: str, value: bytes, version: str, now: float) -> None:
+    # An upsert, not INSERT OR REPLACE: REPLACE's implicit delete skips the size triggers
+    conn.execute(
+        "INSERT INTO entries (key, version, value, size, stored_at, accessed_at) "
+        "VALUES (?, ?, ?, ?, ?, ?) "
+        "ON CONFLICT (key) DO UPDATE SET version = excluded.version, value = excluded.value, "
+        "size = excluded.size, stored_at = excluded.stored_at, accessed_at = excluded.accessed_at",
+        (key, version, value, len(value), now, now),
+    )
+    total = conn.execute("SELECT total_size FROM stats WHERE id = 1").fetchone()[0]
+    if total > cache.max_bytes:
+        cache._evict(conn, total - int(cache.max_bytes * 0.9))
+
+
+def _touch(cache: SharedCache, conn: sqlite3.Connection, key: str, now: float) -> None:
+    conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (now, key))
+
+
+def _delete(cache: SharedCache, conn: sqlite3.Connection, key: str) -> None:
+    conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+
+def _clear(cache: SharedCache, conn: sqlite3.Connection) -> None:
+    conn.execute("DELETE FROM entries")
+
+
+# Create a singleton instance
+shared_cache = SharedCache(SHARED_CACHE_PATH)
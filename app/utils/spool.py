@@ -0,0 +1,274 @@
+"""
+Write-behind spool for object storage uploads.
+
+With STORAGE_WRITE_BEHIND on, a signed pass is written to SPOOL_DIR and
+fsynced, and issuance responds without waiting for S3. Background uploaders
+drain the spool, SPOOL_UPLOAD_CONCURRENCY at a time, retrying failures with
+backoff; a file is deleted only once its upload succeeded. Until then it is
+served from the spool.
+
+Workers on a host share the directory. Each file is locked while it is
+uploaded, so a file is only uploaded by one worker at a time, and every
+worker re-queues whatever it finds in the spool when it starts, so files
+left by a crash or restart are uploaded then.
+"""
+import os
+import logging
+import json
+import fcntl
+import time
+import random
+import asyncio
+from io import BytesIO
+from typing import Optional, Set
+from urllib.parse import quote, unquote
+
+from ..config import load_env
+from .storage import storage
+
+load_env()
+
+logger = logging.getLogger(__name__)
+
+STORAGE_WRITE_BEHIND = os.getenv("STORAGE_WRITE_BEHIND", "false").lower() == "true"
+SPOOL_DIR = os.getenv("SPOOL_DIR", "/var/spool/passmint")
+SPOOL_UPLOAD_CONCURRENCY = int(os.getenv("SPOOL_UPLOAD_CONCURRENCY", "8"))
+
+# Seconds shutdown waits for the spool to drain; the rest is uploaded on the next start
+SPOOL_DRAIN_TIMEOUT = float(os.getenv("SPOOL_DRAIN_TIMEOUT", "10"))
+
+# Retry backoff bounds in seconds
+RETRY_BASE = 1.0
+RETRY_MAX = 300.0
+
+# Partial writes older than this are from a process that died mid-write
+STALE_TMP_SECONDS = 60
+
+META_SUFFIX = ".meta"
+TMP_SUFFIX = ".tmp"
+
+# Returned by UploadSpool._open_locked for a file another worker is uploading
+_BUSY = object()
+
+
+def _fsync_dir(path: str) -> None:
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class UploadSpool:
+    def __init__(self, directory: str, enabled: bool, concurrency: int = SPOOL_UPLOAD_CONCURRENCY):
+        self.directory = directory
+        self.enabled = enabled
+        self.concurrency = concurrency
+        self.upload = storage.upload_file
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers = []
+        self._queued: Set[str] = set()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, quote(key, safe=""))
+
+    def _write(self, key: str, data: bytes, content_type: Optional[str]) -> None:
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        # Metadata first: a data file is only ever visible with its metadata
+        for target, content in (
+            (path + META_SUFFIX, json.dumps({"content_type": content_type}).encode("utf-8")),
+            (path, data),
+        ):
+            tmp = target + TMP_SUFFIX
+            with open(tmp, "wb") as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, target)
+        _fsync_dir(self.directory)
+
+    async def put(self, key: str, data: bytes, content_type: Optional[str] = None) -> None:
+        """
+        Persist a file locally and queue it for upload.
+
+        Args:
+            key: Storage key the file is uploaded under
+            data: File content
+            content_type: Optional content type
+        """
+        await asyncio.to_thread(self._write, key, data, content_type)
+        self._enqueue(key)
+
+    def _read(self, key: str) -> Optional[bytes]:
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    async def read(self, key: str) -> Optional[bytes]:
+        """
+        Read a file that has not been uploaded yet.
+
+        Returns:
+            The content, or None if it is not in the spool
+        """
+        if not self.enabled:
+            return None
+        return await asyncio.to_thread(self._read, key)
+
+    def _enqueue(self, key: str) -> None:
+        self._start()
+        if key not in self._queued:
+            self._queued.add(key)
+            self._queue.put_nowait((key, 0))
+
+    def _start(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._workers = [
+                asyncio.create_task(self._worker()) for _ in range(self.concurrency)
+            ]
+
+    async def _worker(self) -> None:
+        while True:
+            key, attempt = await self._queue.get()
+            try:
+                done = await self._upload(key)
+            except Exception as e:
+                delay = min(RETRY_MAX, RETRY_BASE * 2 ** attempt) * random.uniform(0.5, 1.0)
+                logger.warning(
+                    "Error uploading spooled file, retrying in %.0fs: %s", delay, e,
+                    extra={"key": key, "attempt": attempt + 1},
+                )
+                asyncio.get_running_loop().call_later(
+                    delay, self._queue.put_nowait, (key, attempt + 1)
+                )
+                continue
+            finally:
+                self._queue.task_done()
+            if done:
+                self._queued.discard(key)
+
+    def _open_locked(self, key: str):
+        """
+        Open and lock a spooled file, and read it with its metadata.
+
+        Returns:
+            (fd, data, content_type) with the lock held on fd; None if the
+            file is gone, or _BUSY if another worker holds the lock
+        """
+        path = self._path(key)
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                return _BUSY
+            # Deleted by the worker that held the lock before us
+            if not os.path.exists(path):
+                os.close(fd)
+                return None
+
+            with os.fdopen(os.dup(fd), "rb") as f:
+                data = f.read()
+            try:
+                with open(path + META_SUFFIX) as f:
+                    content_type = json.load(f).get("content_type")
+            except (FileNotFoundError, ValueError):
+                content_type = None
+        except BaseException:
+            os.close(fd)
+            raise
+        return fd, data, content_type
+
+    def _remove(self, key: str) -> None:
+        path = self._path(key)
+        os.unlink(path)
+        try:
+            os.unlink(path + META_SUFFIX)
+        except FileNotFoundError:
+            pass
+
+    async def _upload(self, key: str) -> bool:
+        """
+        Upload one spooled file and delete it.
+
+        File access runs in worker threads; the lock is held across the upload.
+
+        Returns:
+            False if another worker is uploading it
+        """
+        opened = await asyncio.to_thread(self._open_locked, key)
+        if opened is None:
+            return True
+        if opened is _BUSY:
+            # Another worker is uploading it and will delete it
+            self._queued.discard(key)
+            return False
+
+        fd, data, content_type = opened
+        try:
+            await self.upload(BytesIO(data), key, content_type=content_type)
+            await asyncio.to_thread(self._remove, key)
+            return True
+        finally:
+            os.close(fd)
+
+    def _pending(self):
+        if not os.path.isdir(self.directory):
+            return []
+        keys = []
+        for name in os.listdir(self.directory):
+            if name.endswith(TMP_SUFFIX):
+                # Interrupted mid-write and never acknowledged to a caller;
+                # recent ones may still be being written by a sibling worker
+                path = os.path.join(self.directory, name)
+                try:
+                    if time.time() - os.path.getmtime(path) > STALE_TMP_SECONDS:
+                        os.unlink(path)
+                except FileNotFoundError:
+                    pass
+            elif not name.endswith(META_SUFFIX):
+                keys.append(unquote(name))
+        return keys
+
+    async def recover(self) -> int:
+        """
+        Queue every file left in the spool, e.g. by a previous process.
+
+        Returns:
+            Number of files queued
+        """
+        if not self.enabled:
+            return 0
+        keys = await asyncio.to_thread(self._pending)
+        for key in keys:
+            self._enqueue(key)
+        return len(keys)
+
+    async def close(self, timeout: float = SPOOL_DRAIN_TIMEOUT) -> None:
+        """Give queued uploads a moment to finish, then stop the uploaders"""
+        if self._queue is None:
+            return
+        # Queued keys include those waiting out a retry backoff
+        deadline = asyncio.get_running_loop().time() + timeout
+        while self._queued and asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(0.05)
+        if self._queued:
+            logger.warning("%d spooled uploads left for the next start", len(self._queued))
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._queue = None
+        self._workers = []
+        self._queued.clear()
+
+
+# Create a singleton instance
+upload_spool = UploadSpool(SPOOL_DIR, STORAGE_WRITE_BEHIND)
@@ -0,0 +1,74 @@
+import os
+import logging
+import time
+import asyncio
+from typing import Awaitable, Dict, List, Optional
+
+from ..config import load_env
+
+load_env()
+
+logger = logging.getLogger(__name__)
+
+# A warm-up step taking longer than this is abandoned; the service then
+# finishes initialising on first use instead
+STARTUP_WARM_TIMEOUT = float(os.getenv("STARTUP_WARM_TIMEOUT", "10"))
+
+
+class StartupReport:
+    """Wall-clock time spent in each phase of worker startup"""
+
+    def __init__(self):
+        self.phases: List[Dict] = []
+        self.started_at = time.perf_counter()
+        self.finished_at: Optional[float] = None
+
+    def record(self, name: str, seconds: float, error: Optional[str] = None) -> None:
+        self.phases.append({"phase": name, "ms": round(seconds * 1000, 1), "error": error})
+
+    async def run(self, name: str, step: Awaitable, timeout: float = STARTUP_WARM_TIMEOUT) -> None:
+        """
+        Run one warm-up step and record how long it took.
+
+        Failures are reported but don't stop startup.
+
+        Args:
+            name: Phase name
+            step: Awaitable doing the work
+            timeout: Seconds before the step is abandoned
+        """
+        started = time.perf_counter()
+        error = None
+        try:
+            await asyncio.wait_for(step, timeout)
+        except asyncio.TimeoutError:
+            error = f"timed out after {timeout}s"
+        except Exception as e:
+            error = str(e) or type(e).__name__
+        self.record(name, time.perf_counter() - started, error)
+        if error:
+            logger.warning("Startup phase %s failed: %s", name, error)
+
+    def finish(self) -> None:
+        self.finished_at = time.perf_counter()
+
+    @property
+    def total_ms(self) -> Optional[float]:
+        # Phases overlap, so total is wall clock since the report was created
+        if self.finished_at is None:
+            return None
+        return round((self.finished_at - self.started_at) * 1000, 1)
+
+    def as_dict(self) -> Dict:
+        return {"total_ms": self.total_ms, "phases": self.phases}
+
+    def log(self) -> None:
+        self.finish()
+        logger.info(
+            "Startup finished in %sms", self.total_ms,
+            extra={"total_ms": self.total_ms, "phases": self.phases},
+        )
+
+
+# Create a singleton instance
+startup_report = StartupReport()
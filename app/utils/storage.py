@@ -1,25 +1,53 @@
 import os
-import aioboto3
-from dotenv import load_dotenv
-from typing import BinaryIO, Optional
+from ..config import load_env
+from typing import BinaryIO, List, Optional
 from io import BytesIO
 
-load_dotenv()
+load_env()
 
 S3_ENDPOINT = os.getenv("S3_ENDPOINT", "http://localhost:9000")
 S3_ACCESS_KEY = os.getenv("S3_ACCESS_KEY", "minioadmin")
 S3_SECRET_KEY = os.getenv("S3_SECRET_KEY", "minioadmin")
 S3_BUCKET_NAME = os.getenv("S3_BUCKET_NAME", "passmint")
 
+# Most keys S3 deletes in one request
+DELETE_BATCH_SIZE = 1000
+
 
 class S3Storage:
     def __init__(self):
-        self.session = aioboto3.Session(
-            aws_access_key_id=S3_ACCESS_KEY,
-            aws_secret_access_key=S3_SECRET_KEY,
-        )
+        self._session = None
         self.endpoint_url = S3_ENDPOINT
         self.bucket_name = S3_BUCKET_NAME
+        self._bucket_ready = False
+
+    @property
+    def session(self):
+        # Deferred: aioboto3 and botocore are slow to import
+        if self._session is None:
+            import aioboto3
+            self._session = aioboto3.Session(
+                aws_access_key_id=S3_ACCESS_KEY,
+                aws_secret_access_key=S3_SECRET_KEY,
+            )
+        return self._session
+
+    async def _ensure_bucket(self, s3) -> None:
+        # Create bucket if it doesn't exist
+        if self._bucket_ready:
+            return
+        try:
+            await s3.head_bucket(Bucket=self.bucket_name)
+        except:
+            await s3.create_bucket(Bucket=self.bucket_name)
+        self._bucket_ready = True
+
+    async def warm(self) -> None:
+        """Build the client session and make sure the bucket exists"""
+        async with self.session.client(
+            "s3", endpoint_url=self.endpoint_url
+        ) as s3:
+            await self._ensure_bucket(s3)
 
     async def upload_file(
         self, 
@@ -45,11 +73,7 @@ class S3Storage:
         async with self.session.client(
             "s3", endpoint_url=self.endpoint_url
         ) as s3:
-            # Create bucket if it doesn't exist
-            try:
-                await s3.head_bucket(Bucket=self.bucket_name)
-            except:
-                await s3.create_bucket(Bucket=self.bucket_name)
+            await self._ensure_bucket(s3)
 
             # Upload file
             await s3.upload_fileobj(
@@ -60,8 +84,58 @@ class S3Storage:
             )
             
             # Generate URL
-            url = f"{self.endpoint_url}/{self.bucket_name}/{key}"
-            return url
+            return self.url(key)
+
+    async def exists(self, key: str) -> bool:
+        """
+        Check whether an object has been stored.
+
+        Args:
+            key: S3 key
+
+        Returns:
+            True if the object exists
+        """
+        from botocore.exceptions import ClientError
+
+        async with self.session.client(
+            "s3", endpoint_url=self.endpoint_url
+        ) as s3:
+            try:
+                await s3.head_object(Bucket=self.bucket_name, Key=key)
+            except ClientError as e:
+                if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                    return False
+                raise
+            return True
+
+    async def delete_files(self, keys: List[str]) -> None:
+        """
+        Delete files from S3 storage; keys that don't exist are ignored.
+
+        Args:
+            keys: S3 keys
+
+        Raises:
+            RuntimeError: If S3 reports keys it could not delete
+        """
+        if not keys:
+            return
+        async with self.session.client(
+            "s3", endpoint_url=self.endpoint_url
+        ) as s3:
+            for start in range(0, len(keys), DELETE_BATCH_SIZE):
+                response = await s3.delete_objects(Bucket=self.bucket_name, Delete={
+                    "Objects": [{"Key": key} for key in keys[start:start + DELETE_BATCH_SIZE]],
+                    "Quiet": True,
+                })
+                errors = response.get("Errors")
+                if errors:
+                    raise RuntimeError(f"Could not delete {len(errors)} files, e.g. {errors[0]}")
+
+    def url(self, key: str) -> str:
+        """URL a stored object is served from"""
+        return f"{self.endpoint_url}/{self.bucket_name}/{key}"
 
     async def get_file(self, key: str) -> BytesIO:
         """
@@ -0,0 +1,42 @@
+"""Per-org rate limits and shared token buckets
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Create org_rate_limits table
+    op.create_table(
+        'org_rate_limits',
+        sa.Column('org_id', UUID(), sa.ForeignKey('orgs.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('endpoint', sa.String(32), primary_key=True),
+        sa.Column('rate', sa.Float(), nullable=False),
+        sa.Column('burst', sa.Float(), nullable=False),
+        sa.Column('weight', sa.Float(), nullable=False, server_default=sa.text('1'))
+    )
+
+    # Create rate_limit_buckets table. Bucket state is cheap to lose on a
+    # crash (buckets simply refill), so skip WAL for it.
+    op.create_table(
+        'rate_limit_buckets',
+        sa.Column('key', sa.String(128), primary_key=True),
+        sa.Column('tokens', sa.Float(), nullable=False),
+        sa.Column('updated_at', sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.text('now()')),
+        prefixes=['UNLOGGED']
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('rate_limit_buckets')
+    op.drop_table('org_rate_limits')
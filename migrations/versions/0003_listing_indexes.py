@@ -0,0 +1,43 @@
+"""Indexes for keyset-paginated listings
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Build without blocking writes on large passes tables
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_passes_user_issued',
+            'passes',
+            ['user_id', sa.text('issued_at DESC'), sa.text('id DESC'), sa.text('platform DESC')],
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_passes_design_issued',
+            'passes',
+            ['design_id', sa.text('issued_at DESC'), sa.text('id DESC'), sa.text('platform DESC')],
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_designs_org_created',
+            'designs',
+            ['org_id', sa.text('created_at DESC'), sa.text('id DESC')],
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_designs_org_created', table_name='designs')
+    op.drop_index('ix_passes_design_issued', table_name='passes')
+    op.drop_index('ix_passes_user_issued', table_name='passes')
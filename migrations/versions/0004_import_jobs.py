@@ -0,0 +1,44 @@
+"""Bulk recipient import jobs
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Create import_jobs table
+    op.create_table(
+        'import_jobs',
+        sa.Column('id', UUID(), primary_key=True, server_default=sa.text('uuid_generate_v4()')),
+        sa.Column('org_id', UUID(), sa.ForeignKey('orgs.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('design_id', UUID(), sa.ForeignKey('designs.id', ondelete='SET NULL')),
+        sa.Column('status', sa.String(16), nullable=False, server_default='pending'),
+        sa.Column('total_rows', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('processed_rows', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('succeeded_rows', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('failed_rows', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('errors', JSONB(), nullable=False, server_default=sa.text("'[]'::jsonb")),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()')),
+        sa.Column('finished_at', sa.TIMESTAMP(timezone=True))
+    )
+
+    # Add status check constraint
+    op.create_check_constraint(
+        'import_status_check',
+        'import_jobs',
+        sa.text("status IN ('pending', 'running', 'completed', 'failed')")
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('import_jobs')
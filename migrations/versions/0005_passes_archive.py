@@ -0,0 +1,67 @@
+"""Partitioned archive for long-expired passes
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Create passes_archive, range-partitioned by expiry month. Partitions
+    # (passes_archive_YYYYMM) are created by the archiver as it moves rows,
+    # so existing history is migrated by simply running the archiver.
+    op.create_table(
+        'passes_archive',
+        sa.Column('id', UUID(), nullable=False),
+        sa.Column('user_id', UUID(), sa.ForeignKey('users.id', ondelete='CASCADE')),
+        sa.Column('design_id', UUID(), sa.ForeignKey('designs.id', ondelete='SET NULL')),
+        sa.Column('platform', sa.String(10), nullable=False),
+        sa.Column('serial', sa.String(32), nullable=False),
+        sa.Column('deep_link', sa.Text(), nullable=False),
+        sa.Column('expires_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column('issued_at', sa.TIMESTAMP(timezone=True)),
+        sa.Column('last_updated', sa.TIMESTAMP(timezone=True)),
+        sa.Column('archived_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()')),
+        sa.PrimaryKeyConstraint('id', 'platform', 'expires_at'),
+        postgresql_partition_by='RANGE (expires_at)'
+    )
+    op.create_index('ix_passes_archive_id', 'passes_archive', ['id'])
+
+    # Create archived_pass_counts table
+    op.create_table(
+        'archived_pass_counts',
+        sa.Column('design_id', UUID(), sa.ForeignKey('designs.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('platform', sa.String(10), primary_key=True),
+        sa.Column('count', sa.Integer(), nullable=False, server_default=sa.text('0'))
+    )
+
+    # Index the hot table by expiry so the archiver can find old passes
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_passes_expires_at',
+            'passes',
+            ['expires_at'],
+            postgresql_concurrently=True
+        )
+
+
+def downgrade() -> None:
+    # Move archived passes back into the hot table
+    op.execute(
+        "INSERT INTO passes (id, user_id, design_id, platform, serial, deep_link, "
+        "expires_at, issued_at, last_updated) "
+        "SELECT id, user_id, design_id, platform, serial, deep_link, "
+        "expires_at, issued_at, last_updated FROM passes_archive"
+    )
+    op.drop_index('ix_passes_expires_at', table_name='passes')
+    op.drop_table('archived_pass_counts')
+    op.drop_table('passes_archive')
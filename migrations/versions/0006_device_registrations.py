@@ -0,0 +1,32 @@
+"""Apple Wallet device registrations for push updates
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Create device_registrations table
+    op.create_table(
+        'device_registrations',
+        sa.Column('device_library_id', sa.String(64), primary_key=True),
+        sa.Column('pass_type_id', sa.String(128), primary_key=True),
+        sa.Column('serial', sa.String(32), primary_key=True),
+        sa.Column('push_token', sa.String(128), nullable=False),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'))
+    )
+    op.create_index('ix_device_registrations_serial', 'device_registrations', ['serial'])
+    op.create_index('ix_device_registrations_push_token', 'device_registrations', ['push_token'])
+
+
+def downgrade() -> None:
+    op.drop_table('device_registrations')
@@ -0,0 +1,35 @@
+"""Hourly issuance rollups
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = '0007'
+down_revision = '0006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Create issuance_rollups table; fill it for existing history with
+    # `python -m app.services.rollups --backfill`
+    op.create_table(
+        'issuance_rollups',
+        sa.Column('org_id', UUID(), nullable=False),
+        sa.Column('bucket_start', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column('design_id', UUID(), nullable=False),
+        sa.Column('platform', sa.String(10), nullable=False),
+        sa.Column('shard', sa.SmallInteger(), nullable=False),
+        sa.Column('issued', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.Column('expiring', sa.Integer(), nullable=False, server_default=sa.text('0')),
+        sa.PrimaryKeyConstraint('org_id', 'bucket_start', 'design_id', 'platform', 'shard')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('issuance_rollups')
@@ -0,0 +1,23 @@
+"""Sequence for block-allocated pass serials
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Each nextval reserves a block of INCREMENT BY serial numbers for one
+    # worker; the allocator reads the block size from the sequence itself
+    op.execute("CREATE SEQUENCE pass_serial_seq START WITH 1 INCREMENT BY 1000")
+
+
+def downgrade() -> None:
+    op.execute("DROP SEQUENCE pass_serial_seq")
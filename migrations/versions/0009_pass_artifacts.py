@@ -0,0 +1,110 @@
+"""Split passes into one row per pass plus per-platform artifacts
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Create pass_artifacts table
+    op.create_table(
+        'pass_artifacts',
+        sa.Column('pass_id', UUID(), nullable=False),
+        sa.Column('platform', sa.String(10), nullable=False),
+        sa.Column('serial', sa.String(32), nullable=False, unique=True),
+        sa.Column('deep_link', sa.Text(), nullable=False),
+        sa.PrimaryKeyConstraint('pass_id', 'platform')
+    )
+    op.create_check_constraint(
+        'pass_artifacts_platform_check',
+        'pass_artifacts',
+        sa.text("platform IN ('apple', 'google')")
+    )
+
+    # Move the per-platform fields over; `passes.id` was already unique, so
+    # each existing row becomes one pass with one artifact
+    op.execute(
+        "INSERT INTO pass_artifacts (pass_id, platform, serial, deep_link) "
+        "SELECT id, platform, serial, deep_link FROM passes WHERE platform IS NOT NULL"
+    )
+    op.create_foreign_key(
+        'pass_artifacts_pass_id_fkey',
+        'pass_artifacts', 'passes',
+        ['pass_id'], ['id'],
+        ondelete='CASCADE'
+    )
+
+    # Listing indexes no longer need platform as a tie-breaker. The new ones
+    # are built beside the old without blocking writes, then swapped in
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_passes_user_issued_new',
+            'passes',
+            ['user_id', sa.text('issued_at DESC'), sa.text('id DESC')],
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_passes_design_issued_new',
+            'passes',
+            ['design_id', sa.text('issued_at DESC'), sa.text('id DESC')],
+            postgresql_concurrently=True
+        )
+    op.drop_index('ix_passes_user_issued', table_name='passes')
+    op.drop_index('ix_passes_design_issued', table_name='passes')
+    op.execute("ALTER INDEX ix_passes_user_issued_new RENAME TO ix_passes_user_issued")
+    op.execute("ALTER INDEX ix_passes_design_issued_new RENAME TO ix_passes_design_issued")
+    op.drop_constraint('platform_type_check', 'passes', type_='check')
+    op.drop_column('passes', 'platform')
+    op.drop_column('passes', 'serial')
+    op.drop_column('passes', 'deep_link')
+
+
+def downgrade() -> None:
+    op.add_column('passes', sa.Column('platform', sa.String(10)))
+    op.add_column('passes', sa.Column('serial', sa.String(32)))
+    op.add_column('passes', sa.Column('deep_link', sa.Text()))
+
+    # The old layout holds one platform per pass ID; keep the Apple artifact
+    # where a pass has both
+    op.execute(
+        "UPDATE passes p SET platform = a.platform, serial = a.serial, deep_link = a.deep_link "
+        "FROM (SELECT DISTINCT ON (pass_id) * FROM pass_artifacts ORDER BY pass_id, platform) a "
+        "WHERE a.pass_id = p.id"
+    )
+    op.execute("DELETE FROM passes WHERE serial IS NULL")
+    op.alter_column('passes', 'serial', nullable=False)
+    op.alter_column('passes', 'deep_link', nullable=False)
+    op.create_unique_constraint('passes_serial_key', 'passes', ['serial'])
+    op.create_check_constraint(
+        'platform_type_check',
+        'passes',
+        sa.text("platform IN ('apple', 'google')")
+    )
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_passes_user_issued_old',
+            'passes',
+            ['user_id', sa.text('issued_at DESC'), sa.text('id DESC'), sa.text('platform DESC')],
+            postgresql_concurrently=True
+        )
+        op.create_index(
+            'ix_passes_design_issued_old',
+            'passes',
+            ['design_id', sa.text('issued_at DESC'), sa.text('id DESC'), sa.text('platform DESC')],
+            postgresql_concurrently=True
+        )
+    op.drop_index('ix_passes_design_issued', table_name='passes')
+    op.drop_index('ix_passes_user_issued', table_name='passes')
+    op.execute("ALTER INDEX ix_passes_user_issued_old RENAME TO ix_passes_user_issued")
+    op.execute("ALTER INDEX ix_passes_design_issued_old RENAME TO ix_passes_design_issued")
+    op.drop_table('pass_artifacts')
@@ -0,0 +1,25 @@
+"""Server-rendered design previews
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0010'
+down_revision = '0009'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing designs get a preview rendered the first time they are read
+    op.add_column('designs', sa.Column('rendered_preview_url', sa.Text()))
+    op.add_column('designs', sa.Column('preview_hash', sa.String(64)))
+
+
+def downgrade() -> None:
+    op.drop_column('designs', 'preview_hash')
+    op.drop_column('designs', 'rendered_preview_url')
@@ -0,0 +1,47 @@
+"""Pre-signed pass inventory
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+
+revision = '0011'
+down_revision = '0010'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Create inventory_pools table
+    op.create_table(
+        'inventory_pools',
+        sa.Column('design_id', UUID(), sa.ForeignKey('designs.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('org_id', UUID(), sa.ForeignKey('orgs.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('target_size', sa.Integer(), nullable=False),
+        sa.Column('low_watermark', sa.Integer(), nullable=False),
+        sa.Column('ttl_seconds', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'))
+    )
+
+    # Create pass_inventory table
+    op.create_table(
+        'pass_inventory',
+        sa.Column('id', UUID(), primary_key=True),
+        sa.Column('design_id', UUID(), sa.ForeignKey('designs.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('artifacts', JSONB(), nullable=False),
+        sa.Column('qr_png', sa.Text(), nullable=False),
+        sa.Column('pass_expires_at', sa.TIMESTAMP(timezone=True)),
+        sa.Column('expires_at', sa.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'))
+    )
+    op.create_index('ix_pass_inventory_design', 'pass_inventory', ['design_id', 'id'])
+    op.create_index('ix_pass_inventory_expires_at', 'pass_inventory', ['expires_at'])
+
+
+def downgrade() -> None:
+    op.drop_table('pass_inventory')
+    op.drop_table('inventory_pools')
@@ -0,0 +1,53 @@
+"""Webhook subscriptions, event outbox and pass redemption
+
+Revision ID: 0012
+Revises: 0011
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID, JSONB, ARRAY
+
+revision = '0012'
+down_revision = '0011'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('passes', sa.Column('redeemed_at', sa.TIMESTAMP(timezone=True)))
+
+    # Create webhook_subscriptions table
+    op.create_table(
+        'webhook_subscriptions',
+        sa.Column('id', UUID(), primary_key=True),
+        sa.Column('org_id', UUID(), sa.ForeignKey('orgs.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('url', sa.Text(), nullable=False),
+        sa.Column('secret', sa.String(64), nullable=False),
+        sa.Column('events', ARRAY(sa.Text()), nullable=False),
+        sa.Column('active', sa.Boolean(), nullable=False, server_default=sa.text('true')),
+        sa.Column('failures', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('last_error', sa.Text()),
+        sa.Column('next_attempt_at', sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.text('now()')),
+        sa.Column('expired_through', sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.text('now()')),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'))
+    )
+    op.create_index('ix_webhook_subscriptions_org', 'webhook_subscriptions', ['org_id'])
+
+    # Create webhook_outbox table
+    op.create_table(
+        'webhook_outbox',
+        sa.Column('id', sa.BigInteger(), sa.Identity(), primary_key=True),
+        sa.Column('subscription_id', UUID(), sa.ForeignKey('webhook_subscriptions.id', ondelete='CASCADE'), nullable=False),
+        sa.Column('event_type', sa.String(32), nullable=False),
+        sa.Column('payload', JSONB(), nullable=False),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.text('now()'))
+    )
+    op.create_index('ix_webhook_outbox_subscription', 'webhook_outbox', ['subscription_id', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_table('webhook_outbox')
+    op.drop_table('webhook_subscriptions')
+    op.drop_column('passes', 'redeemed_at')
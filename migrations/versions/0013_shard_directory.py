@@ -0,0 +1,39 @@
+"""Shard directory: org and user placement across database shards
+
+Revision ID: 0013
+Revises: 0012
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import UUID
+
+revision = '0013'
+down_revision = '0012'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Create org_shards table; orgs without a row live on the default shard
+    op.create_table(
+        'org_shards',
+        sa.Column('org_id', UUID(), primary_key=True),
+        sa.Column('shard', sa.String(64), nullable=False),
+        sa.Column('frozen', sa.Boolean(), nullable=False, server_default=sa.text('false')),
+        sa.Column('updated_at', sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.text('now()'))
+    )
+
+    # Create user_shards table; users without a row have passes on the default shard only
+    op.create_table(
+        'user_shards',
+        sa.Column('user_id', UUID(), primary_key=True),
+        sa.Column('shard', sa.String(64), primary_key=True),
+        sa.Column('created_at', sa.TIMESTAMP(timezone=True), server_default=sa.text('now()'))
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('user_shards')
+    op.drop_table('org_shards')
@@ -0,0 +1,33 @@
+"""Leased design preview claims
+
+Revision ID: 0014
+Revises: 0013
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0014'
+down_revision = '0013'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Renders are claimed with an expiring lease; preview_hash is now only
+    # set once the render is stored
+    op.add_column('designs', sa.Column('preview_claim', sa.String(64)))
+    op.add_column('designs', sa.Column('preview_claimed_at', sa.TIMESTAMP(timezone=True)))
+
+    # Drop claims left by renders that never finished, so they are retried
+    op.execute(
+        "UPDATE designs SET preview_hash = NULL "
+        "WHERE preview_hash IS NOT NULL AND (rendered_preview_url IS NULL "
+        "OR rendered_preview_url NOT LIKE '%/' || preview_hash || '.png')"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('designs', 'preview_claimed_at')
+    op.drop_column('designs', 'preview_claim')
@@ -0,0 +1,32 @@
+"""Order webhook events by the transaction that wrote them
+
+Revision ID: 0015
+Revises: 0014
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0015'
+down_revision = '0014'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Events are delivered once every transaction that could still write an
+    # earlier one has finished; identity values alone follow insert order,
+    # not commit order
+    op.add_column('webhook_outbox', sa.Column(
+        'xact_id', sa.BigInteger(), nullable=False,
+        server_default=sa.text('pg_current_xact_id()::text::bigint'),
+    ))
+    op.create_index('ix_webhook_outbox_delivery', 'webhook_outbox', ['subscription_id', 'xact_id', 'id'])
+    op.drop_index('ix_webhook_outbox_subscription', table_name='webhook_outbox')
+
+
+def downgrade() -> None:
+    op.create_index('ix_webhook_outbox_subscription', 'webhook_outbox', ['subscription_id', 'id'])
+    op.drop_index('ix_webhook_outbox_delivery', table_name='webhook_outbox')
+    op.drop_column('webhook_outbox', 'xact_id')
@@ -0,0 +1,25 @@
+"""Track when each design last changed
+
+Revision ID: 0016
+Revises: 0015
+Create Date: 2026-10-19
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = '0016'
+down_revision = '0015'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Versions the designs cached for issuance, so an edit invalidates them
+    op.add_column('designs', sa.Column(
+        'updated_at', sa.TIMESTAMP(timezone=True), nullable=False, server_default=sa.func.now(),
+    ))
+
+
+def downgrade() -> None:
+    op.drop_column('designs', 'updated_at')
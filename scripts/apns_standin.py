@@ -0,0 +1,65 @@
+"""
+Local APNs stand-in for offline push benchmarks.
+
+Accepts POST /3/device/{token} like APNs and answers 200, or an error for a
+configurable share of requests:
+
+    uvicorn scripts.apns_standin:app --port 9443
+
+    APNS_URL=http://127.0.0.1:9443 python scripts/bench_apns.py
+
+Environment:
+    STANDIN_LATENCY_MS    Delay before each response (default 5)
+    STANDIN_INVALID_RATE  Share of tokens answered 410 Unregistered (default 0)
+    STANDIN_ERROR_RATE    Share of requests answered 503 (default 0)
+
+uvicorn speaks HTTP/1.1; serve the app with an HTTP/2 server such as
+hypercorn (with TLS) to exercise stream multiplexing.
+"""
+import os
+import random
+import asyncio
+from collections import Counter
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+LATENCY = float(os.getenv("STANDIN_LATENCY_MS", "5")) / 1000
+INVALID_RATE = float(os.getenv("STANDIN_INVALID_RATE", "0"))
+ERROR_RATE = float(os.getenv("STANDIN_ERROR_RATE", "0"))
+
+counts = Counter()
+
+
+async def push(request: Request) -> Response:
+    await request.body()
+    await asyncio.sleep(LATENCY)
+
+    if not request.headers.get("authorization", "").startswith("bearer "):
+        counts["unauthorized"] += 1
+        return JSONResponse({"reason": "MissingProviderToken"}, status_code=403)
+    if random.random() < ERROR_RATE:
+        counts["unavailable"] += 1
+        return JSONResponse({"reason": "ServiceUnavailable"}, status_code=503)
+    if random.random() < INVALID_RATE:
+        counts["unregistered"] += 1
+        return JSONResponse({"reason": "Unregistered"}, status_code=410)
+
+    counts["sent"] += 1
+    return Response(status_code=200)
+
+
+async def stats(request: Request) -> Response:
+    return JSONResponse(dict(counts))
+
+
+app = Starlette(routes=[
+    Route("/3/device/{token}", push, methods=["POST"]),
+    Route("/stats", stats, methods=["GET"]),
+])
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="127.0.0.1", port=int(os.getenv("STANDIN_PORT", "9443")))
@@ -0,0 +1,52 @@
+"""
+Benchmark APNs push fan-out against scripts/apns_standin.py.
+
+    APNS_URL=http://127.0.0.1:9443 python scripts/bench_apns.py --pushes 20000
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.apns import APNsDispatcher, APNsProviderToken, APNS_URL
+
+
+async def main(pushes: int, concurrency: int, connections: int) -> None:
+    # Throwaway signing key; the stand-in only checks a token is present
+    key = ec.generate_private_key(ec.SECP256R1())
+    key_pem = key.private_bytes(
+        serialization.Encoding.PEM,
+        serialization.PrivateFormat.PKCS8,
+        serialization.NoEncryption(),
+    )
+    dispatcher = APNsDispatcher(
+        APNS_URL,
+        "pass.com.passmint.card",
+        APNsProviderToken(key_pem, "BENCHKEY", "BENCHTEAM"),
+        concurrency=concurrency,
+        max_connections=connections,
+        http2=APNS_URL.startswith("https://"),
+    )
+    tokens = [f"{i:064x}" for i in range(pushes)]
+
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*[dispatcher.send(token) for token in tokens])
+    elapsed = time.perf_counter() - started
+    await dispatcher.close()
+
+    summary = {outcome: outcomes.count(outcome) for outcome in set(outcomes)}
+    print(f"{pushes} pushes in {elapsed:.2f}s ({pushes / elapsed:.0f}/s) {summary}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark APNs fan-out")
+    parser.add_argument("--pushes", type=int, default=10000)
+    parser.add_argument("--concurrency", type=int, default=1000)
+    parser.add_argument("--connections", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(main(args.pushes, args.concurrency, args.connections))
@@ -0,0 +1,162 @@
+"""
+Benchmark the native pkpass writer against passpy.
+
+    python scripts/bench_pkpass.py --passes 2000
+
+Every native build is first checked byte for byte against Python's zipfile
+writing the same members. If the installed passpy cannot build passes (the
+PyPI name is also taken by a password-store client), a from-scratch zipfile
+builder stands in for it, doing per pass what passpy does: compress every
+file, write the manifest and sign.
+"""
+import io
+import os
+import sys
+import json
+import time
+import hashlib
+import zipfile
+import argparse
+from datetime import datetime, timedelta
+from cryptography import x509
+from cryptography.x509.oid import NameOID
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.hazmat.primitives.serialization import pkcs12
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.pkpass import PKPassSigner, PKPassTemplate, manifest_bytes
+
+
+def make_p12(password: bytes) -> bytes:
+    # Throwaway self-signed certificate; nothing here is verified by Apple
+    key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, "Pass Type ID: pass.bench")])
+    certificate = (
+        x509.CertificateBuilder()
+        .subject_name(name)
+        .issuer_name(name)
+        .public_key(key.public_key())
+        .serial_number(1)
+        .not_valid_before(datetime.utcnow())
+        .not_valid_after(datetime.utcnow() + timedelta(days=1))
+        .sign(key, hashes.SHA256())
+    )
+    return pkcs12.serialize_key_and_certificates(
+        b"bench", key, certificate, None, serialization.BestAvailableEncryption(password)
+    )
+
+
+def pass_json(serial: int) -> dict:
+    return {
+        "formatVersion": 1,
+        "passTypeIdentifier": "pass.bench",
+        "serialNumber": f"PM-{serial:010d}",
+        "teamIdentifier": "BENCHTEAM",
+        "organizationName": "PassMint",
+        "description": "Benchmark pass",
+        "storeCard": {"primaryFields": [{"key": "balance", "label": "Balance", "value": "$10"}]},
+        "barcodes": [{"message": f"PASSMINT:{serial}", "format": "PKBarcodeFormatQR", "messageEncoding": "utf-8"}],
+    }
+
+
+def zipfile_rewrite(archive: bytes) -> bytes:
+    """Write the archive's members again with zipfile, with the same metadata"""
+    source = zipfile.ZipFile(io.BytesIO(archive))
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w") as zf:
+        for info in source.infolist():
+            entry = zipfile.ZipInfo(info.filename, date_time=(1980, 1, 1, 0, 0, 0))
+            entry.compress_type = info.compress_type
+            entry.create_system = 3
+            entry.create_version = 20
+            entry.external_attr = 0o644 << 16
+            zf.writestr(entry, source.read(info), compresslevel=6)
+    return out.getvalue()
+
+
+def from_scratch(document: dict, assets: dict, signer: PKPassSigner) -> bytes:
+    files = {"pass.json": json.dumps(document).encode("utf-8"), **assets}
+    manifest = manifest_bytes({name: hashlib.sha1(data).hexdigest() for name, data in files.items()})
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in files.items():
+            zf.writestr(name, data)
+        zf.writestr("manifest.json", manifest)
+        zf.writestr("signature", signer.sign(manifest))
+    return out.getvalue()
+
+
+def passpy_builder(assets: dict, p12: bytes, password: str):
+    try:
+        import passpy
+        passpy.Pass
+    except (ImportError, AttributeError):
+        return None
+
+    def build(document: dict) -> bytes:
+        pkpass = passpy.Pass(document)
+        for name, data in assets.items():
+            pkpass.addFile(name, io.BytesIO(data))
+        pkpass.setCertificate(p12, password)
+        return pkpass.create()
+
+    return build
+
+
+def timed(label: str, passes: int, build) -> float:
+    started = time.perf_counter()
+    total_bytes = 0
+    for serial in range(passes):
+        total_bytes += len(build(serial))
+    elapsed = time.perf_counter() - started
+    print(f"{label:<12} {passes} passes in {elapsed:.2f}s "
+          f"({passes / elapsed:.0f}/s, {total_bytes / passes:.0f} bytes each)")
+    return elapsed
+
+
+def main(passes: int, asset_kb: int) -> None:
+    p12 = make_p12(b"bench")
+    signer = PKPassSigner(p12, "bench")
+    # Random bytes stand in for PNGs, which do not compress further
+    assets = {
+        "icon.png": os.urandom(asset_kb * 1024),
+        "icon@2x.png": os.urandom(asset_kb * 2048),
+        "logo.png": os.urandom(asset_kb * 1024),
+        "strip.png": os.urandom(asset_kb * 4096),
+    }
+    template = PKPassTemplate(assets)
+
+    for serial in range(min(passes, 50)):
+        archive = bytes(template.build(pass_json(serial), signer))
+        if zipfile_rewrite(archive) != archive:
+            raise SystemExit(f"pass {serial}: native archive differs from zipfile's")
+    print("validated: native archives match zipfile byte for byte")
+
+    native = timed("native", passes, lambda serial: template.build(pass_json(serial), signer))
+
+    reference = passpy_builder(assets, p12, "bench")
+    if reference is not None:
+        label = "passpy"
+        with zipfile.ZipFile(io.BytesIO(reference(pass_json(0)))) as zf:
+            theirs = json.loads(zf.read("manifest.json"))
+        ours = json.loads(manifest_bytes(template.hashes))
+        if any(theirs.get(name) != digest for name, digest in ours.items()):
+            raise SystemExit("passpy manifest hashes differ for the design's assets")
+        print("validated: passpy manifest agrees on asset hashes")
+    else:
+        label = "zipfile"
+        reference = lambda document: from_scratch(document, assets, signer)  # noqa: E731
+        print("passpy cannot build passes here; comparing with a from-scratch zipfile build")
+
+    baseline = timed(label, passes, lambda serial: reference(pass_json(serial)))
+    print(f"speedup      {baseline / native:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark pkpass building")
+    parser.add_argument("--passes", type=int, default=1000)
+    parser.add_argument("--asset-kb", type=int, default=8, help="Size of the smallest image")
+    args = parser.parse_args()
+    main(args.passes, args.asset_kb)
@@ -0,0 +1,225 @@
+"""
+Time the app's real database queries and record their plans.
+
+    python scripts/gen_dataset.py ...          # or any populated database
+    python scripts/bench_queries.py --out bench/before.json
+    # change the schema or indexes
+    python scripts/bench_queries.py --out bench/after.json --compare bench/before.json
+
+Each scenario calls the code the API runs (endpoint functions and listing
+services) against sample orgs, designs, users and passes picked from the
+database: the largest org, a median one, and so on. Scenarios are timed over
+--iterations runs after a warm-up. Every statement a scenario issued is then
+run again under EXPLAIN (ANALYZE, BUFFERS) with the same parameters, and
+the plans are written to --out with the timings.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import asyncio
+import argparse
+import statistics
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.api.passes import get_pass
+from app.api.stats import get_org_stats
+from app.models.base import DATABASE_URL
+from app.models.models import Pass
+from app.services.listings import list_designs, list_passes
+from app.services.rollups import query_histogram
+from app.utils.query_stats import record_queries
+
+SAMPLES_SQL = {
+    # Orgs ranked by passes issued, from the rollups rather than a scan
+    "orgs": text("""
+        SELECT org_id, sum(issued) AS issued FROM issuance_rollups
+        GROUP BY org_id ORDER BY issued DESC
+    """),
+    "design": text("""
+        SELECT design_id FROM issuance_rollups WHERE org_id = :org_id
+        GROUP BY design_id ORDER BY sum(issued) DESC LIMIT 1
+    """),
+    "pass": text("SELECT id, user_id FROM passes TABLESAMPLE SYSTEM (1) LIMIT 1"),
+    "busy_user": text("""
+        SELECT user_id FROM passes TABLESAMPLE SYSTEM (1)
+        GROUP BY user_id ORDER BY count(*) DESC LIMIT 1
+    """),
+}
+
+
+async def pick_samples(session) -> dict:
+    orgs = (await session.execute(SAMPLES_SQL["orgs"])).all()
+    if not orgs:
+        raise SystemExit("No rollups found; load data with scripts/gen_dataset.py first")
+    largest, median = orgs[0].org_id, orgs[len(orgs) // 2].org_id
+    design = (await session.execute(SAMPLES_SQL["design"], {"org_id": largest})).scalar()
+    sample = (await session.execute(SAMPLES_SQL["pass"])).first()
+    busy_user = (await session.execute(SAMPLES_SQL["busy_user"])).scalar()
+    return {
+        "largest_org": str(largest),
+        "median_org": str(median),
+        "largest_design": str(design),
+        "pass_id": str(sample.id),
+        "pass_user": str(sample.user_id),
+        "busy_user": str(busy_user),
+    }
+
+
+async def deep_page(session, filters, pages: int):
+    cursor = None
+    for _ in range(pages):
+        page = await list_passes(session, filters, cursor=cursor, limit=50)
+        cursor = page.next_cursor
+        if cursor is None:
+            break
+
+
+def scenarios(samples: dict) -> dict:
+    now = datetime.now(timezone.utc)
+    largest, median = samples["largest_org"], samples["median_org"]
+    design = Pass.design_id == uuid.UUID(samples["largest_design"])
+    return {
+        "org_stats_largest": lambda s: get_org_stats(largest, current_org=largest, db=s),
+        "org_stats_median": lambda s: get_org_stats(median, current_org=median, db=s),
+        "histogram_90d_daily": lambda s: query_histogram(
+            s, largest, now - timedelta(days=90), now, granularity="day"
+        ),
+        "histogram_year_by_design": lambda s: query_histogram(
+            s, largest, now - timedelta(days=365), now, granularity="week", group_by="design"
+        ),
+        "get_pass": lambda s: get_pass(
+            samples["pass_id"], current_user=(samples["pass_user"], "user"), db=s, if_none_match=None
+        ),
+        "list_user_passes": lambda s: list_passes(s, [Pass.user_id == uuid.UUID(samples["busy_user"])]),
+        "list_design_passes": lambda s: list_passes(s, [design]),
+        "list_design_passes_page_20": lambda s: deep_page(s, [design], 20),
+        "list_design_passes_active": lambda s: list_passes(s, [design], expired=False),
+        "list_org_designs": lambda s: list_designs(s, largest),
+    }
+
+
+class StatementCapture:
+    """Keeps the SQL and parameters of every statement while enabled"""
+
+    def __init__(self, engine):
+        self.enabled = False
+        self.statements = []
+        event.listen(engine.sync_engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if self.enabled:
+            self.statements.append((statement, parameters))
+
+
+async def explain(engine, capture: StatementCapture) -> list:
+    plans = []
+    async with engine.connect() as conn:
+        for statement, parameters in capture.statements:
+            # Roll back, so EXPLAIN ANALYZE of a write leaves nothing behind
+            transaction = await conn.begin()
+            result = await conn.exec_driver_sql(
+                "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement, parameters
+            )
+            plan = result.scalar()
+            await transaction.rollback()
+            plan = json.loads(plan) if isinstance(plan, str) else plan
+            plans.append({
+                "sql": " ".join(statement.split()),
+                "execution_ms": plan[0]["Execution Time"],
+                "planning_ms": plan[0]["Planning Time"],
+                "plan": plan[0]["Plan"],
+            })
+    return plans
+
+
+async def bench(name: str, scenario, maker, engine, capture, iterations: int) -> dict:
+    async with maker() as session:
+        await scenario(session)  # Warm-up: caches, prepared statements
+
+    timings, db_times, counts = [], [], []
+    for _ in range(iterations):
+        async with maker() as session:
+            with record_queries() as stats:
+                started = time.perf_counter()
+                await scenario(session)
+                timings.append((time.perf_counter() - started) * 1000)
+        db_times.append(stats.db_ms)
+        counts.append(stats.count)
+
+    capture.statements, capture.enabled = [], True
+    async with maker() as session:
+        await scenario(session)
+    capture.enabled = False
+
+    result = {
+        "p50_ms": statistics.median(timings),
+        "p95_ms": sorted(timings)[max(0, int(len(timings) * 0.95) - 1)],
+        "min_ms": min(timings),
+        "db_p50_ms": statistics.median(db_times),
+        "queries": max(counts),
+        "plans": await explain(engine, capture),
+    }
+    print(f"{name:<28} p50 {result['p50_ms']:8.1f}ms  p95 {result['p95_ms']:8.1f}ms  "
+          f"db {result['db_p50_ms']:8.1f}ms  queries {result['queries']}")
+    return result
+
+
+def compare(results: dict, baseline_path: str) -> None:
+    with open(baseline_path) as f:
+        baseline = json.load(f)["scenarios"]
+    print(f"\nchange in p50 against {baseline_path}")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before:
+            continue
+        change = (result["p50_ms"] - before["p50_ms"]) / before["p50_ms"] * 100 if before["p50_ms"] else 0
+        queries = result["queries"] - before["queries"]
+        print(f"{name:<28} {before['p50_ms']:8.1f}ms -> {result['p50_ms']:8.1f}ms ({change:+.0f}%)"
+              + (f"  queries {queries:+d}" if queries else ""))
+
+
+async def main(args) -> None:
+    engine = create_async_engine(DATABASE_URL)
+    maker = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    capture = StatementCapture(engine)
+
+    async with maker() as session:
+        samples = await pick_samples(session)
+        total = (await session.execute(text("SELECT reltuples::bigint FROM pg_class WHERE relname = 'passes'"))).scalar()
+    print(f"~{total} passes; samples {json.dumps(samples)}\n")
+
+    results = {}
+    for name, scenario in scenarios(samples).items():
+        if args.only and name not in args.only:
+            continue
+        results[name] = await bench(name, scenario, maker, engine, capture, args.iterations)
+    await engine.dispose()
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump({
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                "passes": total,
+                "samples": samples,
+                "scenarios": results,
+            }, f, indent=2, default=str)
+        print(f"\nplans and timings written to {args.out}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the app's database queries")
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--only", nargs="*", help="Scenario names to run")
+    parser.add_argument("--out", help="Write timings and EXPLAIN ANALYZE plans to this JSON file")
+    parser.add_argument("--compare", help="Results file from an earlier run to diff against")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,96 @@
+"""
+Benchmark manifest signing in-process against the signing daemon.
+
+    python scripts/bench_signer.py --requests 5000 --concurrency 64 --workers 4
+
+Starts app/services/signing_daemon.py as a subprocess on a temporary Unix
+socket with a throwaway certificate, then signs --requests manifests with
+--concurrency in flight: first with LocalSigner, which blocks the event loop
+for every signature as an API worker does today, then through RemoteSigner
+with --pool-size connections. Reports throughput, latency percentiles and
+how many writes the requests were coalesced into.
+"""
+import os
+import sys
+import time
+import base64
+import asyncio
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_pkpass import make_p12
+from app.services.signing import LocalSigner, RemoteSigner
+from app.utils.pkpass import PKPassSigner
+
+
+def manifest(n: int) -> bytes:
+    return f'{{"icon.png":"{n:040x}","pass.json":"{n:040x}"}}'.encode("utf-8")
+
+
+async def run(name: str, signer, requests: int, concurrency: int) -> None:
+    latencies = []
+    queue = iter(range(requests))
+
+    async def client():
+        for n in queue:
+            started = time.perf_counter()
+            await signer.sign(manifest(n))
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    await signer.sign(manifest(0))  # Warm-up: connections, worker processes
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2]
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    line = f"{name:<8} {requests / elapsed:8.0f}/s  p50 {p50:7.2f}ms  p99 {p99:7.2f}ms"
+    if isinstance(signer, RemoteSigner):
+        line += f"  {signer.writes} writes"
+    print(line)
+
+
+async def wait_for_socket(path: str, daemon: subprocess.Popen) -> None:
+    for _ in range(300):
+        if os.path.exists(path):
+            return
+        if daemon.poll() is not None:
+            raise SystemExit("Signing daemon exited during startup")
+        await asyncio.sleep(0.05)
+    raise SystemExit("Signing daemon did not start")
+
+
+async def main(args) -> None:
+    p12 = make_p12(b"bench")
+    local = LocalSigner(PKPassSigner(p12, "bench"))
+    await run("local", local, args.requests, args.concurrency)
+
+    socket_path = os.path.join(tempfile.mkdtemp(), "signer.sock")
+    env = dict(os.environ, APPLE_PASS_CERT_P12=base64.b64encode(p12).decode(), APPLE_PASS_CERT_PASSWORD="bench")
+    daemon = subprocess.Popen(
+        [sys.executable, "-m", "app.services.signing_daemon",
+         "--listen", f"unix://{socket_path}", "--workers", str(args.workers)],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env,
+    )
+    try:
+        await wait_for_socket(socket_path, daemon)
+        remote = RemoteSigner(f"unix://{socket_path}", pool_size=args.pool_size)
+        await run("remote", remote, args.requests, args.concurrency)
+        await remote.close()
+    finally:
+        daemon.terminate()
+        daemon.wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark local and remote manifest signing")
+    parser.add_argument("--requests", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,156 @@
+"""
+Bulk-load a synthetic dataset into a local Postgres, for benchmarks at scale.
+
+    alembic upgrade head
+    python scripts/gen_dataset.py --orgs 2000 --users 2000000 --passes 10000000
+
+Rows are generated inside Postgres with generate_series, a batch of passes
+per transaction, so ten million passes load in minutes. Passes are spread
+over orgs with a power-law skew (--org-skew; higher means a few huge orgs
+hold most passes), issued uniformly over the last --days days with
+time-ordered IDs, and expire --ttl-days after issue at most (--no-expiry of
+them never do). Each pass gets an Apple artifact with probability --apple,
+otherwise or additionally a Google one.
+
+IDs are derived from --tag, so a dataset can be extended by rerunning with
+the same tag and a higher --start, and never collides with real rows.
+Issuance rollups are rebuilt and tables analyzed at the end.
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.base import DATABASE_URL
+from app.services.rollups import BACKFILL_ORGS_SQL, BACKFILL_SQL
+
+ORGS_SQL = text("""
+    INSERT INTO orgs (id, name)
+    SELECT md5(CAST(:tag AS text) || '-org-' || g)::uuid, CAST(:tag AS text) || ' org ' || g
+    FROM generate_series(0, CAST(:orgs AS int) - 1) g
+    ON CONFLICT DO NOTHING
+""")
+
+USERS_SQL = text("""
+    INSERT INTO users (id, line_user_id)
+    SELECT md5(CAST(:tag AS text) || '-user-' || g)::uuid, CAST(:tag AS text) || '-' || g
+    FROM generate_series(CAST(:start AS int), CAST(:stop AS int) - 1) g
+    ON CONFLICT DO NOTHING
+""")
+
+DESIGNS_SQL = text("""
+    INSERT INTO designs (id, org_id, template_json)
+    SELECT
+        md5(CAST(:tag AS text) || '-design-' || g)::uuid,
+        md5(CAST(:tag AS text) || '-org-' || (g / CAST(:per_org AS int)))::uuid,
+        jsonb_build_object('logoText', 'Design ' || g, 'style', 'storeCard')
+    FROM generate_series(0, CAST(:orgs AS int) * CAST(:per_org AS int) - 1) g
+    ON CONFLICT DO NOTHING
+""")
+
+# The pass ID is a UUIDv7 built from issued_at: 48-bit millisecond timestamp,
+# version nibble, random bits with the variant set
+PASSES_SQL = text("""
+    WITH picks AS (
+        SELECT
+            floor(CAST(:orgs AS int) * power(random(), CAST(:skew AS float8)))::int AS org,
+            floor(random() * CAST(:per_org AS int))::int AS design,
+            floor(random() * CAST(:users AS int))::int AS usr,
+            now() - random() * CAST(:days AS float8) * interval '1 day' AS issued_at,
+            md5(random()::text || g) AS rnd
+        FROM generate_series(CAST(:start AS bigint), CAST(:stop AS bigint) - 1) g
+    ),
+    new_passes AS (
+        INSERT INTO passes (id, user_id, design_id, expires_at, issued_at, last_updated)
+        SELECT
+            (lpad(to_hex(floor(extract(epoch FROM issued_at) * 1000)::bigint), 12, '0')
+                || '7' || substr(rnd, 1, 3)
+                || to_hex(8 + floor(random() * 4)::int) || substr(rnd, 4, 15))::uuid,
+            md5(CAST(:tag AS text) || '-user-' || usr)::uuid,
+            md5(CAST(:tag AS text) || '-design-' || (org * CAST(:per_org AS int) + design))::uuid,
+            CASE WHEN random() < CAST(:no_expiry AS float8) THEN NULL
+                 ELSE issued_at + random() * CAST(:ttl_days AS float8) * interval '1 day' END,
+            issued_at,
+            issued_at
+        FROM picks
+        RETURNING id, random() < CAST(:apple AS float8) AS has_apple, random() AS google_roll
+    )
+    INSERT INTO pass_artifacts (pass_id, platform, serial, deep_link)
+    SELECT id, 'apple', 'A' || substr(replace(id::text, '-', ''), 3),
+           'https://synthetic.example/apple/' || id
+    FROM new_passes WHERE has_apple
+    UNION ALL
+    SELECT id, 'google', 'G' || substr(replace(id::text, '-', ''), 3),
+           'https://synthetic.example/google/' || id
+    FROM new_passes WHERE NOT has_apple OR google_roll < CAST(:google AS float8)
+""")
+
+
+async def run(conn, label: str, stmt, **params) -> None:
+    started = time.perf_counter()
+    await conn.execute(stmt, params)
+    print(f"{label} in {time.perf_counter() - started:.1f}s")
+
+
+async def main(args) -> None:
+    engine = create_async_engine(DATABASE_URL)
+    common = {"tag": args.tag, "orgs": args.orgs, "per_org": args.designs_per_org}
+
+    async with engine.begin() as conn:
+        await run(conn, f"{args.orgs} orgs", ORGS_SQL, tag=args.tag, orgs=args.orgs)
+        await run(conn, f"{args.orgs * args.designs_per_org} designs", DESIGNS_SQL, **common)
+    for start in range(0, args.users, args.batch):
+        stop = min(args.users, start + args.batch)
+        async with engine.begin() as conn:
+            await run(conn, f"users {start}-{stop}", USERS_SQL, tag=args.tag, start=start, stop=stop)
+
+    end = args.start + args.passes
+    for start in range(args.start, end, args.batch):
+        stop = min(end, start + args.batch)
+        async with engine.begin() as conn:
+            await run(
+                conn, f"passes {start}-{stop}", PASSES_SQL, **common,
+                users=args.users, skew=args.org_skew, days=args.days,
+                ttl_days=args.ttl_days, no_expiry=args.no_expiry,
+                apple=args.apple, google=args.google, start=start, stop=stop,
+            )
+
+    if args.rollups:
+        started = time.perf_counter()
+        async with engine.connect() as conn:
+            org_ids = (await conn.execute(BACKFILL_ORGS_SQL)).scalars().all()
+        # One short transaction per org, as app.services.rollups.backfill does
+        for org_id in org_ids:
+            async with engine.begin() as conn:
+                await conn.execute(BACKFILL_SQL, {"org_id": org_id})
+        print(f"rollups rebuilt for {len(org_ids)} orgs in {time.perf_counter() - started:.1f}s")
+
+    # VACUUM can't run in a transaction block
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await run(conn, "vacuum analyze", text("VACUUM ANALYZE"))
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic PassMint dataset")
+    parser.add_argument("--tag", default="syn", help="Namespace for generated IDs")
+    parser.add_argument("--orgs", type=int, default=1000)
+    parser.add_argument("--designs-per-org", type=int, default=5)
+    parser.add_argument("--users", type=int, default=1000000)
+    parser.add_argument("--passes", type=int, default=10000000)
+    parser.add_argument("--start", type=int, default=0, help="First pass number, to extend a dataset")
+    parser.add_argument("--org-skew", type=float, default=3.0, help="1 is uniform; 3 puts over 40%% of passes in 8%% of orgs")
+    parser.add_argument("--days", type=float, default=365, help="Issue dates span this many days back")
+    parser.add_argument("--ttl-days", type=float, default=180, help="Passes expire up to this long after issue")
+    parser.add_argument("--no-expiry", type=float, default=0.1, help="Fraction of passes without expiry")
+    parser.add_argument("--apple", type=float, default=0.7, help="Fraction of passes with an Apple artifact")
+    parser.add_argument("--google", type=float, default=0.5, help="Fraction of Apple passes also issued to Google")
+    parser.add_argument("--batch", type=int, default=500000, help="Rows per transaction")
+    parser.add_argument("--no-rollups", dest="rollups", action="store_false", help="Skip the rollup rebuild")
+    asyncio.run(main(parser.parse_args()))